@@ -0,0 +1,362 @@
+"""
+Benchmark harness for gpt_helper.
+
+Generates synthetic project trees and measures the main GPTAssist operations on them:
+wall time, filesystem calls (directories listed, entries listed, stat and open calls)
+and peak Python memory via tracemalloc. The results are written as JSON, so runs of
+different versions can be compared, e.g.
+
+    python benchmark.py --files 1000 10000 --layout wide deep --json new.json
+    python benchmark.py --files 1000 10000 --layout wide deep --module old/gpt_helper.py --json old.json
+    python benchmark.py --compare old.json new.json
+"""
+import os
+import sys
+import io
+import json
+import time
+import random
+import shutil
+import argparse
+import builtins
+import platform
+import tempfile
+import tracemalloc
+import contextlib
+import importlib.util
+
+LAYOUTS = ("wide", "deep", "balanced")
+TEXT_EXTENSIONS = (".py", ".md", ".txt", ".js", ".json")
+BINARY_EXTENSIONS = (".bin", ".dat")
+IGNORED_DIRS = ("node_modules", ".git", "venv")
+IGNORE_PATTERNS = ["*node_modules*", "*.git*", "*venv*"]
+DEEP_CHAIN_DEPTH = 200
+
+
+class _InteractiveLoopReached(Exception):
+    pass
+
+
+def load_module(path):
+    """
+    Import a gpt_helper.py from the given path, so other versions can be benchmarked.
+    Versions before the one-shot CLI start their interactive prompt when imported. For
+    those, the import is stopped at the first input() call, which comes after GPTAssist
+    is defined, and the partly executed module is used.
+    """
+    spec = importlib.util.spec_from_file_location("gpt_helper_bench", path)
+    module = importlib.util.module_from_spec(spec)
+
+    def stop_at_input(prompt=""):
+        raise _InteractiveLoopReached()
+
+    original_input = builtins.input
+    builtins.input = stop_at_input
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            spec.loader.exec_module(module)
+    except _InteractiveLoopReached:
+        print(f"{path} starts its interactive prompt on import; benchmarking the GPTAssist defined before it.",
+              file=sys.stderr)
+    finally:
+        builtins.input = original_input
+    if not hasattr(module, "GPTAssist"):
+        raise ImportError(f"{path} does not define GPTAssist")
+    return module
+
+
+def directory_layout(files, layout, files_per_dir):
+    """
+    Return the relative directory paths of a tree holding the given number of files.
+    wide: one level of directories; deep: chains of DEEP_CHAIN_DEPTH nested directories;
+    balanced: ten subdirectories per directory.
+    """
+    count = max(1, -(-files // files_per_dir))
+    if layout == "wide":
+        return [f"d{i:06d}" for i in range(count)]
+    if layout == "deep":
+        # Chains of nested directories, kept short enough for the platform's path limits.
+        dirs = []
+        for i in range(count):
+            if i % DEEP_CHAIN_DEPTH == 0:
+                path = f"c{i // DEEP_CHAIN_DEPTH}"
+            path = os.path.join(path, f"d{i % 10}")
+            dirs.append(path)
+        return dirs
+    dirs = [""]
+    i = 0
+    while len(dirs) < count:
+        parent = dirs[i]
+        for j in range(10):
+            dirs.append(os.path.join(parent, f"d{j}") if parent else f"d{j}")
+            if len(dirs) == count:
+                break
+        i += 1
+    return [d or "root" for d in dirs]
+
+
+def generate_tree(root, files, layout, files_per_dir=20, binary_ratio=0.05, ignored_dirs=2,
+                  ignored_files=50, file_size=2048, seed=0):
+    """
+    Create a synthetic project below root and return a description of it.
+    ignored_dirs directories (node_modules, .git, ...) with ignored_files files each are
+    added next to the project files.
+    """
+    rng = random.Random(seed)
+    line = "value = compute(value, 42)  # synthetic content\n"
+    text = (line * (file_size // len(line) + 1))[:file_size]
+    total_bytes = 0
+    binary = 0
+    dirs = directory_layout(files, layout, files_per_dir)
+    created = 0
+    for d in dirs:
+        path = os.path.join(root, d)
+        os.makedirs(path, exist_ok=True)
+        for j in range(min(files_per_dir, files - created)):
+            if rng.random() < binary_ratio:
+                name = f"f{j}{rng.choice(BINARY_EXTENSIONS)}"
+                data = bytes(range(256)) + b"\0" * file_size
+                binary += 1
+            else:
+                name = f"f{j}{rng.choice(TEXT_EXTENSIONS)}"
+                data = f"# {d}/{name}\n{text}".encode("utf-8")
+            with open(os.path.join(path, name), "wb") as f:
+                f.write(data)
+            total_bytes += len(data)
+            created += 1
+    for name in IGNORED_DIRS[:ignored_dirs]:
+        path = os.path.join(root, name, "pkg")
+        os.makedirs(path, exist_ok=True)
+        for j in range(ignored_files):
+            with open(os.path.join(path, f"i{j}.js"), "w", encoding="utf-8") as f:
+                f.write(text)
+    return {"files": created, "layout": layout, "dirs": len(dirs), "binary_files": binary,
+            "bytes": total_bytes, "ignored_dirs": min(ignored_dirs, len(IGNORED_DIRS)),
+            "ignored_files": min(ignored_dirs, len(IGNORED_DIRS)) * ignored_files}
+
+
+class FSCounter:
+    """
+    Counts filesystem calls made through the os and builtins modules while active.
+    The stat calls of os.DirEntry are not seen; entries_listed bounds them.
+    """
+
+    def __init__(self):
+        self.counts = {"scandir": 0, "entries_listed": 0, "stat": 0, "open": 0}
+        self._originals = None
+
+    def __enter__(self):
+        self._originals = (os.scandir, os.stat, builtins.open)
+        original_scandir, original_stat, original_open = self._originals
+        counts = self.counts
+
+        class CountingIterator:
+            def __init__(self, it):
+                self._it = it
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                self._it.close()
+
+            def __iter__(self):
+                return self
+
+            def __next__(self):
+                entry = next(self._it)
+                counts["entries_listed"] += 1
+                return entry
+
+            def close(self):
+                self._it.close()
+
+        def scandir(*args, **kwargs):
+            counts["scandir"] += 1
+            return CountingIterator(original_scandir(*args, **kwargs))
+
+        def stat(*args, **kwargs):
+            counts["stat"] += 1
+            return original_stat(*args, **kwargs)
+
+        def counting_open(*args, **kwargs):
+            counts["open"] += 1
+            return original_open(*args, **kwargs)
+
+        os.scandir, os.stat, builtins.open = scandir, stat, counting_open
+        return self
+
+    def __exit__(self, *exc):
+        os.scandir, os.stat, builtins.open = self._originals
+
+
+def modify_files(root, fraction, seed):
+    """
+    Append a line to a fraction of the text files below root, skipping ignored directories.
+    """
+    rng = random.Random(seed)
+    modified = 0
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d not in IGNORED_DIRS]
+        for name in filenames:
+            if name.endswith(TEXT_EXTENSIONS) and rng.random() < fraction:
+                with open(os.path.join(dirpath, name), "a", encoding="utf-8") as f:
+                    f.write(f"changed = {seed}\n")
+                modified += 1
+    return modified
+
+
+def run_sequence(module, root, args, track_memory, seed):
+    """
+    Run the benchmarked operations in order on a fresh GPTAssist and return
+    name -> measurements.
+    """
+    gpt = module.GPTAssist()
+    with contextlib.redirect_stdout(io.StringIO()):
+        gpt.add_dir(root)
+        for pattern in IGNORE_PATTERNS:
+            gpt.add_ignore_dir(pattern)
+        if args.workers and hasattr(gpt, "set_workers"):
+            gpt.set_workers(str(args.workers))
+    gpt.context["url"] = []
+
+    def prompt(first):
+        render = getattr(gpt, "render_prompt_first" if first else "render_prompt_update", None)
+        if render is not None:
+            return lambda: sum(len(chunk) for chunk in render())
+        # Versions without the streaming generators; the prompt is printed to the discarded stdout.
+        method = gpt.prompt_first if first else gpt.prompt_update
+        return lambda: method(print_it=True, copy_it=False)
+
+    steps = [
+        ("read_directory_contents", lambda: len(gpt.read_directory_contents())),
+        # Before anything else reads the files, so the stat cache is empty.
+        ("update_hashes_cold", gpt.update_hashes),
+        ("print_all", gpt.print_all),
+        ("prompt_first", prompt(True)),
+        ("prompt_update", prompt(False)),
+        ("update_hashes_warm", gpt.update_hashes),
+    ]
+    results = {}
+    for name, step in steps:
+        if name == "prompt_update":
+            modified = modify_files(root, args.modify, seed)
+        sink = io.StringIO() if name == "print_all" else None
+        counter = FSCounter()
+        if track_memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        with counter, contextlib.redirect_stdout(sink or io.StringIO()):
+            output = step()
+        elapsed = time.perf_counter() - started
+        result = {"wall_s": round(elapsed, 6)}
+        result.update(counter.counts)
+        if track_memory:
+            result["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        if name == "print_all":
+            output = len(sink.getvalue())
+        if isinstance(output, int):
+            result["output_chars"] = output
+        if name == "prompt_update":
+            result["modified_files"] = modified
+        results[name] = result
+    return results
+
+
+def benchmark(module, args):
+    runs = []
+    for layout in args.layout:
+        for files in args.files:
+            root = tempfile.mkdtemp(prefix=f"gpt_bench_{layout}_{files}_", dir=args.tmp)
+            try:
+                started = time.perf_counter()
+                tree = generate_tree(root, files, layout, args.files_per_dir, args.binary_ratio,
+                                     args.ignored_dirs, args.ignored_files, args.file_size, args.seed)
+                generate_s = time.perf_counter() - started
+                print(f"{layout} tree with {files:,} files generated in {generate_s:.1f}s", file=sys.stderr)
+                operations = run_sequence(module, root, args, False, args.seed)
+                if not args.no_memory:
+                    # Memory is measured in a second pass, so tracemalloc does not skew the timings.
+                    memory = run_sequence(module, root, args, True, args.seed + 1)
+                    for name, result in memory.items():
+                        operations[name]["peak_bytes"] = result["peak_bytes"]
+                for name, result in operations.items():
+                    peak = f", peak {result['peak_bytes'] / 1e6:.1f} MB" if "peak_bytes" in result else ""
+                    print(f"  {name:<24} {result['wall_s']:9.3f}s, {result['scandir']:,} dirs listed, "
+                          f"{result['open']:,} opened{peak}", file=sys.stderr)
+                runs.append({"tree": tree, "generate_s": round(generate_s, 3), "operations": operations})
+            finally:
+                shutil.rmtree(root, ignore_errors=True)
+    return {
+        "module": os.path.abspath(args.module),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "settings": {"workers": args.workers, "modify": args.modify, "files_per_dir": args.files_per_dir,
+                     "binary_ratio": args.binary_ratio, "file_size": args.file_size, "seed": args.seed},
+        "runs": runs,
+    }
+
+
+def compare(old_path, new_path):
+    """
+    Print the wall time and peak memory of each operation in two result files side by side.
+    """
+    with open(old_path, "r", encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_path, "r", encoding="utf-8") as f:
+        new = json.load(f)
+    old_runs = {(run["tree"]["layout"], run["tree"]["files"]): run for run in old["runs"]}
+    print(f"{'tree':<18} {'operation':<24} {'old s':>9} {'new s':>9} {'ratio':>7} {'old MB':>8} {'new MB':>8}")
+    for run in new["runs"]:
+        key = (run["tree"]["layout"], run["tree"]["files"])
+        if key not in old_runs:
+            continue
+        for name, result in run["operations"].items():
+            before = old_runs[key]["operations"].get(name)
+            if before is None:
+                continue
+            ratio = result["wall_s"] / before["wall_s"] if before["wall_s"] else float("inf")
+            old_mb = f"{before['peak_bytes'] / 1e6:.1f}" if "peak_bytes" in before else "-"
+            new_mb = f"{result['peak_bytes'] / 1e6:.1f}" if "peak_bytes" in result else "-"
+            print(f"{key[0] + ' ' + format(key[1], ','):<18} {name:<24} {before['wall_s']:9.3f} "
+                  f"{result['wall_s']:9.3f} {ratio:6.2f}x {old_mb:>8} {new_mb:>8}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark gpt_helper on synthetic project trees.")
+    parser.add_argument("--files", type=int, nargs="+", default=[1000], help="number of files per tree")
+    parser.add_argument("--layout", nargs="+", choices=LAYOUTS, default=["balanced"], help="shape of the trees")
+    parser.add_argument("--files-per-dir", type=int, default=20)
+    parser.add_argument("--binary-ratio", type=float, default=0.05, help="fraction of binary files")
+    parser.add_argument("--file-size", type=int, default=2048, help="size of each file in bytes")
+    parser.add_argument("--ignored-dirs", type=int, default=2, help="number of ignored directories (max 3)")
+    parser.add_argument("--ignored-files", type=int, default=50, help="files in each ignored directory")
+    parser.add_argument("--modify", type=float, default=0.01, help="fraction of files changed before prompt_update")
+    parser.add_argument("--workers", type=int, default=0, help="file reading threads (0 for default)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--tmp", help="directory the trees are generated in")
+    parser.add_argument("--module", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "gpt_helper.py"),
+                        help="gpt_helper.py to benchmark")
+    parser.add_argument("--json", help="write the results to this file instead of stdout")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files and exit")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return 0
+    results = benchmark(load_module(args.module), args)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=4)
+        print(f"Results written to {args.json}.", file=sys.stderr)
+    else:
+        json.dump(results, sys.stdout, indent=4)
+        sys.stdout.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,714 +1,4633 @@
-import os
-import sys
-import json
-import argparse
-import hashlib
-import shlex
-import time
-import subprocess
-import platform
-import fnmatch
-import tkinter as tk
-
-
-class GPTAssist:
-    def __init__(self):
-        self.project_name = ""
-        self.context = {
-            "url": [],
-            "dir": [],
-            "dir_ignore": [],
-            "hashes": {},
-            "allowed_extensions": {"*": 0}
-        }
-
-
-    def copy_to_clipboard(self, data):
-        """
-        Copy a string to the system clipboard using only built‑in modules.
-        Works cross‑platform (Windows, macOS, Linux).
-        """
-
-        try:
-            root = tk.Tk()
-            root.withdraw()  # hide the main window
-            root.clipboard_clear()  # clear current clipboard contents
-            root.clipboard_append(data)  # append new text
-            root.update()  # now it stays on the clipboard after the window closes
-            root.destroy()
-            print("Data successfully copied to clipboard.")
-        except Exception as e:
-            print(f"Failed to copy to clipboard: {e}")
-
-    def print_status(self):
-        print(f"Project Name : {self.project_name}")
-
-        prefix = "-" * 2
-        prefix2 = prefix * 2
-        print("Dirs:")
-        print(prefix, "Allowed paths")
-        for d in self.context["dir"]:
-            print(prefix2, d)
-        print(prefix, "Restricted paths")
-        for d in self.context["dir_ignore"]:
-            print(prefix2, d)
-        print("Urls:")
-        for u in self.context["url"]:
-            print(prefix, u)
-        print("Allowed Extensions:")
-        print(prefix, list(self.context["allowed_extensions"].keys()))
-
-    def add_extension(self, extension=None):
-        if not extension:
-            extension = input(f"Enter extension to add to allowed list:({list(self.context['allowed_extensions'].keys())}): ").strip()
-        if extension not in self.context["allowed_extensions"]:
-            self.context["allowed_extensions"][extension] = 0
-            print(f"Added extension '{extension}' to allowed list.")
-        else:
-            print(f"Extension '{extension}' is already in the allowed list.")
-
-    def remove_extension(self, extension=None):
-        if not extension:
-            extension = input(f"Enter Extension to remove from allowed list:({list(self.context['allowed_extensions'].keys())}): ").strip()
-        if extension in self.context["allowed_extensions"]:
-            del self.context["allowed_extensions"][extension]
-            print(f"Removed extension '{extension}' from allowed list.")
-        else:
-            print(f"Extension '{extension}' not found in allowed list.")
-
-
-    def add_dir(self, dir_path=None):
-        if not dir_path:
-            dir_path = input("Enter directory to add to allowed list: ").strip()
-        if dir_path not in self.context["dir"]:
-            self.context["dir"].append(dir_path)
-            print(f"Added directory '{dir_path}' to allowed list.")
-        else:
-            print(f"Directory '{dir_path}' is already in the allowed list.")
-
-    def remove_dir(self, dir_path=None):
-        if not dir_path:
-            dir_path = input("Enter directory to remove from allowed list: ").strip()
-        if dir_path in self.context["dir"]:
-            self.context["dir"].remove(dir_path)
-            print(f"Removed directory '{dir_path}' from allowed list.")
-        else:
-            print(f"Directory '{dir_path}' not found in allowed list.")
-
-    def add_ignore_dir(self, dir_path=None):
-        if not dir_path:
-            dir_path = input("Enter directory to add to ignore list: ").strip()
-        if dir_path not in self.context["dir_ignore"]:
-            self.context["dir_ignore"].append(dir_path)
-            print(f"Added directory '{dir_path}' to ignore list.")
-        else:
-            print(f"Directory '{dir_path}' is already in the ignore list.")
-
-    def remove_ignore_dir(self, dir_path=None):
-        if not dir_path:
-            dir_path = input("Enter directory to remove from ignore list: ").strip()
-        if dir_path in self.context["dir_ignore"]:
-            self.context["dir_ignore"].remove(dir_path)
-            print(f"Removed directory '{dir_path}' from ignore list.")
-        else:
-            print(f"Directory '{dir_path}' not found in ignore list.")
-
-    def add_url(self, url=None):
-        if not url:
-            url = input("Enter URL to add: ").strip()
-        if url not in self.context["url"]:
-            self.context["url"].append(url)
-            print(f"Added URL '{url}'.")
-        else:
-            print(f"URL '{url}' is already in the list.")
-
-    def remove_url(self, url=None):
-        if not url:
-            url = input("Enter URL to remove: ").strip()
-        if url in self.context["url"]:
-            self.context["url"].remove(url)
-            print(f"Removed URL '{url}'.")
-        else:
-            print(f"URL '{url}' not found in the list.")
-
-    def print_dir_structure(self):
-        """Print a tree-like structure for each allowed directory."""
-        for directory in self.context["dir"]:
-            print(f"\nDirectory structure for {directory}:")
-            self._print_tree(directory, prefix="")
-
-    def should_ignore(self, path):
-        """
-        Return True if the given relative path matches any ignore pattern.
-        """
-        for pattern in self.context["dir_ignore"]:
-            if fnmatch.fnmatch(path, pattern):
-                return True
-        return False
-
-    def _print_tree(self, directory, prefix=""):
-        """
-        Recursively prints a tree view of the directory.
-        If an entry's relative path (from the current working directory) matches an ignore pattern,
-        that entry (and its children) is skipped.
-        """
-        if prefix == "":
-            print(os.path.basename(directory) + "/")
-        try:
-            entries = sorted(os.listdir(directory))
-        except Exception as e:
-            print(prefix + "Error accessing directory:", e)
-            return
-        for i, entry in enumerate(entries):
-            full_path = os.path.join(directory, entry)
-            rel_path = os.path.relpath(full_path, os.getcwd())
-            # Skip if the path should be ignored.
-            if self.should_ignore(rel_path):
-                continue
-            connector = "└── " if i == len(entries) - 1 else "├── "
-            if os.path.isdir(full_path):
-                print(prefix + connector + entry + "/")
-                new_prefix = prefix + ("    " if i == len(entries) - 1 else "│   ")
-                self._print_tree(full_path, new_prefix)
-            else:
-                print(prefix + connector + entry)
-
-    def print_all(self):
-        """
-        Print the directory structure and file contents for all allowed directories,
-        skipping directories that match ignore patterns.
-        Only files with allowed extensions are printed.
-        The file contents are wrapped in triple backticks.
-        """
-        allowed_exts = self.context['allowed_extensions']
-        for directory in self.context["dir"]:
-            print(f"\n--- Scanning directory: {directory} ---")
-            for root, dirs, files in os.walk(directory):
-                # Compute the relative path from the current working directory.
-                rel_root = os.path.relpath(root, os.getcwd())
-                if self.should_ignore(rel_root):
-                    continue
-                print(f"\nDirectory: {root}")
-                for file in files:
-                    ext = os.path.splitext(file)[1].lower()
-                    if ext not in allowed_exts or "*" not in allowed_exts or ".*" not in allowed_exts:
-                        continue
-                    file_path = os.path.join(root, file)
-                    print(f"\n--- {file_path} ---")
-                    try:
-                        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                            content = f.read()
-                        # Wrap content in triple backticks for Markdown formatting.
-                        print("```")
-                        print(content)
-                        print("```")
-                    except Exception as e:
-                        print(f"Error reading file {file_path}: {e}")
-                    print(f"--- End of {file_path} ---")
-
-    def read_file_contents(self):
-        allowed_exts = self.context['allowed_extensions']
-
-        results = []
-        for directory in self.context["dir"]:
-            for root, dirs, files in os.walk(directory):
-                # Compute the relative path from the current working directory.
-                rel_root = os.path.relpath(root, os.getcwd())
-                # Skip this directory if it matches any ignore pattern.
-                if self.should_ignore(rel_root):
-                    continue
-                for file in files:
-                    ext = os.path.splitext(file)[1].lower()
-                    if ext not in allowed_exts and "*" not in allowed_exts and ".*" not in allowed_exts:
-                        continue
-                    file_path = os.path.join(root, file)
-                    try:
-                        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                            content = f.read()
-                        wrapped_content = "```\n" + content + "\n```"
-                        rel_file_path = os.path.relpath(file_path, os.getcwd())
-                        results.append((rel_file_path, wrapped_content))
-                    except Exception as e:
-                        continue
-        return results
-
-    def read_directory_contents(self):
-        """
-        Create a string of all possible file directories and return that string.
-        It is similar to the output of the print_dir_structure command.
-        """
-        result_lines = []
-        for directory in self.context["dir"]:
-            result_lines.append(f"Directory structure for {directory}:")
-            result_lines.extend(self._get_tree(directory, prefix=""))
-        return "\n".join(result_lines)
-
-    def _get_tree(self, directory, prefix=""):
-        """
-        Recursively collects a tree view of the directory as a list of strings.
-        Entries whose relative path matches an ignore pattern are skipped.
-        """
-        lines = []
-        # Print the root directory name only once at the top.
-        if prefix == "":
-            lines.append(os.path.basename(directory) + "/")
-        try:
-            entries = sorted(os.listdir(directory))
-        except Exception as e:
-            lines.append(prefix + "Error accessing directory: " + str(e))
-            return lines
-        for i, entry in enumerate(entries):
-            full_path = os.path.join(directory, entry)
-            rel_path = os.path.relpath(full_path, os.getcwd())
-            # Skip if this path should be ignored.
-            if self.should_ignore(rel_path):
-                continue
-            connector = "└── " if i == len(entries) - 1 else "├── "
-            if os.path.isdir(full_path):
-                lines.append(prefix + connector + entry + "/")
-                new_prefix = prefix + ("    " if i == len(entries) - 1 else "│   ")
-                lines.extend(self._get_tree(full_path, new_prefix))
-            else:
-                lines.append(prefix + connector + entry)
-        return lines
-
-    def prompt_first(self, print_it=True, copy_it=False):
-        filecontents = self.read_file_contents()
-        dircontents = self.read_directory_contents()
-
-        filecontents_string = ""
-        for filetuple in filecontents:
-            filecontents_string += f"\n### File: {filetuple[0]}\n"
-            filecontents_string += f"""\n{filetuple[1]}\n"""
-
-        urlcontents = "" if self.context['url'] == [] else "\n## URL Contents\n"
-        index = 1
-        for url in self.context['url']:
-            urlcontents += f"- {index}. {url}\n"
-            index += 1
-
-        prompt = f""" # Project: {self.project_name}\n\n## Directory Structure\n\n{dircontents}\n\n## File Contents\n\n{filecontents_string}\n\n{urlcontents}\n\nPlease analyze the above project structure and file contents, and answer any queries regarding its functionality."""
-
-        if print_it:
-            print(prompt)
-        if copy_it:
-            self.copy_to_clipboard(prompt)
-
-    def hash(self, ob):
-        return hashlib.md5(ob.encode('utf-8')).hexdigest()
-
-    def update_hashes(self):
-        self.context["hashes"] = {}
-        filecontents = self.read_file_contents()
-        dircontents = self.read_directory_contents()
-
-        h = self.hash(dircontents)
-        if h not in self.context["hashes"]:
-            self.context["hashes"][h] = 1
-
-        for filetuple in filecontents:
-            h = self.hash(filetuple[1])
-            if h not in self.context["hashes"]:
-                self.context["hashes"][h] = 1
-
-        for url in self.context['url']:
-            h = self.hash(url)
-            if h not in self.context["hashes"]:
-                self.context["hashes"][h] = 1
-
-    def prompt_update(self, print_it=True, copy_it=False):
-        filecontents = self.read_file_contents()
-        dircontents = self.read_directory_contents()
-
-        filecontents_string = ""
-        for filetuple in filecontents:
-            if self.hash(filetuple[1]) in self.context["hashes"]:
-                continue
-            filecontents_string += f"\n### Updated File: {filetuple[0]}\n"
-            filecontents_string += f"""\n{filetuple[1]}\n"""
-
-        urlcontents = "" if self.context['url'] == [] else "\n## Updated URL Contents\n"
-        index = 1
-        for url in self.context['url']:
-            if self.hash(url) in self.context["hashes"]:
-                continue
-            urlcontents += f"- {index}. {url}\n"
-            index += 1
-
-        dircontent_section = f"""\n## Updated Directory Structure\n\n{dircontents}\n"""
-        filecontent_section = f"""\n## Updated File Contents\n\n{filecontents_string}\n"""
-
-        if self.hash(dircontents) in self.context["hashes"]:
-            dircontent_section = ""
-
-        prompt = f""" # Project: {self.project_name}\n{dircontent_section}{filecontent_section}\n{urlcontents}\n\nPlease analyze the above updated project structure and file contents, and answer any queries regarding its functionality."""
-
-        if print_it:
-            print(prompt)
-        if copy_it:
-            self.copy_to_clipboard(prompt)
-
-    def save(self, path=None):
-        if not path:
-            path = input("Enter path to save the context (e.g., context.json): ").strip()
-        data = {
-            "project_name": self.project_name,
-            "context": self.context
-        }
-        try:
-            with open(path, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=4)
-            print(f"Context successfully saved to {path}.")
-        except Exception as e:
-            print(f"Error saving context: {e}")
-
-    def load(self, path=None):
-        if not path:
-            path = input("Enter path to load the context (e.g., context.json): ").strip()
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            self.project_name = data.get("project_name", "")
-            self.context = data.get("context", self.context)
-            print(f"Context successfully loaded from {path}.")
-        except Exception as e:
-            print(f"Error loading context: {e}")
-
-
-class Command:
-    def __init__(self, command="", required_commands=None, optional_commands=None, inputs=None, help_message="",
-                 ):
-        if inputs is None:
-            inputs = ""
-        if optional_commands is None:
-            optional_commands = []
-        if required_commands is None:
-            required_commands = []
-
-        self.command = command
-
-        self.command_without_hyphen = command.lower().lstrip('-')
-
-        self.required_commands = required_commands
-        self.optional_commands = optional_commands
-        self.help_message = help_message
-        self.inputs = inputs
-
-    def generate_str(self):
-        ret_str = []
-        ret_str.append(f" {self.command} ")
-        if self.inputs != "":
-            ret_str.append(f"[{self.inputs}] ")
-
-        ret_str.append(f": ")
-        ret_str.append(f"{self.help_message}")
-
-        if self.required_commands:
-            required = ", ".join([cmd.command for cmd in self.required_commands])
-            ret_str.append(f"\n\t[Require: {required}]")
-        if self.optional_commands:
-            optional = ", ".join([cmd.command for cmd in self.optional_commands])
-            ret_str.append(f"\n\t[Optional: {optional}]")
-
-        return ''.join(ret_str)
-
-    def print_command(self):
-        print(self.generate_str())
-
-    def __repr__(self):
-        return f"Command({self.command})"
-
-
-help_comm = Command("-h", help_message="Prints help section")
-project_name_comm = Command("-name", help_message="Project Name")
-add_dir_comm = Command("-dir+", inputs="Directory", help_message="Adds directory to watch-list")
-add_ignore_dir_comm = Command("-ignore+", inputs="Directory", help_message="Adds directory to ignore-list")
-remove_dir_comm = Command("-dir-", inputs="Directory", help_message="Removes this directory from watch-list")
-remove_ignore_dir_comm = Command("-ignore-", inputs="Directory", help_message="Removes this directory from ignore-list")
-add_url_comm = Command("-url+", inputs="Url", help_message="Removes given url from watch-list")
-remove_url_comm = Command("-url-", inputs="Url", help_message="Removes given url from watch-list")
-add_extension_comm = Command("-extension+", help_message="Removes given extension from allowed-list")
-remove_extension_comm = Command("-extension-", help_message="Removes given extension from allowed-list")
-print_all_comm = Command("-print", help_message="Prints directory structure and contents of all the files")
-print_dir_structure_comm = Command("-printdir", help_message="Prints directory structure")
-status_comm = Command("-status", help_message="Prints current status")
-prompt_first_copy_comm = Command("-prompt-first-copy", help_message="Copys the first prompt to clipboard")
-prompt_update_copy_comm = Command("-prompt-copy", help_message="Copys the updated prompt to clipboard")
-prompt_first_comm = Command("-prompt-first", help_message="Prints and copys the first prompt")
-prompt_update_comm = Command("-prompt", help_message="Prints and copys the updated prompt")
-update_comm = Command("-update", help_message="Updates the hashes")
-save_comm = Command("-save", help_message="Saves the context")
-load_comm = Command("-load", help_message="Loads the context")
-
-
-class Command_Control:
-    def __init__(self, header="", logfile=None):
-        self.commands = []
-        self.header = header
-        if logfile:
-            self.logfilename = logfile
-            self.logging = True
-            with open(self.logfilename, "w") as file:
-                file.write("Time | Valid/Invalid | Command(if Valid) | InputParameters\n")
-        else:
-            self.logfilename = None
-            self.logging = False
-
-    def add_command(self, *commands):
-        for cmd in commands:
-            self.commands.append(cmd)
-
-    def print_all_commands(self):
-        print(f"---------------------- {self.header} ------------------------")
-        for cmd in self.commands:
-            cmd.print_command()
-        print(f"---------------------- {self.header} ------------------------")
-
-    def parse_command(self, input_command):
-        tokens = shlex.split(input_command)
-        dictionary_commands = {}
-        key = None
-        for token in tokens:
-            if token.startswith("-"):
-                key = token.lstrip("-")
-                dictionary_commands[key] = None
-            else:
-                if key:
-                    dictionary_commands[key] = token
-        return dictionary_commands
-
-    def validate_action(self, action):
-        for cmd in self.commands:
-            if cmd.command_without_hyphen in action:
-                # Check for required commands
-                missing_required = False
-                for req_cmd in cmd.required_commands:
-                    if req_cmd.command_without_hyphen not in action or not action[req_cmd.command_without_hyphen]:
-                        missing_required = True
-                        break
-                if missing_required:
-                    print(f"Incomplete command '{cmd.command}'. Enter -h for help.")
-                    return False, action, None
-                return True, action, cmd
-        # print("Unknown (or incomplete) command entered. Enter -h for help.")
-        return False, action, None
-
-    def resolve_cmd(self, terminal_cmd):
-        action_dict = self.parse_command(terminal_cmd)
-        is_valid, action_dict, action_cmd = self.validate_action(action_dict)
-        if self.logging:
-            self.log(is_valid, action_dict, action_cmd)
-        if is_valid:
-            return action_dict, action_cmd
-        else:
-            return action_dict, None
-
-    def log(self, is_valid, param_dict, param_cmd):
-        if not self.logfilename:
-            return
-        timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
-        with open(self.logfilename, "a") as file:
-            if not is_valid:
-                file.write(f"{timestamp} -> Invalid | {param_dict}\n")
-            else:
-                file.write(f"{timestamp} -> Valid | {param_cmd.command_without_hyphen} | {param_dict}\n")
-
-    def get_command_names_lstriped(self):
-        return [cmd.command_without_hyphen for cmd in self.commands]
-
-    def get_command(self, command_name):
-        return [cmd for cmd in self.commands if cmd.command_without_hyphen == command_name][0]
-
-    def is_parameters_valid(self, command_dict):
-        for key in command_dict.keys():
-            if command_dict[key] is None and self.get_command(key).inputs != "":
-                return False
-        return True
-
-
-class Terminal:
-    def __init__(self, sudo_password=None, command_control_object=None):
-        if command_control_object is None:
-            self.CommandControl = Command_Control()
-        else:
-            self.CommandControl = command_control_object
-
-        self.is_windows = platform.system().lower() == "windows"
-        self.is_linux = platform.system().lower() == "linux"
-        self.sudo_password = sudo_password
-
-    def run_command(self, command):
-        """
-        Execute a shell command.
-        :param command: Command string to execute.
-        :return: Tuple containing (output, success_flag)
-        """
-        if self.is_linux:
-            try:
-                if command.startswith("sudo") and self.sudo_password:
-                    # Securely provide the sudo password via stdin
-                    process = subprocess.Popen(
-                        ['sudo', '-S'] + shlex.split(command[5:]),
-                        stdin=subprocess.PIPE,
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.PIPE,
-                        text=True
-                    )
-                    stdout, stderr = process.communicate(input=self.sudo_password + '\n')
-                else:
-                    process = subprocess.Popen(
-                        shlex.split(command),
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.PIPE,
-                        text=True
-                    )
-                    stdout, stderr = process.communicate()
-
-                if process.returncode == 0:
-                    return stdout, True
-                else:
-                    return stderr, False
-
-            except Exception as e:
-                return f"Error running command: {str(e)}", False
-
-        elif self.is_windows:
-            try:
-                process = subprocess.Popen(
-                    command,
-                    shell=True,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    text=True
-                )
-                stdout, stderr = process.communicate()
-
-                if process.returncode == 0:
-                    return stdout, True
-                else:
-                    return stderr, False
-            except Exception as e:
-                return f"Error running command: {str(e)}", False
-        else:
-            return "Unsupported OS", False
-
-    def interactive_shell(self):
-        """
-        Launch an interactive shell interface.
-        """
-        print("Starting Terminal Shell. Type 'exit' to quit.")
-        print("Path where these commands will get execured : {}")
-        while True:
-            try:
-                command_input = input("> ").strip()
-                if command_input.lower() in ["exit", "quit"]:
-                    print("Exiting shell.")
-                    break
-
-                action_dict, action_cmd = self.CommandControl.resolve_cmd(command_input)
-                print(action_cmd, self.CommandControl.get_command_names_lstriped())
-                if action_cmd is not None and \
-                        action_cmd.command_without_hyphen in self.CommandControl.get_command_names_lstriped():
-                    print(action_dict)
-                else:
-                    output, success = self.run_command(command_input)
-                    print(output)
-
-
-            except KeyboardInterrupt:
-                print("\nExiting shell.")
-                break
-            except EOFError:
-                print("\nExiting shell.")
-                break
-
-    # # Example usage
-    # if __name__ == "__main__":
-    #     sudo_password = input("Enter your sudo password (leave blank if not required): ")
-    #     terminal = Terminal(sudo_password if sudo_password.strip() else None)
-    #     terminal.interactive_shell()
-    #
-
-
-gpt = GPTAssist()
-
-GPT_Assist_Cmd_Prompt = Command_Control("GPT Assist")
-
-GPT_Assist_Cmd_Prompt.add_command(help_comm, project_name_comm, add_dir_comm, add_ignore_dir_comm, add_url_comm,
-                                  add_extension_comm,status_comm, update_comm, remove_extension_comm,
-                                  remove_dir_comm, remove_ignore_dir_comm, remove_url_comm, print_all_comm,
-                                  print_dir_structure_comm,
-                                  prompt_first_copy_comm, prompt_update_copy_comm, prompt_first_comm,
-                                  prompt_update_comm, save_comm, load_comm)
-
-GPT_Assist_Cmd_Prompt.print_all_commands()
-
-default_ignore_list = [r"*venu*",r"*venv*", r"*.git*", r"*.idea*", r"*.jpg", r"*.bmp", r"*.png", r"*.jpeg",
-                       r"*.pdf", r"*LICENSE", r"*.zip"]
-
-
-[gpt.add_ignore_dir(dir_path=a) for a in default_ignore_list]
-starttime_time = time.time()
-
-while True:
-    bookmark_time = time.time()
-    input_command = str(input(f"({str(int(time.time() - starttime_time)).zfill(3)} sec) > "))
-    resolved_cmd = GPT_Assist_Cmd_Prompt.resolve_cmd("-" + input_command)
-    # print(resolved_cmd)
-    cmd = resolved_cmd[1]
-    # print(type(cmd))
-
-    if resolved_cmd[1] is None:
-        print("Invalid Command")
-    else:
-        if GPT_Assist_Cmd_Prompt.is_parameters_valid(resolved_cmd[0]) or True:
-            # print("Valid Command")
-            if cmd.command_without_hyphen == help_comm.command_without_hyphen:
-                GPT_Assist_Cmd_Prompt.print_all_commands()
-
-            if cmd.command_without_hyphen == status_comm.command_without_hyphen:
-                gpt.print_status()
-
-            if cmd.command_without_hyphen == add_dir_comm.command_without_hyphen:
-                gpt.add_dir()
-            if cmd.command_without_hyphen == remove_dir_comm.command_without_hyphen:
-                gpt.remove_dir()
-            if cmd.command_without_hyphen == add_ignore_dir_comm.command_without_hyphen:
-                gpt.add_ignore_dir()
-            if cmd.command_without_hyphen == remove_ignore_dir_comm.command_without_hyphen:
-                gpt.remove_ignore_dir()
-            if cmd.command_without_hyphen == add_url_comm.command_without_hyphen:
-                gpt.add_url()
-            if cmd.command_without_hyphen == remove_url_comm.command_without_hyphen:
-                gpt.remove_url()
-            if cmd.command_without_hyphen == print_dir_structure_comm.command_without_hyphen:
-                gpt.print_dir_structure()
-            if cmd.command_without_hyphen == print_all_comm.command_without_hyphen:
-                gpt.print_all()
-            if cmd.command_without_hyphen == prompt_first_comm.command_without_hyphen:
-                gpt.prompt_first()
-            if cmd.command_without_hyphen == update_comm.command_without_hyphen:
-                gpt.update_hashes()
-            if cmd.command_without_hyphen == prompt_update_comm.command_without_hyphen:
-                gpt.prompt_update()
-            if cmd.command_without_hyphen == project_name_comm.command_without_hyphen:
-                gpt.project_name = str(input("Enter the Project Name : "))
-            if cmd.command_without_hyphen == prompt_first_copy_comm.command_without_hyphen:
-                gpt.prompt_first(print_it=False, copy_it=True)
-            if cmd.command_without_hyphen == prompt_update_copy_comm.command_without_hyphen:
-                gpt.prompt_update(print_it=False, copy_it=True)
-            if cmd.command_without_hyphen == save_comm.command_without_hyphen:
-                gpt.save()
-            if cmd.command_without_hyphen == load_comm.command_without_hyphen:
-                gpt.load()
-            if cmd.command_without_hyphen == add_extension_comm.command_without_hyphen:
-                gpt.add_extension()
-            if cmd.command_without_hyphen == remove_extension_comm.command_without_hyphen:
-                gpt.remove_extension()
-
-
-
-        else:
-            print("Invalid Command Usage")
-#
-#
+import os
+import sys
+import json
+import hashlib
+import shlex
+import time
+import subprocess
+import platform
+import fnmatch
+import re
+import collections
+import collections.abc
+import base64
+import zlib
+import itertools
+import threading
+import contextlib
+import math
+import heapq
+import functools
+import codecs
+import shutil
+import html.parser
+
+# Used to report startup time; heavier modules (tkinter, argparse, difflib,
+# concurrent.futures, asyncio, urllib.request, sqlite3, tokenize, ast) are only imported where they are needed.
+_IMPORT_START = time.perf_counter()
+
+# Upper bound for the size of the files read ahead by GPTAssist.read_files().
+READ_AHEAD_BYTES = 32 * 1024 * 1024
+# Files are read and hashed in chunks of this size.
+READ_CHUNK_BYTES = 1024 * 1024
+# Number of leading bytes inspected to tell binary files from text files.
+SNIFF_BYTES = 8192
+# Default cap for the content of a single file in prompts.
+DEFAULT_MAX_FILE_BYTES = 1024 * 1024
+# Version of the file digests; stat caches with another version are dropped on load.
+DIGEST_VERSION = 2
+# Number of omitted files listed by name when a prompt exceeds the token budget.
+MAX_OMITTED_LISTED = 50
+# Seconds to wait for a URL, and the number of URLs fetched at the same time.
+URL_TIMEOUT = 15
+URL_CONCURRENCY = 8
+# Upper bound for the size of a downloaded URL body.
+URL_MAX_BYTES = 5 * 1024 * 1024
+# Version of the minifiers; cached minified contents of another version are not used.
+MINIFY_VERSION = 2
+# Version of the outliners; cached outlines of another version are not used.
+OUTLINE_VERSION = 2
+# Files of at least this size are outlined when outlines are turned on without a size.
+DEFAULT_OUTLINE_BYTES = 64 * 1024
+# Outlines are computed in a process pool once at least this many files need one.
+OUTLINE_POOL_MIN_FILES = 8
+# About one in this many prompt sections may start a part, so part boundaries stay put after small edits.
+PART_ANCHOR_EVERY = 4
+# Smallest part limit, in characters or tokens.
+MIN_PART_LIMIT = 1000
+
+_TOKEN_PIECE_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text):
+    """
+    Fast local estimate of the number of LLM tokens in a text.
+    Every word and punctuation mark counts as one token, plus one more for every
+    8 characters, since long identifiers are split into several tokens.
+    """
+    pieces = _TOKEN_PIECE_RE.findall(text)
+    return len(pieces) + sum(map(len, pieces)) // 8
+
+
+def token_weight(text):
+    """
+    estimate_tokens() without the rounding, so the weights of the lines of a text
+    add up to at least its estimate.
+    """
+    pieces = _TOKEN_PIECE_RE.findall(text)
+    return len(pieces) + sum(map(len, pieces)) / 8
+
+
+def pack_text(text):
+    """
+    Compress a text into a short ASCII string that can be stored in the JSON context.
+    """
+    return base64.b64encode(zlib.compress(text.encode("utf-8"))).decode("ascii")
+
+
+def unpack_text(data):
+    return zlib.decompress(base64.b64decode(data)).decode("utf-8")
+
+
+_TEXT_BYTES = bytes(range(32, 127)) + b"\n\r\t\f\b"
+
+
+def looks_binary(sample):
+    """
+    Guess from the first bytes of a file whether it is binary:
+    it contains NUL bytes, or is not UTF-8 and mostly made of non-printable bytes.
+    """
+    if not sample:
+        return False
+    if b"\0" in sample:
+        return True
+    try:
+        sample.decode("utf-8")
+        return False
+    except UnicodeDecodeError as e:
+        if e.start >= len(sample) - 3 and e.reason == "unexpected end of data":
+            # The sample ends in the middle of a multi-byte character.
+            return False
+    non_text = len(sample.translate(None, _TEXT_BYTES))
+    return non_text / len(sample) > 0.3
+
+
+def minify_whitespace(text):
+    """
+    Strip trailing whitespace and collapse runs of blank lines into a single one.
+    """
+    lines = []
+    blank = False
+    for line in text.split("\n"):
+        line = line.rstrip()
+        if not line:
+            if blank:
+                continue
+            blank = True
+        else:
+            blank = False
+        lines.append(line)
+    return "\n".join(lines).strip("\n")
+
+
+def _drop_marked_lines(text, marker="\0"):
+    # Lines that only held comments are dropped, the markers left on other lines are removed.
+    lines = [line for line in text.split("\n") if not (marker in line and not line.replace(marker, "").strip())]
+    return "\n".join(lines).replace(marker, "")
+
+
+def minify_python(text):
+    """
+    Remove the comments of Python source with tokenize (docstrings are kept),
+    then collapse whitespace. Sources that do not tokenize only get the latter.
+    """
+    import io
+    import tokenize
+    try:
+        comments = [token.start for token in tokenize.generate_tokens(io.StringIO(text).readline)
+                    if token.type == tokenize.COMMENT]
+    except (tokenize.TokenError, SyntaxError):
+        return minify_whitespace(text)
+    lines = text.split("\n")
+    for row, col in comments:
+        code = lines[row - 1][:col]
+        lines[row - 1] = code if code.strip() else "\0"
+    return minify_whitespace(_drop_marked_lines("\n".join(lines)))
+
+
+_C_COMMENT_RE = re.compile(r'("(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'|`(?:\\.|[^`\\])*`)|//[^\n]*|/\*.*?\*/', re.S)
+_CSS_COMMENT_RE = re.compile(r'("(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\')|/\*.*?\*/', re.S)
+# Sass and Less also have // comments, but unquoted url() values may contain //.
+_SCSS_COMMENT_RE = re.compile(r'("(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'|\burl\([^)]*\))|//[^\n]*|/\*.*?\*/',
+                              re.S | re.I)
+_MARKUP_COMMENT_RE = re.compile(r"<!--.*?-->", re.S)
+# Words after which a / starts a regular expression literal rather than a division.
+_JS_REGEX_KEYWORDS = frozenset(("return", "typeof", "instanceof", "in", "of", "new", "delete", "void", "throw",
+                                "case", "do", "else", "yield", "await"))
+
+
+def _strip_comments(regex, text):
+    # The first group of regex matches what is kept (string literals), anything else is a comment.
+    return minify_whitespace(_drop_marked_lines(regex.sub(lambda m: m.group(1) or "\0", text)))
+
+
+def minify_c_like(text):
+    """
+    Remove // and /* */ comments (outside of string literals), then collapse whitespace.
+    """
+    return _strip_comments(_C_COMMENT_RE, text)
+
+
+def minify_css(text):
+    """
+    Remove /* */ comments (outside of string literals), then collapse whitespace.
+    """
+    return _strip_comments(_CSS_COMMENT_RE, text)
+
+
+def minify_scss(text):
+    """
+    Remove // and /* */ comments (outside of string literals and url() values), then collapse whitespace.
+    """
+    return _strip_comments(_SCSS_COMMENT_RE, text)
+
+
+def _skip_js_quoted(text, i):
+    # Return the index after the string or template literal starting at text[i].
+    quote = text[i]
+    i += 1
+    while i < len(text):
+        c = text[i]
+        if c == "\\":
+            i += 2
+            continue
+        if c == quote:
+            return i + 1
+        if c == "\n" and quote != "`":
+            return i
+        i += 1
+    return i
+
+
+def _skip_js_regex(text, i):
+    # Return the index after the regular expression literal starting at text[i], or None
+    # if the line ends first (then the / was a division after all).
+    in_class = False
+    i += 1
+    while i < len(text):
+        c = text[i]
+        if c == "\\":
+            i += 2
+            continue
+        if c == "\n":
+            return None
+        if in_class:
+            in_class = c != "]"
+        elif c == "[":
+            in_class = True
+        elif c == "/":
+            i += 1
+            while i < len(text) and text[i].isalpha():
+                i += 1
+            return i
+        i += 1
+    return None
+
+
+def minify_js(text):
+    """
+    Remove the comments of JavaScript / TypeScript, then collapse whitespace.
+    Unlike minify_c_like this tells regular expression literals from comments and divisions
+    by the token before the /, so patterns like /https?:\\/\\// are kept.
+    """
+    parts = []
+    start = 0
+    # The last significant token: a word, a single punctuation character, or "" at the start.
+    last = ""
+    i = 0
+    n = len(text)
+    while i < n:
+        c = text[i]
+        if c in "\"'`":
+            i = _skip_js_quoted(text, i)
+            last = "a"
+        elif c == "/" and text.startswith(("//", "/*"), i):
+            if text[i + 1] == "/":
+                end = text.find("\n", i)
+                end = n if end < 0 else end
+            else:
+                end = text.find("*/", i + 2)
+                end = n if end < 0 else end + 2
+            parts.append(text[start:i])
+            parts.append("\0")
+            i = start = end
+        elif c == "/":
+            regex_allowed = not last or last in _JS_REGEX_KEYWORDS or \
+                (not (last[0].isalnum() or last[0] in "_$") and last not in ")]")
+            end = _skip_js_regex(text, i) if regex_allowed else None
+            if end is None:
+                i += 1
+                last = "/"
+            else:
+                i = end
+                last = "a"
+        elif c.isalnum() or c in "_$":
+            end = i + 1
+            while end < n and (text[end].isalnum() or text[end] in "_$"):
+                end += 1
+            last = text[i:end]
+            i = end
+        else:
+            if not c.isspace():
+                last = c
+            i += 1
+    parts.append(text[start:])
+    return minify_whitespace(_drop_marked_lines("".join(parts)))
+
+
+def minify_markup(text):
+    """
+    Remove <!-- --> comments, then collapse whitespace.
+    """
+    return minify_whitespace(_drop_marked_lines(_MARKUP_COMMENT_RE.sub("\0", text)))
+
+
+# extension -> minifier; other extensions only get minify_whitespace
+MINIFIERS = {".py": minify_python, ".pyw": minify_python}
+MINIFIERS.update(dict.fromkeys((".java", ".c", ".h", ".cc", ".cpp", ".hpp", ".cs", ".go", ".rs", ".swift", ".kt",
+                                ".kts", ".scala", ".dart"), minify_c_like))
+# JSX and PHP mix code with markup text, where // and quotes are plain text; they only get minify_whitespace.
+MINIFIERS.update(dict.fromkeys((".js", ".mjs", ".cjs", ".ts", ".mts", ".cts"), minify_js))
+MINIFIERS[".css"] = minify_css
+MINIFIERS.update(dict.fromkeys((".scss", ".less"), minify_scss))
+MINIFIERS.update(dict.fromkeys((".html", ".htm", ".xml", ".svg", ".vue"), minify_markup))
+
+
+def _outline_python_ast(text):
+    import ast
+    tree = ast.parse(text)
+    lines = []
+
+    def add_docstring(node, indent):
+        docstring = ast.get_docstring(node)
+        if docstring:
+            lines.append(indent + '"""' + docstring.replace("\n", "\n" + indent).replace("\n" + indent + "\n", "\n\n") + '"""')
+
+    def add_body(body, indent):
+        for node in body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                lines.extend(f"{indent}@{ast.unparse(decorator)}" for decorator in node.decorator_list)
+                keyword = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+                returns = f" -> {ast.unparse(node.returns)}" if node.returns else ""
+                lines.append(f"{indent}{keyword} {node.name}({ast.unparse(node.args)}){returns}:")
+                add_docstring(node, indent + "    ")
+                lines.append(indent + "    ...")
+            elif isinstance(node, ast.ClassDef):
+                lines.extend(f"{indent}@{ast.unparse(decorator)}" for decorator in node.decorator_list)
+                bases = [ast.unparse(base) for base in node.bases]
+                bases += [f"{keyword.arg}={ast.unparse(keyword.value)}" if keyword.arg else f"**{ast.unparse(keyword.value)}"
+                          for keyword in node.keywords]
+                lines.append(f"{indent}class {node.name}({', '.join(bases)}):" if bases else f"{indent}class {node.name}:")
+                start = len(lines)
+                add_docstring(node, indent + "    ")
+                add_body(node.body, indent + "    ")
+                if len(lines) == start:
+                    lines.append(indent + "    ...")
+            elif isinstance(node, (ast.Import, ast.ImportFrom)) and not indent:
+                lines.append(ast.unparse(node))
+            elif isinstance(node, ast.Assign):
+                names = [ast.unparse(target) for target in node.targets if isinstance(target, (ast.Name, ast.Tuple))]
+                if names:
+                    lines.append(f"{indent}{' = '.join(names)} = ...")
+            elif isinstance(node, ast.AnnAssign) and isinstance(node.target, ast.Name):
+                value = " = ..." if node.value is not None else ""
+                lines.append(f"{indent}{node.target.id}: {ast.unparse(node.annotation)}{value}")
+
+    add_docstring(tree, "")
+    add_body(tree.body, "")
+    return "\n".join(lines)
+
+
+def outline_python(text):
+    """
+    Outline Python source with ast: imports, module and class level names, classes and
+    functions with their signatures and docstrings, without function bodies.
+    Sources that do not parse get the outline of outline_generic().
+    """
+    try:
+        return _outline_python_ast(text)
+    except (SyntaxError, ValueError, RecursionError):
+        return outline_generic(text)
+
+
+_DECLARATION_RE = re.compile(
+    r"^[ \t]*(?:@\w[^\n]*\n[ \t]*)*"
+    # class, function and type declarations, behind any modifiers
+    r"(?:(?:(?:export|default|public|private|protected|internal|static|abstract|final|async|unsafe|extern|"
+    r"inline|virtual|override|open|sealed|data|pub(?:\([^)\n]*\))?)\s+)*"
+    r"(?:class|interface|struct|enum|trait|impl|fn|func|function|def|module|namespace|type|record|object)\b"
+    # JavaScript functions assigned to names
+    r"|(?:export\s+)?(?:const|let|var)\s+\w+\s*=\s*(?:async\s+)?(?:function\b|\([^)\n]*\)\s*=>|\w+\s*=>)"
+    # C, C++, Java and C# functions and methods: a type, a name and a parameter list
+    r"|(?!(?:if|else|for|while|switch|catch|return|do|new|throw|case|delete|sizeof|typedef|using)\b)"
+    r"[\w:<>,\[\]*& ]*[\w>\]*&]\s+\**(?!(?:if|for|while|switch|catch|return|sizeof)\b)[\w:~]+\s*\([^;{}]*\)"
+    r"[\w\s:,()]*(?:\{[^\n]*\})?\{?\s*$"
+    # JavaScript methods, also with their body on the same line
+    r"|(?:(?:static|async|get|set)\s+)*(?!(?:if|for|while|switch|catch|function|return)\b)[\w$]+\s*\([^;{}\n]*\)\s*"
+    r"\{(?:[^\n]*\})?\s*$)"
+    r"[^\n]*",
+    re.M)
+
+
+def _declaration_head(line):
+    """
+    Cut the body off a declaration written on one line, e.g. "get() { return x; }",
+    at the first brace outside of parentheses.
+    """
+    depth = 0
+    for i, char in enumerate(line):
+        if char in "([":
+            depth += 1
+        elif char in ")]":
+            depth -= 1
+        elif char == "{" and depth <= 0:
+            return line[:i].rstrip()
+    return line
+
+
+def outline_generic(text):
+    """
+    Outline source of any language by keeping only the lines that declare classes,
+    functions and types, found with regular expressions. Opening braces and bodies
+    on the same line are dropped.
+    """
+    lines = []
+    for match in _DECLARATION_RE.finditer(text):
+        for line in match.group(0).split("\n"):
+            line = line.rstrip()
+            if line.endswith("{"):
+                line = line[:-1].rstrip()
+            elif line.endswith("}") and "{" in line:
+                line = _declaration_head(line)
+            if line.strip():
+                lines.append(line[:200])
+    return "\n".join(lines)
+
+
+# extension -> outliner; outlines are only made for these extensions
+OUTLINERS = {".py": outline_python, ".pyw": outline_python}
+OUTLINERS.update(dict.fromkeys((".js", ".jsx", ".mjs", ".cjs", ".ts", ".tsx", ".java", ".c", ".h", ".cc", ".cpp",
+                                ".hpp", ".cs", ".go", ".rs", ".swift", ".kt", ".kts", ".scala", ".dart", ".php",
+                                ".rb", ".m", ".mm"), outline_generic))
+
+
+def outline_source(ext, text):
+    """
+    Return (outline, tokens of the text, tokens of the outline) for a file with the
+    given extension. Runs in the worker processes of GPTAssist.prepare_outlines().
+    """
+    outline = OUTLINERS[ext](text)
+    return outline, estimate_tokens(text), estimate_tokens(outline)
+
+
+def format_size(size):
+    """
+    Format a number of bytes for people, e.g. 3.1 MB.
+    """
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:,} {unit}" if unit == "B" else f"{size:,.1f} {unit}"
+        size /= 1024
+
+
+def parse_size(text):
+    """
+    Parse a size such as 4096, 512K, 2M or 1G into a number of bytes.
+    """
+    text = str(text).strip().upper().rstrip("B")
+    multiplier = 1
+    for suffix, factor in (("K", 1024), ("M", 1024 ** 2), ("G", 1024 ** 3)):
+        if text.endswith(suffix):
+            text = text[:-1]
+            multiplier = factor
+            break
+    value = int(float(text) * multiplier)
+    if value < 0:
+        raise ValueError("must not be negative")
+    return value
+
+
+class ScanEntry:
+    """
+    A file or directory recorded by GPTAssist.scan().
+    Directories keep their sorted children, so one walk is enough to render the
+    directory tree, the file list and the hashes.
+    """
+    __slots__ = ("name", "path", "rel_path", "is_dir", "size", "mtime_ns", "inode", "children", "error")
+    # Whether git reported the file unchanged since the last update; see GitScanEntry.
+    clean = False
+
+    def __init__(self, name, path, rel_path, is_dir, size=0, mtime_ns=0, inode=0):
+        self.name = name
+        self.path = path
+        self.rel_path = rel_path
+        self.is_dir = is_dir
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.inode = inode
+        self.children = [] if is_dir else None
+        self.error = None
+
+    def __repr__(self):
+        return f"ScanEntry({self.rel_path}{'/' if self.is_dir else ''})"
+
+
+class GitScanEntry(ScanEntry):
+    """
+    A file listed by git. Its stat data is only read when it is first used, so files
+    git reports as unchanged since the last update are never statted.
+    clean tells whether git reported the file unchanged since then.
+    """
+    __slots__ = ("clean",)
+
+    def __init__(self, name, path, rel_path, clean):
+        self.name = name
+        self.path = path
+        self.rel_path = rel_path
+        self.is_dir = False
+        self.children = None
+        self.error = None
+        self.clean = clean
+
+    def __getattr__(self, name):
+        # Only called while the stat slots are still unset.
+        if name not in ("size", "mtime_ns", "inode"):
+            raise AttributeError(name)
+        try:
+            st = os.stat(self.path)
+            self.size, self.mtime_ns, self.inode = st.st_size, st.st_mtime_ns, st.st_ino
+        except OSError:
+            self.size = self.mtime_ns = self.inode = 0
+        return getattr(self, name)
+
+
+class IgnoreMatcher:
+    """
+    Compiles the fnmatch style ignore patterns into a single regular expression, so a path
+    is checked against all of them in one match instead of one fnmatch call per pattern.
+    Also compiles .gitignore files, each one into a single regular expression as well.
+    """
+
+    def __init__(self, patterns):
+        self.patterns = tuple(patterns)
+        if self.patterns:
+            joined = "|".join(f"(?:{fnmatch.translate(os.path.normcase(p))})" for p in self.patterns)
+            self._regex = re.compile(joined)
+        else:
+            self._regex = None
+
+    def match(self, path):
+        """
+        Return True if the relative path matches any of the ignore patterns.
+        """
+        if self._regex is None:
+            return False
+        return self._regex.match(os.path.normcase(path)) is not None
+
+    @staticmethod
+    def _glob_to_regex(glob):
+        """
+        Translate a single gitignore glob into a regular expression where '*' and '?'
+        never cross a '/' and '**' matches any number of directories.
+        """
+        i, n = 0, len(glob)
+        out = []
+        while i < n:
+            c = glob[i]
+            if glob.startswith("**/", i):
+                out.append("(?:.*/)?")
+                i += 3
+            elif glob.startswith("/**", i) and i + 3 == n:
+                out.append("/.*")
+                i += 3
+            elif glob.startswith("**", i):
+                out.append(".*")
+                i += 2
+            elif c == "*":
+                out.append("[^/]*")
+                i += 1
+            elif c == "?":
+                out.append("[^/]")
+                i += 1
+            elif c == "[":
+                j = glob.find("]", i + 2)
+                if j == -1:
+                    out.append(re.escape(c))
+                    i += 1
+                else:
+                    body = glob[i + 1:j]
+                    if body.startswith("!"):
+                        body = "^" + body[1:]
+                    out.append(f"[{body}]")
+                    i = j + 1
+            elif c == "\\" and i + 1 < n:
+                out.append(re.escape(glob[i + 1]))
+                i += 2
+            else:
+                out.append(re.escape(c))
+                i += 1
+        return "".join(out)
+
+    @classmethod
+    def compile_gitignore(cls, lines):
+        """
+        Compile the lines of a .gitignore file into a pair of regular expressions
+        (for files, for directories). Rules are tried last to first, and the index of the
+        matching group tells whether that rule was a negation ('!pattern').
+        Returns None if the file has no rules.
+        """
+        rules = []
+        for line in lines:
+            line = line.rstrip("\n").rstrip("\r")
+            if not line.strip() or line.startswith("#"):
+                continue
+            if not line.endswith("\\ "):
+                line = line.rstrip(" ")
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:]
+            elif line.startswith("\\!") or line.startswith("\\#"):
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            if not line:
+                continue
+            anchored = "/" in line
+            line = line.lstrip("/")
+            pattern = cls._glob_to_regex(line)
+            pattern = ("" if anchored else "(?:.*/)?") + pattern
+            rules.append((pattern, negate, dir_only))
+        if not rules:
+            return None
+
+        def build(selected):
+            if not selected:
+                return None, ()
+            ordered = list(reversed(selected))
+            alternatives = "|".join(f"({pattern})" for pattern, _, _ in ordered)
+            regex = re.compile(f"^(?:{alternatives})$")
+            return regex, tuple(negate for _, negate, _ in ordered)
+
+        file_rules = build([rule for rule in rules if not rule[2]])
+        dir_rules = build(rules)
+        return file_rules, dir_rules
+
+    @staticmethod
+    def match_gitignore(rulesets, sub_path, is_dir):
+        """
+        Check a path (relative to the scanned root, '/' separated) against the active
+        .gitignore rulesets, given as (base, compiled) pairs from the outermost directory
+        to the innermost one. The deepest .gitignore with a matching rule decides.
+        """
+        for base, compiled in reversed(rulesets):
+            if base:
+                if not sub_path.startswith(base + "/"):
+                    continue
+                local_path = sub_path[len(base) + 1:]
+            else:
+                local_path = sub_path
+            regex, negations = compiled[1] if is_dir else compiled[0]
+            if regex is None:
+                continue
+            m = regex.match(local_path)
+            if m is not None:
+                return not negations[m.lastindex - 1]
+        return False
+
+
+class _Inotify:
+    """
+    Minimal inotify binding through ctypes (Linux only).
+    """
+    IN_MODIFY = 0x00000002
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_Q_OVERFLOW = 0x00004000
+    IN_ONLYDIR = 0x01000000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+
+    LISTING_EVENTS = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO
+    CONTENT_EVENTS = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE
+    WATCH_MASK = LISTING_EVENTS | CONTENT_EVENTS | IN_ONLYDIR
+
+    def __init__(self):
+        import ctypes
+        import ctypes.util
+        import select
+        import struct
+        self._ctypes = ctypes
+        self._select = select
+        self._header = struct.Struct("iIII")
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self._libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+
+    def add_watch(self, path):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), self.WATCH_MASK)
+        if wd < 0:
+            errno = self._ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), path)
+        return wd
+
+    def read_events(self, timeout):
+        """
+        Wait up to timeout seconds and return the pending events as (wd, mask, name) tuples.
+        """
+        readable, _, _ = self._select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self.fd, 1024 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = self._header.unpack_from(data, offset)
+            offset += self._header.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            events.append((wd, mask, os.fsdecode(name)))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class IndexWatcher:
+    """
+    Keeps the scan index of a GPTAssist up to date in a background thread, so commands
+    do not have to walk the filesystem again.
+    Uses inotify when available and otherwise polls the stat data of the indexed
+    directories and files. Only directories whose listing changed are scanned again.
+    """
+
+    def __init__(self, assist, interval=1.0):
+        self.assist = assist
+        self.interval = interval
+        self.backend = None
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._inotify = None
+        self._index = None
+        self._config = None
+        # directory path -> [entry, path below the root, rulesets of the parent directories, mtime_ns]
+        self._dirs = {}
+        self._wd_paths = {}
+
+    def start(self):
+        try:
+            self._inotify = _Inotify()
+            self.backend = "inotify"
+        except Exception:
+            self._inotify = None
+            self.backend = f"polling every {self.interval:g}s"
+        with self._lock:
+            self._rebuild()
+        self._thread = threading.Thread(target=self._run, name="gpt-helper-watch", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def get_index(self):
+        """
+        Return a copy of the index taken under the lock. The watcher thread replaces the
+        children of the indexed directories, so a command must not walk the live nodes.
+        """
+        with self._lock:
+            if self._config != self.assist.scan_config():
+                self._rebuild()
+            return [(directory, self._copy_tree(root, directory)) for directory, root in self._index]
+
+    @staticmethod
+    def _copy_tree(root, directory):
+        # The watched tree has absolute paths; the copy gets the paths a scan from the
+        # current directory would give.
+        prefix = len(root.path)
+
+        def copy(node):
+            entry = ScanEntry(node.name, directory + node.path[prefix:], node.rel_path, node.is_dir,
+                              node.size, node.mtime_ns, node.inode)
+            entry.error = node.error
+            return entry
+
+        copied_root = copy(root)
+        stack = [(root, copied_root)]
+        while stack:
+            node, copied = stack.pop()
+            children = []
+            for child in node.children:
+                copied_child = copy(child)
+                if child.is_dir:
+                    stack.append((child, copied_child))
+                children.append(copied_child)
+            copied.children = children
+        return copied_root
+
+    def _rebuild(self):
+        self._dirs = {}
+        self._config = self.assist.scan_config()
+        # Absolute paths, so the background rescans do not depend on the working directory
+        # (which the daemon changes for every request).
+        self._index = self.assist._scan_all(visit=self._register, absolute=True)
+
+    def _register(self, node, node_sub, rulesets):
+        mtime_ns = 0
+        if self._inotify is not None:
+            try:
+                self._wd_paths[self._inotify.add_watch(node.path)] = node.path
+            except OSError:
+                # Out of inotify watches (or the directory vanished), poll from now on.
+                self._switch_to_polling()
+        if self._inotify is None:
+            try:
+                mtime_ns = os.stat(node.path).st_mtime_ns
+            except OSError:
+                pass
+        self._dirs[node.path] = [node, node_sub, rulesets, mtime_ns]
+
+    def _switch_to_polling(self):
+        self._inotify.close()
+        self._inotify = None
+        self._wd_paths = {}
+        self.backend = f"polling every {self.interval:g}s"
+        for info in self._dirs.values():
+            try:
+                info[3] = os.stat(info[0].path).st_mtime_ns
+            except OSError:
+                pass
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if self._inotify is not None:
+                    self._poll_inotify()
+                else:
+                    self._poll_stat()
+            except Exception as e:
+                print(f"Watcher error, rescanning: {e}")
+                with self._lock:
+                    self._rebuild()
+                self._stop.wait(self.interval)
+
+    def _poll_inotify(self):
+        events = self._inotify.read_events(self.interval)
+        if not events:
+            return
+        dirty_dirs = set()
+        dirty_files = set()
+        for wd, mask, name in events:
+            if mask & _Inotify.IN_Q_OVERFLOW:
+                with self._lock:
+                    self._rebuild()
+                return
+            path = self._wd_paths.get(wd)
+            if path is None:
+                continue
+            if mask & _Inotify.LISTING_EVENTS:
+                dirty_dirs.add(path)
+            elif name:
+                dirty_files.add((path, name))
+        self._apply(dirty_dirs, dirty_files)
+
+    def _poll_stat(self):
+        if self._stop.wait(self.interval):
+            return
+        dirty_dirs = set()
+        dirty_files = set()
+        for path, (node, node_sub, rulesets, mtime_ns) in list(self._dirs.items()):
+            try:
+                if os.stat(path).st_mtime_ns != mtime_ns:
+                    dirty_dirs.add(path)
+                    continue
+            except OSError:
+                dirty_dirs.add(os.path.dirname(path))
+                continue
+            for child in node.children:
+                if child.is_dir:
+                    continue
+                try:
+                    st = os.stat(child.path)
+                except OSError:
+                    dirty_dirs.add(path)
+                    break
+                if (st.st_mtime_ns, st.st_size, st.st_ino) != (child.mtime_ns, child.size, child.inode):
+                    dirty_files.add((path, child.name))
+        self._apply(dirty_dirs, dirty_files)
+
+    def _apply(self, dirty_dirs, dirty_files):
+        with self._lock:
+            for path in dirty_dirs:
+                self._rescan_dir(path)
+            for path, name in dirty_files:
+                if name == ".gitignore":
+                    self._rescan_dir(path)
+                elif path not in dirty_dirs:
+                    self._restat_file(path, name)
+
+    def _rescan_dir(self, path):
+        info = self._dirs.get(path)
+        if info is None:
+            return
+        node, node_sub, rulesets = info[0], info[1], info[2]
+        previous = {child.name: child for child in node.children}
+        descend = self.assist._scan_children(node, node_sub, rulesets, previous, visit=self._register)
+        current = {child.name for child in node.children}
+        for name, old in previous.items():
+            if old.is_dir and name not in current:
+                self._forget(old)
+        self.assist._scan_subtrees(descend, visit=self._register)
+
+    def _forget(self, node):
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            self._dirs.pop(node.path, None)
+            stack.extend(child for child in node.children if child.is_dir)
+
+    def _restat_file(self, path, name):
+        info = self._dirs.get(path)
+        if info is None:
+            return
+        node = info[0]
+        children = list(node.children)
+        for i, child in enumerate(children):
+            if child.name == name and not child.is_dir:
+                try:
+                    st = os.stat(child.path)
+                except OSError:
+                    self._rescan_dir(path)
+                    return
+                # A new entry is swapped in, so readers of the old one see consistent data.
+                entry = ScanEntry(child.name, child.path, child.rel_path, False)
+                self.assist._set_stat(entry, st)
+                children[i] = entry
+                node.children = children
+                return
+
+
+class _HTMLText(html.parser.HTMLParser):
+    """
+    Reduces an HTML page to its visible text, one line per block element.
+    """
+    SKIPPED = {"script", "style", "noscript", "template", "svg"}
+    BLOCKS = {"p", "div", "br", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6", "pre", "section",
+              "article", "header", "footer", "blockquote", "table", "ul", "ol", "dt", "dd", "title"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self._parts = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIPPED:
+            self._skip_depth += 1
+        elif tag in self.BLOCKS:
+            self._parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIPPED:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in self.BLOCKS:
+            self._parts.append("\n")
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self._parts.append(data)
+
+    def text(self):
+        lines = (" ".join(line.split()) for line in "".join(self._parts).splitlines())
+        return "\n".join(line for line in lines if line)
+
+
+def html_to_text(markup):
+    parser = _HTMLText()
+    parser.feed(markup)
+    parser.close()
+    return parser.text()
+
+
+class URLFetcher:
+    """
+    Fetches the text of URLs concurrently and keeps it in an on-disk cache.
+    Cached pages are revalidated with ETag / Last-Modified, so unchanged pages
+    are not downloaded again, and are used as they are if the server is unreachable.
+    """
+
+    def __init__(self, cache_dir, timeout=URL_TIMEOUT, max_bytes=URL_MAX_BYTES, concurrency=URL_CONCURRENCY):
+        self.cache_dir = cache_dir
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.concurrency = concurrency
+
+    def fetch_all(self, urls):
+        """
+        Return url -> (text, digest, error) for the given URLs; text and digest
+        are None if the URL could not be fetched and is not cached.
+        """
+        import asyncio
+        if not urls:
+            return {}
+        results = asyncio.run(self._fetch_all(urls))
+        return dict(zip(urls, results))
+
+    async def _fetch_all(self, urls):
+        import asyncio
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def fetch(url):
+            async with semaphore:
+                # urllib blocks, so each request waits on the loop's thread pool.
+                return await loop.run_in_executor(None, self.fetch, url)
+
+        return await asyncio.gather(*(fetch(url) for url in urls))
+
+    def fetch(self, url):
+        import urllib.request
+        import urllib.error
+        cached = self._load(url)
+        headers = {"User-Agent": "gpt_helper"}
+        if cached:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+        try:
+            request = urllib.request.Request(url, headers=headers)
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                body = response.read(self.max_bytes + 1)
+                text = self._to_text(body, response.headers)
+                etag = response.headers.get("ETag")
+                last_modified = response.headers.get("Last-Modified")
+        except urllib.error.HTTPError as e:
+            if e.code == 304 and cached:
+                return unpack_text(cached["text"]), cached["digest"], None
+            return self._fallback(cached, f"HTTP {e.code} {e.reason}")
+        except Exception as e:
+            return self._fallback(cached, str(getattr(e, "reason", e)))
+        if text is None:
+            return None, None, f"binary content ({response.headers.get_content_type()})"
+        digest = hashlib.md5(text.encode("utf-8")).hexdigest()
+        self._store(url, {"url": url, "etag": etag, "last_modified": last_modified,
+                          "digest": digest, "text": pack_text(text)})
+        return text, digest, None
+
+    def _fallback(self, cached, error):
+        if cached:
+            return unpack_text(cached["text"]), cached["digest"], None
+        return None, None, error
+
+    def _to_text(self, body, headers):
+        content_type = headers.get_content_type()
+        truncated = len(body) > self.max_bytes
+        body = body[:self.max_bytes]
+        is_text = content_type.startswith("text/") or content_type.endswith(("json", "xml", "javascript"))
+        if not is_text and looks_binary(body[:SNIFF_BYTES]):
+            return None
+        charset = headers.get_content_charset() or "utf-8"
+        try:
+            text = body.decode(charset, errors="ignore")
+        except LookupError:
+            text = body.decode("utf-8", errors="ignore")
+        if "html" in content_type:
+            text = html_to_text(text)
+        text = text.replace("\r\n", "\n").replace("\r", "\n").strip()
+        if truncated:
+            text += f"\n\n[... truncated after the first {self.max_bytes:,} bytes ...]"
+        return text
+
+    def _cache_path(self, url):
+        return os.path.join(self.cache_dir, hashlib.md5(url.encode("utf-8")).hexdigest() + ".json")
+
+    def _load(self, url):
+        try:
+            with open(self._cache_path(url), "r", encoding="utf-8") as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return cached if cached.get("url") == url else None
+
+    def _store(self, url, data):
+        path = self._cache_path(url)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Written to a temporary file first, so a concurrent reader never sees half a file.
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
+
+
+def default_url_cache_dir():
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "gpt_helper", "urls")
+
+
+def detect_clipboard_command():
+    """
+    Return the argv of the native clipboard tool of this system, or None if
+    there is none and Tk has to be used.
+    """
+    system = platform.system()
+    if system == "Darwin":
+        candidates = [["pbcopy"]]
+    elif system == "Windows":
+        candidates = [["clip"]]
+    else:
+        candidates = [["xclip", "-selection", "clipboard"], ["xsel", "--clipboard", "--input"]]
+        if os.environ.get("WAYLAND_DISPLAY"):
+            candidates.insert(0, ["wl-copy"])
+    for candidate in candidates:
+        if shutil.which(candidate[0]):
+            return candidate
+    return None
+
+
+class ClipboardSink:
+    """
+    Receives the text of a prompt in chunks and puts it on the clipboard.
+    With a command the bytes are streamed to the stdin of that process as they
+    come in; without one the text is collected and handed to Tk at the end.
+    """
+
+    def __init__(self, command=None):
+        self.command = command
+        self.backend = os.path.basename(command[0]) if command else "tk"
+        self.bytes = 0
+        self._started = time.perf_counter()
+        self._parts = None
+        self._process = None
+        # clip.exe only keeps non-ASCII text intact when it is sent as UTF-16.
+        encoding = "utf-16" if self.backend.lower() in ("clip", "clip.exe") else "utf-8"
+        self._encoder = codecs.getincrementalencoder(encoding)()
+        if command:
+            self._process = subprocess.Popen(command, stdin=subprocess.PIPE,
+                                             stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        else:
+            self._parts = []
+
+    def write(self, text):
+        data = self._encoder.encode(text)
+        self.bytes += len(data)
+        if self._process is not None:
+            self._process.stdin.write(data)
+        else:
+            self._parts.append(text)
+
+    def close(self):
+        """
+        Finish the copy and return the seconds it took. Raises OSError if the
+        clipboard tool failed.
+        """
+        if self._process is not None:
+            try:
+                self._process.stdin.close()
+            except BrokenPipeError:
+                pass
+            returncode = self._process.wait()
+            if returncode != 0:
+                raise OSError(f"{self.backend} exited with status {returncode}")
+        else:
+            import tkinter as tk
+            root = tk.Tk()
+            root.withdraw()  # hide the main window
+            root.clipboard_clear()  # clear current clipboard contents
+            root.clipboard_append("".join(self._parts))  # append new text
+            root.update()  # now it stays on the clipboard after the window closes
+            root.destroy()
+        return time.perf_counter() - self._started
+
+    def abort(self):
+        if self._process is not None:
+            self._process.kill()
+            self._process.wait()
+
+
+class SearchIndex:
+    """
+    BM25 inverted index over the paths and contents of the project files.
+    docs maps path -> [digest, length, {term: frequency}] and is what is saved with
+    the context; the postings (term -> {path: frequency}) are rebuilt from it in memory.
+    """
+    K1 = 1.2
+    B = 0.75
+    # Terms of the path count as often as this many occurrences in the content.
+    PATH_WEIGHT = 3
+    _WORD_RE = re.compile(r"[A-Za-z0-9_]+")
+    _PART_RE = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+")
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.postings = collections.defaultdict(dict)
+        self.total_length = 0
+        for path, doc in docs.items():
+            self._add_postings(path, doc)
+
+    @classmethod
+    def term_frequencies(cls, text):
+        """
+        Count the lowercase terms of a text. Identifiers are kept whole and also split into
+        their snake_case and camelCase parts, so 'read_files' matches 'read' and 'files'.
+        """
+        frequencies = collections.Counter()
+        # Each distinct word is split once, however often it occurs.
+        for word, count in collections.Counter(cls._WORD_RE.findall(text)).items():
+            for term in cls._word_terms(word):
+                frequencies[term] += count
+        return frequencies
+
+    @staticmethod
+    @functools.lru_cache(maxsize=65536)
+    def _word_terms(word):
+        lowered = word.lower()
+        terms = [lowered] if len(lowered) > 1 else []
+        parts = SearchIndex._PART_RE.findall(word)
+        if len(parts) > 1:
+            terms.extend(part.lower() for part in parts if len(part) > 1)
+        return tuple(terms)
+
+    @classmethod
+    def document(cls, path, content, digest):
+        frequencies = cls.term_frequencies(content)
+        for term, count in cls.term_frequencies(path).items():
+            frequencies[term] += count * cls.PATH_WEIGHT
+        return [digest, sum(frequencies.values()), dict(frequencies)]
+
+    def add(self, path, doc):
+        self.remove(path)
+        self.docs[path] = doc
+        self._add_postings(path, doc)
+
+    def remove(self, path):
+        doc = self.docs.pop(path, None)
+        if doc is None:
+            return
+        self.total_length -= doc[1]
+        for term in doc[2]:
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.pop(path, None)
+                if not posting:
+                    del self.postings[term]
+
+    def _add_postings(self, path, doc):
+        self.total_length += doc[1]
+        for term, frequency in doc[2].items():
+            self.postings[term][path] = frequency
+
+    def search(self, query, top_k):
+        """
+        Return the top_k (path, score) pairs for the query, best first.
+        """
+        count = len(self.docs)
+        if not count:
+            return []
+        average = self.total_length / count or 1
+        scores = collections.defaultdict(float)
+        for term in self.term_frequencies(query):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1 + (count - len(posting) + 0.5) / (len(posting) + 0.5))
+            for path, frequency in posting.items():
+                norm = self.K1 * (1 - self.B + self.B * self.docs[path][1] / average)
+                scores[path] += idf * frequency * (self.K1 + 1) / (frequency + norm)
+        return heapq.nlargest(top_k, scores.items(), key=lambda item: (item[1], item[0]))
+
+
+class StoredSnapshots(collections.abc.MutableMapping):
+    """
+    The snapshots of a context kept in a ContextStore. Only their digests are loaded
+    up front; the packed contents are read from the store when they are used.
+    Changes are tracked, so the store only writes the snapshots that were added or removed.
+    """
+
+    def __init__(self, store, table):
+        self.store = store
+        self.table = table
+        self._keys = set(store.keys(table))
+        self._loaded = {}
+        self.dirty = set()
+        self.deleted = set()
+
+    def __getitem__(self, key):
+        if key in self._loaded:
+            return self._loaded[key]
+        if key not in self._keys:
+            raise KeyError(key)
+        value = self.store.get(self.table, key)
+        self._loaded[key] = value
+        return value
+
+    def __setitem__(self, key, value):
+        self._loaded[key] = value
+        self._keys.add(key)
+        self.dirty.add(key)
+        self.deleted.discard(key)
+
+    def __delitem__(self, key):
+        if key not in self._keys:
+            raise KeyError(key)
+        self._keys.discard(key)
+        self._loaded.pop(key, None)
+        self.dirty.discard(key)
+        self.deleted.add(key)
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def __iter__(self):
+        return iter(list(self._keys))
+
+    def __len__(self):
+        return len(self._keys)
+
+
+class ContextStore:
+    """
+    A context saved in an SQLite database. The per-file parts of the context are kept
+    in tables of their own and written incrementally: a save only writes the rows that
+    changed since the store was last saved or loaded. The other settings are kept as
+    JSON values in the meta table.
+    """
+    VERSION = 1
+    # context key -> number of value columns
+    TABLES = {"stat_cache": 4, "manifest": 1, "hashes": 1, "token_counts": 1, "dir_hashes": 2, "snapshots": 1,
+              "search_docs": 3, "minified": 4, "outlines": 4}
+    # (table, column) of values that are stored as JSON text
+    JSON_COLUMNS = {("search_docs", 2)}
+    EXTENSIONS = (".db", ".sqlite", ".sqlite3")
+    MAGIC = b"SQLite format 3\0"
+
+    def __init__(self, path):
+        import sqlite3
+        self.path = path
+        self.rows_written = 0
+        self._saved = {}
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            for table, width in self.TABLES.items():
+                columns = ", ".join(f"v{i}" for i in range(width))
+                self.conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, {columns}) WITHOUT ROWID")
+
+    @classmethod
+    def is_store(cls, path):
+        """
+        Tell whether a context path refers to a store: existing files by their header,
+        new ones by their extension.
+        """
+        try:
+            with open(path, "rb") as f:
+                return f.read(len(cls.MAGIC)) == cls.MAGIC
+        except OSError:
+            return path.lower().endswith(cls.EXTENSIONS)
+
+    def keys(self, table):
+        return [row[0] for row in self.conn.execute(f"SELECT key FROM {table}")]
+
+    def get(self, table, key):
+        row = self.conn.execute(f"SELECT v0 FROM {table} WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return row[0]
+
+    def load(self):
+        """
+        Return (project_name, context). Snapshots are returned as StoredSnapshots.
+        """
+        meta = dict(self.conn.execute("SELECT key, value FROM meta"))
+        project_name = json.loads(meta.get("project_name", '""'))
+        context = {key[len("context."):]: json.loads(value) for key, value in meta.items()
+                   if key.startswith("context.")}
+        for table, width in self.TABLES.items():
+            if table == "snapshots":
+                context[table] = StoredSnapshots(self, table)
+                self._saved[table] = None
+                continue
+            columns = ", ".join(f"v{i}" for i in range(width))
+            rows = self.conn.execute(f"SELECT key, {columns} FROM {table}")
+            if width == 1:
+                values = dict(rows)
+            else:
+                values = {row[0]: list(row[1:]) for row in rows}
+            for column in range(width):
+                if (table, column) in self.JSON_COLUMNS:
+                    for value in values.values():
+                        value[column] = json.loads(value[column])
+            context[table] = values
+            self._saved[table] = dict(values)
+        return project_name, context
+
+    def save(self, project_name, context):
+        """
+        Write the context, only touching the table rows that changed. Sets rows_written.
+        """
+        written = 0
+        with self.conn:
+            meta = [("version", json.dumps(self.VERSION)), ("project_name", json.dumps(project_name))]
+            meta.extend((f"context.{key}", json.dumps(value)) for key, value in context.items()
+                        if key not in self.TABLES)
+            self.conn.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", meta)
+            for table, width in self.TABLES.items():
+                current = context.get(table) or {}
+                if isinstance(current, StoredSnapshots) and current.store is self:
+                    upserts = [(key, current[key]) for key in current.dirty]
+                    deletes = list(current.deleted)
+                    current.dirty.clear()
+                    current.deleted.clear()
+                else:
+                    saved = self._saved.get(table)
+                    if saved is None:
+                        self.conn.execute(f"DELETE FROM {table}")
+                        upserts = list(current.items())
+                        deletes = []
+                    else:
+                        # Values are replaced rather than changed in place, so most unchanged
+                        # rows are recognised by identity.
+                        upserts = [(key, value) for key, value in current.items()
+                                   if key not in saved or (saved[key] is not value and saved[key] != value)]
+                        deletes = [key for key in saved if key not in current]
+                    self._saved[table] = dict(current)
+                if deletes:
+                    self.conn.executemany(f"DELETE FROM {table} WHERE key = ?", ((key,) for key in deletes))
+                if upserts:
+                    placeholders = ", ".join("?" * (width + 1))
+                    rows = ((key, value) if width == 1 else (key, *self._encode(table, value))
+                            for key, value in upserts)
+                    self.conn.executemany(f"INSERT OR REPLACE INTO {table} VALUES ({placeholders})", rows)
+                written += len(upserts) + len(deletes)
+        self.rows_written = written
+
+    def _encode(self, table, value):
+        return [json.dumps(item) if (table, column) in self.JSON_COLUMNS else item
+                for column, item in enumerate(value)]
+
+    def close(self):
+        self.conn.close()
+
+
+def _json_default(value):
+    # StoredSnapshots (and any other mapping) are saved to JSON as plain objects.
+    if isinstance(value, collections.abc.Mapping):
+        return dict(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class RunStats:
+    """
+    Phase timers and counters of a single command, shown by -stats.
+    Work done on the reader threads is summed over the threads, so phases can add
+    up to more than the wall time, and nested phases are part of their parent's time.
+    """
+
+    def __init__(self, command=""):
+        self.command = command
+        self.started = time.time()
+        self.wall = 0.0
+        self.phases = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def add_time(self, phase, seconds):
+        with self._lock:
+            self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - started)
+
+    def as_dict(self):
+        return {
+            "command": self.command,
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "wall_s": round(self.wall, 6),
+            "phases_s": {name: round(seconds, 6) for name, seconds in self.phases.items()},
+            "counters": dict(self.counters),
+        }
+
+    def render(self):
+        lines = [f"Last run: {self.command} took {self.wall:.3f}s"]
+        if self.phases:
+            lines.append("Phases:")
+            lines.extend(f"  {name:<26}{seconds:10.3f}s" for name, seconds in self.phases.items())
+        if self.counters:
+            lines.append("Counters:")
+            lines.extend(f"  {name:<26}{value:>11,}" for name, value in self.counters.items())
+        return "\n".join(lines)
+
+
+class GPTAssist:
+    def __init__(self):
+        self.project_name = ""
+        self.context = self.default_context()
+        self._ignore_matcher = None
+        self._budget_summary = None
+        # "minified"/"outlined"/"deduplicated" -> [files, bytes saved, tokens saved] in the last prompt
+        self._prompt_savings = {}
+        # texts of the parts of the last prompt, when prompts are split into parts
+        self._parts = []
+        self._parts_summary = None
+        self._watcher = None
+        self.stats = None
+        self._tracking = False
+        # ContextStore the context was last loaded from or saved to, if it is an SQLite store
+        self._store = None
+        self._search_index = None
+        # (manifest, digest -> paths of the manifest with that content), see manifest_paths()
+        self._manifest_paths = None
+        # absolute path -> [mtime_ns, size, inode, digest] shared with other instances
+        # (see PromptDaemon), or None
+        self.shared_stat_cache = None
+        # Stream prompts are printed to; None for sys.stdout. The one-shot CLI sets it so
+        # that status messages can be sent to stderr.
+        self.prompt_stream = None
+
+    @staticmethod
+    def default_context():
+        return {
+            "url": [],
+            "dir": [],
+            "dir_ignore": [],
+            "hashes": {},
+            "allowed_extensions": {"*": 0},
+            "use_gitignore": False,
+            # list and check the files of git work trees with git instead of walking them
+            "use_git": False,
+            # directory -> [HEAD commit, paths changed against it] at the last update, with use_git
+            "git_state": {},
+            # path -> [mtime_ns, size, inode, digest] of the last time the file was read
+            "stat_cache": {},
+            # number of threads reading files, 0 picks a default from the CPU count
+            "workers": 0,
+            # file that prompts are also written to, empty to disable
+            "prompt_out": "",
+            # estimated tokens a prompt may use, 0 for no limit
+            "token_budget": 0,
+            # directory trees are expanded this deep and show this many entries per directory, 0 for no limit
+            "tree_max_depth": 0,
+            "tree_max_entries": 200,
+            # prompts longer than this are split into parts, 0 for no limit; part_unit is "chars" or "tokens"
+            "part_limit": 0,
+            "part_unit": "chars",
+            # prompt name -> hashes of the parts it was last split into
+            "part_hashes": {},
+            # digest -> estimated tokens of the wrapped file content
+            "token_counts": {},
+            # "full" resends changed files in update prompts, "diff" sends unified diffs
+            "update_mode": "full",
+            # path -> digest of every file at the last update
+            "manifest": {},
+            # digest -> packed content of the files at the last update (diff mode only)
+            "snapshots": {},
+            # directory path -> [Merkle hash, listing hash] at the last update
+            "dir_hashes": {},
+            # content of larger files is cut down to its head and tail, 0 for no cap
+            "max_file_bytes": DEFAULT_MAX_FILE_BYTES,
+            # command the clipboard text is piped to, empty to detect one, "tk" to always use Tk
+            "clipboard_cmd": "",
+            # include the text of the URLs in prompts, instead of just the links
+            "fetch_urls": True,
+            # directory fetched URLs are cached in, empty for the user's cache directory
+            "url_cache_dir": "",
+            # url -> digest of its text at the last update (of the URL itself if fetching is off)
+            "url_digests": {},
+            # file the stats of every command are appended to as JSON lines, empty to disable
+            "trace_file": "",
+            # path -> [digest, length, {term: frequency}] of the files in the search index
+            "search_docs": {},
+            # number of files -prompt-query includes
+            "query_top_k": 10,
+            # send file contents without comments and redundant whitespace
+            "minify": False,
+            # "version:extension:digest" -> [packed minified content, bytes saved, tokens saved, tokens]
+            "minified": {},
+            # files of at least this many bytes are outlined in prompts, 0 outlines all files, -1 none
+            "outline_min_bytes": -1,
+            # "version:extension:digest" -> [packed outline, bytes saved, tokens saved, tokens]
+            "outlines": {},
+            "digest_version": DIGEST_VERSION
+        }
+
+
+    def clipboard_command(self):
+        """
+        Return the argv the clipboard text is piped to, or None to use Tk.
+        """
+        configured = self.context.get("clipboard_cmd", "").strip()
+        if configured.lower() == "tk":
+            return None
+        if configured:
+            return shlex.split(configured)
+        return detect_clipboard_command()
+
+    def open_clipboard(self):
+        """
+        Return a ClipboardSink for the configured backend, falling back to Tk if
+        the clipboard tool cannot be started.
+        """
+        command = self.clipboard_command()
+        if command:
+            try:
+                return ClipboardSink(command)
+            except OSError as e:
+                print(f"Failed to start clipboard command '{shlex.join(command)}', using Tk: {e}")
+        return ClipboardSink()
+
+    def close_clipboard(self, sink):
+        try:
+            elapsed = sink.close()
+            print(f"Data successfully copied to clipboard ({sink.bytes:,} bytes via {sink.backend} "
+                  f"in {elapsed:.3f}s).")
+        except Exception as e:
+            print(f"Failed to copy to clipboard: {e}")
+
+    def copy_to_clipboard(self, data):
+        """
+        Copy a string to the system clipboard, through a native clipboard tool
+        (wl-copy, xclip, xsel, pbcopy, clip) if there is one and Tk otherwise.
+        """
+        sink = self.open_clipboard()
+        try:
+            sink.write(data)
+        except Exception as e:
+            sink.abort()
+            print(f"Failed to copy to clipboard: {e}")
+            return
+        self.close_clipboard(sink)
+
+    def set_clipboard(self, command=None):
+        if command is None:
+            command = input("Enter the command prompts are piped to when copied, e.g. 'xclip -selection clipboard' "
+                            "('tk' for Tk, leave empty to detect one): ").strip()
+        self.context["clipboard_cmd"] = command
+        resolved = self.clipboard_command()
+        if resolved:
+            print(f"Prompts will be copied with '{shlex.join(resolved)}'.")
+        else:
+            print("Prompts will be copied with Tk.")
+
+    @contextlib.contextmanager
+    def track(self, command):
+        """
+        Collect the stats of a command in self.stats. Commands run from within
+        another tracked command are counted as part of it.
+        """
+        if self._tracking:
+            yield self.stats
+            return
+        self.stats = RunStats(command)
+        self._tracking = True
+        started = time.perf_counter()
+        try:
+            yield self.stats
+        finally:
+            self.stats.wall = time.perf_counter() - started
+            self._tracking = False
+            self.export_trace(self.stats)
+
+    def count(self, name, n=1):
+        if self._tracking:
+            self.stats.count(name, n)
+
+    def phase(self, name):
+        if self._tracking:
+            return self.stats.phase(name)
+        return contextlib.nullcontext()
+
+    def print_stats(self):
+        if self.stats is None:
+            print("No command has been run yet.")
+            return
+        print(self.stats.render())
+
+    def set_trace_file(self, path=None):
+        if path is None:
+            path = input("Enter file to append the stats of every command to, as JSON lines (leave empty to disable): ").strip()
+        self.context["trace_file"] = path
+        if path:
+            print(f"Command stats will be appended to '{path}'.")
+        else:
+            print("Command stats will no longer be exported.")
+
+    def export_trace(self, stats):
+        path = self.context.get("trace_file")
+        if not path:
+            return
+        try:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(stats.as_dict()) + "\n")
+        except OSError as e:
+            print(f"Error writing trace file {path}: {e}")
+
+    def print_status(self):
+        print(f"Project Name : {self.project_name}")
+
+        prefix = "-" * 2
+        prefix2 = prefix * 2
+        print("Dirs:")
+        print(prefix, "Allowed paths")
+        for d in self.context["dir"]:
+            print(prefix2, d)
+        print(prefix, "Restricted paths")
+        for d in self.context["dir_ignore"]:
+            print(prefix2, d)
+        print("Urls:")
+        for u in self.context["url"]:
+            print(prefix, u)
+        print("Allowed Extensions:")
+        print(prefix, list(self.context["allowed_extensions"].keys()))
+
+    def add_extension(self, extension=None):
+        if not extension:
+            extension = input(f"Enter extension to add to allowed list:({list(self.context['allowed_extensions'].keys())}): ").strip()
+        if extension not in self.context["allowed_extensions"]:
+            self.context["allowed_extensions"][extension] = 0
+            print(f"Added extension '{extension}' to allowed list.")
+        else:
+            print(f"Extension '{extension}' is already in the allowed list.")
+
+    def remove_extension(self, extension=None):
+        if not extension:
+            extension = input(f"Enter Extension to remove from allowed list:({list(self.context['allowed_extensions'].keys())}): ").strip()
+        if extension in self.context["allowed_extensions"]:
+            del self.context["allowed_extensions"][extension]
+            print(f"Removed extension '{extension}' from allowed list.")
+        else:
+            print(f"Extension '{extension}' not found in allowed list.")
+
+
+    def add_dir(self, dir_path=None):
+        if not dir_path:
+            dir_path = input("Enter directory to add to allowed list: ").strip()
+        if dir_path not in self.context["dir"]:
+            self.context["dir"].append(dir_path)
+            print(f"Added directory '{dir_path}' to allowed list.")
+        else:
+            print(f"Directory '{dir_path}' is already in the allowed list.")
+
+    def remove_dir(self, dir_path=None):
+        if not dir_path:
+            dir_path = input("Enter directory to remove from allowed list: ").strip()
+        if dir_path in self.context["dir"]:
+            self.context["dir"].remove(dir_path)
+            print(f"Removed directory '{dir_path}' from allowed list.")
+        else:
+            print(f"Directory '{dir_path}' not found in allowed list.")
+
+    def add_ignore_dir(self, dir_path=None):
+        if not dir_path:
+            dir_path = input("Enter directory to add to ignore list: ").strip()
+        if dir_path not in self.context["dir_ignore"]:
+            self.context["dir_ignore"].append(dir_path)
+            print(f"Added directory '{dir_path}' to ignore list.")
+        else:
+            print(f"Directory '{dir_path}' is already in the ignore list.")
+
+    def remove_ignore_dir(self, dir_path=None):
+        if not dir_path:
+            dir_path = input("Enter directory to remove from ignore list: ").strip()
+        if dir_path in self.context["dir_ignore"]:
+            self.context["dir_ignore"].remove(dir_path)
+            print(f"Removed directory '{dir_path}' from ignore list.")
+        else:
+            print(f"Directory '{dir_path}' not found in ignore list.")
+
+    def add_url(self, url=None):
+        if not url:
+            url = input("Enter URL to add: ").strip()
+        if url not in self.context["url"]:
+            self.context["url"].append(url)
+            print(f"Added URL '{url}'.")
+        else:
+            print(f"URL '{url}' is already in the list.")
+
+    def remove_url(self, url=None):
+        if not url:
+            url = input("Enter URL to remove: ").strip()
+        if url in self.context["url"]:
+            self.context["url"].remove(url)
+            print(f"Removed URL '{url}'.")
+        else:
+            print(f"URL '{url}' not found in the list.")
+
+    def print_dir_structure(self):
+        """Print a tree-like structure for each allowed directory."""
+        with self.track("printdir"):
+            for directory, root in self.scan():
+                print(f"\nDirectory structure for {directory}:")
+                self._print_tree(root, prefix="")
+
+    def set_fetch_urls(self, value=None):
+        if not value:
+            value = input("Include the content of the URLs in prompts? (on/off): ").strip()
+        self.context["fetch_urls"] = value.lower() in ("on", "true", "yes", "1")
+        print(f"Fetching URL contents: {'on' if self.context['fetch_urls'] else 'off'}.")
+
+    def fetch_urls(self):
+        """
+        Return url -> (text, digest, error) for the URLs of the context. With fetching
+        turned off the text is None and the digest is the hash of the URL itself.
+        """
+        urls = list(self.context["url"])
+        if not self.context.get("fetch_urls", True) or not urls:
+            return {url: (None, self.hash(url), None) for url in urls}
+        cache_dir = self.context.get("url_cache_dir") or default_url_cache_dir()
+        with self.phase("fetch urls"):
+            fetched = URLFetcher(cache_dir).fetch_all(urls)
+        self.count("urls fetched", sum(1 for text, digest, error in fetched.values() if text is not None))
+        return fetched
+
+    def render_urls(self, title, fetched):
+        """
+        Render the URL section of a prompt: a numbered list of the links, followed
+        by the text of every URL that could be fetched.
+        """
+        if not fetched:
+            return ""
+        lines = [f"\n## {title}\n"]
+        for url_index, (url, (text, digest, error)) in enumerate(fetched.items(), 1):
+            note = f" (not fetched: {error})" if error else ""
+            lines.append(f"- {url_index}. {url}{note}\n")
+        for url, (text, digest, error) in fetched.items():
+            if text is not None:
+                lines.append(f"\n### URL: {url}\n\n{self.wrap_content(text)}\n")
+        return "".join(lines)
+
+    def set_gitignore(self, value=None):
+        if not value:
+            value = input("Honor .gitignore files while scanning? (on/off): ").strip()
+        self.context["use_gitignore"] = value.lower() in ("on", "true", "yes", "1")
+        print(f"Honoring .gitignore files: {'on' if self.context['use_gitignore'] else 'off'}.")
+
+    def get_ignore_matcher(self):
+        """
+        Return the compiled matcher for the current ignore list, recompiling it only
+        when the list has changed.
+        """
+        patterns = tuple(self.context["dir_ignore"])
+        if self._ignore_matcher is None or self._ignore_matcher.patterns != patterns:
+            self._ignore_matcher = IgnoreMatcher(patterns)
+        return self._ignore_matcher
+
+    def should_ignore(self, path):
+        """
+        Return True if the given relative path matches any ignore pattern.
+        """
+        return self.get_ignore_matcher().match(path)
+
+    def is_allowed_file(self, name):
+        """
+        Return True if the file name has one of the allowed extensions.
+        """
+        allowed_exts = self.context['allowed_extensions']
+        if "*" in allowed_exts or ".*" in allowed_exts:
+            return True
+        return os.path.splitext(name)[1].lower() in allowed_exts
+
+    def scan(self):
+        """
+        Walk every allowed directory exactly once using os.scandir and return the index
+        as a list of (directory, root ScanEntry) pairs.
+        Entries whose relative path (from the current working directory) matches an ignore
+        pattern are left out of the index, and ignored directories are never descended into.
+        While watch mode is on, the index kept up to date by the watcher is returned instead.
+        """
+        if self._watcher is not None and self._watcher.is_running():
+            self.count("scans served by the watcher")
+            return self._watcher.get_index()
+        with self.phase("scan"):
+            stats = self.stats if self._tracking else None
+            if self.context.get("use_git", False):
+                return self._scan_all_git(stats)
+            return self._scan_all(stats=stats)
+
+    def _scan_all(self, visit=None, stats=None, absolute=False):
+        cwd = os.getcwd()
+        return [(directory, self._scan_directory(os.path.join(cwd, directory) if absolute else directory, cwd, visit, stats))
+                for directory in self.context["dir"]]
+
+    def set_git(self, value=None):
+        if not value:
+            value = input("List and check files of git work trees with git? (on/off): ").strip()
+        self.context["use_git"] = value.lower() in ("on", "true", "yes", "1")
+        print(f"Using git for git work trees: {'on' if self.context['use_git'] else 'off'}.")
+
+    def run_git(self, directory, *args):
+        """
+        Run a git command in the directory and return (output, success).
+        git is started without a shell, so this works the same on every platform.
+        """
+        try:
+            result = subprocess.run(["git", "-C", directory, *args], stdin=subprocess.DEVNULL,
+                                    stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        except OSError as e:
+            # git is not installed.
+            return str(e), False
+        return os.fsdecode(result.stdout), result.returncode == 0
+
+    def _git_paths(self, directory, *args):
+        # Paths printed by a git command run with -z, or None if it failed.
+        output, ok = self.run_git(directory, *args)
+        return [path for path in output.split("\0") if path] if ok else None
+
+    def git_state(self, directory):
+        """
+        Return [HEAD commit, paths changed against it] for a directory in a git work tree,
+        or None if it is not in one (or has no commits yet). Paths are relative to the directory.
+        """
+        head, ok = self.run_git(directory, "rev-parse", "HEAD")
+        if not ok:
+            return None
+        changed = self._git_paths(directory, "diff", "--name-only", "-z", "--relative", "HEAD")
+        untracked = self._git_paths(directory, "ls-files", "-z", "--others", "--exclude-standard")
+        if changed is None or untracked is None:
+            return None
+        return [head.strip(), sorted(set(changed) | set(untracked))]
+
+    def git_changed_paths(self, directory):
+        """
+        Return the paths below the directory that may have changed since the last update:
+        the ones git reports changed against the HEAD commit of that update, untracked ones
+        and the ones that had already changed then. None if this is not known.
+        """
+        state = self.context.get("git_state", {}).get(directory)
+        if state is None:
+            return None
+        head, dirty = state
+        changed = self._git_paths(directory, "diff", "--name-only", "-z", "--relative", head)
+        untracked = self._git_paths(directory, "ls-files", "-z", "--others", "--exclude-standard")
+        if changed is None or untracked is None:
+            return None
+        return set(changed) | set(untracked) | set(dirty)
+
+    def _scan_all_git(self, stats=None):
+        cwd = os.getcwd()
+        index = []
+        for directory in self.context["dir"]:
+            root = self._scan_git(directory, cwd, stats)
+            if root is None:
+                root = self._scan_directory(directory, cwd, stats=stats)
+            index.append((directory, root))
+        return index
+
+    def _scan_git(self, directory, cwd, stats=None):
+        """
+        Build the index of a directory in a git work tree from git ls-files (tracked files and
+        untracked ones that are not ignored), without listing any directory. Only the files git
+        reports as changed since the last update are statted here; the others are marked clean.
+        Returns None if the directory is not in a git work tree.
+        """
+        paths = self._git_paths(directory, "ls-files", "-z", "--cached", "--others", "--exclude-standard")
+        if paths is None:
+            return None
+        changed = self.git_changed_paths(directory)
+        matcher = self.get_ignore_matcher()
+        root = ScanEntry(os.path.basename(directory), directory, os.path.relpath(directory, cwd), True)
+        # path below the root -> directory entry, or None if the directory is ignored
+        nodes = {"": root}
+        ignored = 0
+        match_time = 0.0
+
+        def directory_node(sub_path):
+            node = nodes.get(sub_path, False)
+            if node is not False:
+                return node
+            parent_sub, _, name = sub_path.rpartition("/")
+            parent = directory_node(parent_sub)
+            node = None
+            if parent is not None:
+                rel_path = name if parent.rel_path == "." else os.path.join(parent.rel_path, name)
+                if not matcher.match(rel_path):
+                    node = ScanEntry(name, os.path.join(parent.path, name), rel_path, True)
+                    parent.children.append(node)
+            nodes[sub_path] = node
+            return node
+
+        for sub_path in dict.fromkeys(paths):
+            parent_sub, _, name = sub_path.rpartition("/")
+            parent = directory_node(parent_sub)
+            if parent is None:
+                ignored += 1
+                continue
+            rel_path = name if parent.rel_path == "." else os.path.join(parent.rel_path, name)
+            started = time.perf_counter()
+            is_ignored = matcher.match(rel_path)
+            match_time += time.perf_counter() - started
+            if is_ignored:
+                ignored += 1
+                continue
+            entry = GitScanEntry(name, os.path.join(parent.path, name), rel_path,
+                                 changed is not None and sub_path not in changed)
+            if not entry.clean:
+                try:
+                    self._set_stat(entry, os.stat(entry.path))
+                except OSError:
+                    # Deleted, but still in git's index.
+                    continue
+            parent.children.append(entry)
+        for node in nodes.values():
+            if node is not None:
+                node.children.sort(key=lambda child: child.name)
+        if stats is not None:
+            stats.add_time("ignore matching", match_time)
+            stats.count("files listed by git", len(paths))
+            stats.count("entries ignored", ignored)
+            if changed is not None:
+                stats.count("files changed per git", len(changed))
+        return root
+
+    def scan_config(self):
+        """
+        The settings the index depends on; the watcher rescans when they change.
+        """
+        return (tuple(self.context["dir"]), tuple(self.context["dir_ignore"]),
+                self.context.get("use_gitignore", False), os.getcwd())
+
+    def set_watch(self, value=None):
+        if not value:
+            value = input("Keep the index up to date in the background? (on/off): ").strip()
+        if value.lower() in ("on", "true", "yes", "1"):
+            if self._watcher is not None and self._watcher.is_running():
+                print(f"Already watching ({self._watcher.backend}).")
+                return
+            self._watcher = IndexWatcher(self)
+            self._watcher.start()
+            print(f"Watching {len(self.context['dir'])} directories using {self._watcher.backend}.")
+        else:
+            if self._watcher is not None:
+                self._watcher.stop()
+                self._watcher = None
+            print("Watch mode is off.")
+
+    def _scan_directory(self, directory, cwd, visit=None, stats=None):
+        root = ScanEntry(os.path.basename(directory), directory, os.path.relpath(directory, cwd), True)
+        # Each stack item carries the directory's path below the scanned root and the
+        # .gitignore rulesets that apply to it.
+        self._scan_subtrees([(root, "", ())], visit, stats)
+        return root
+
+    def _scan_subtrees(self, stack, visit=None, stats=None):
+        """
+        Scan the directories of the (entry, path below the root, .gitignore rulesets) stack
+        items and everything below them.
+        """
+        while stack:
+            node, node_sub, rulesets = stack.pop()
+            stack.extend(self._scan_children(node, node_sub, rulesets, visit=visit, stats=stats))
+
+    def _scan_children(self, node, node_sub, rulesets, previous=None, visit=None, stats=None):
+        """
+        List a single directory into node.children.
+        Subdirectories found in previous (name -> entry of an earlier scan) are kept together
+        with their subtree. Returns the stack items of the subdirectories that still need
+        to be scanned. visit(node, node_sub, rulesets) is called before a directory is listed.
+        The work is counted in stats if given (the watcher's background scans are not).
+        """
+        matcher = self.get_ignore_matcher()
+        if visit is not None:
+            visit(node, node_sub, rulesets)
+        try:
+            with os.scandir(node.path) as it:
+                dir_entries = sorted(it, key=lambda e: e.name)
+        except OSError as e:
+            node.error = e
+            node.children = []
+            return []
+        node.error = None
+        if self.context.get("use_gitignore", False):
+            rulesets = self._read_gitignore(node, node_sub, dir_entries, rulesets)
+
+        children = []
+        descend = []
+        ignored = 0
+        gitignored = 0
+        match_time = 0.0
+        for dir_entry in dir_entries:
+            rel_path = dir_entry.name if node.rel_path == "." else os.path.join(node.rel_path, dir_entry.name)
+            started = time.perf_counter()
+            is_ignored = matcher.match(rel_path)
+            match_time += time.perf_counter() - started
+            if is_ignored:
+                ignored += 1
+                continue
+            try:
+                is_dir = dir_entry.is_dir()
+            except OSError:
+                is_dir = False
+            sub_path = node_sub + "/" + dir_entry.name if node_sub else dir_entry.name
+            if rulesets:
+                started = time.perf_counter()
+                is_ignored = IgnoreMatcher.match_gitignore(rulesets, sub_path, is_dir)
+                match_time += time.perf_counter() - started
+                if is_ignored:
+                    gitignored += 1
+                    continue
+            if is_dir:
+                old = previous.get(dir_entry.name) if previous else None
+                if old is not None and old.is_dir:
+                    children.append(old)
+                    continue
+                entry = ScanEntry(dir_entry.name, dir_entry.path, rel_path, True)
+                # Symlinked directories are listed but not followed, like os.walk.
+                if not dir_entry.is_symlink():
+                    descend.append((entry, sub_path, rulesets))
+            else:
+                entry = ScanEntry(dir_entry.name, dir_entry.path, rel_path, False)
+                try:
+                    self._set_stat(entry, dir_entry.stat())
+                except OSError:
+                    pass
+            children.append(entry)
+        # The list is replaced rather than filled in place, so readers of the old list
+        # (e.g. while the watcher updates the index) are not disturbed.
+        node.children = children
+        if stats is not None:
+            stats.add_time("ignore matching", match_time)
+            stats.count("dirs scanned")
+            stats.count("entries listed", len(dir_entries))
+            stats.count("entries ignored", ignored)
+            if gitignored:
+                stats.count("entries gitignored", gitignored)
+        return descend
+
+    def _set_stat(self, entry, st):
+        entry.size = st.st_size
+        entry.mtime_ns = st.st_mtime_ns
+        entry.inode = st.st_ino
+
+    def _read_gitignore(self, node, node_sub, dir_entries, rulesets):
+        """
+        Return the rulesets extended with the directory's own .gitignore, if it has one.
+        """
+        for dir_entry in dir_entries:
+            if dir_entry.name == ".gitignore":
+                try:
+                    with open(dir_entry.path, "r", encoding="utf-8", errors="ignore") as f:
+                        compiled = IgnoreMatcher.compile_gitignore(f.readlines())
+                except OSError:
+                    compiled = None
+                if compiled is not None:
+                    return rulesets + ((node_sub, compiled),)
+                break
+        return rulesets
+
+    def iter_files(self, index):
+        """
+        Yield the file entries of the index that have an allowed extension,
+        in the same depth-first, sorted order as the directory tree.
+        """
+        for directory, root in index:
+            stack = [root]
+            while stack:
+                node = stack.pop()
+                subdirs = []
+                for child in node.children:
+                    if child.is_dir:
+                        subdirs.append(child)
+                    elif self.is_allowed_file(child.name):
+                        yield child
+                stack.extend(reversed(subdirs))
+
+    def _print_tree(self, root, prefix=""):
+        """
+        Prints a tree view of a scanned directory.
+        """
+        for line in self._get_tree(root, prefix):
+            print(line)
+
+    def print_all(self):
+        """
+        Print the directory structure and file contents for all allowed directories,
+        skipping directories that match ignore patterns.
+        Only files with allowed extensions are printed.
+        The file contents are wrapped in triple backticks.
+        """
+        with self.track("print"):
+            self._print_all()
+
+    def _print_all(self):
+        for directory, root in self.scan():
+            # Lay out the directories and files in printing order first, so the
+            # files can be read ahead on the thread pool.
+            layout = []
+            files = []
+            stack = [root]
+            while stack:
+                node = stack.pop()
+                layout.append(node)
+                subdirs = []
+                for child in node.children:
+                    if child.is_dir:
+                        subdirs.append(child)
+                    elif self.is_allowed_file(child.name):
+                        layout.append(child)
+                        files.append(child)
+                stack.extend(reversed(subdirs))
+
+            print(f"\n--- Scanning directory: {directory} ---")
+            contents = self.read_files(files)
+            for item in layout:
+                if item.is_dir:
+                    print(f"\nDirectory: {item.path}")
+                    continue
+                entry, content, digest, error = next(contents)
+                print(f"\n--- {entry.path} ---")
+                if error is None:
+                    # Wrap content in triple backticks for Markdown formatting.
+                    print(self.wrap_content(content))
+                else:
+                    print(f"Error reading file {entry.path}: {error}")
+                print(f"--- End of {entry.path} ---")
+
+    def set_workers(self, workers=None):
+        if not workers:
+            workers = input(f"Enter number of file reading threads (0 for default, current {self.context['workers']}): ").strip()
+        try:
+            workers = int(workers)
+            if workers < 0:
+                raise ValueError("must not be negative")
+        except ValueError as e:
+            print(f"Invalid number of workers '{workers}': {e}")
+            return
+        self.context["workers"] = workers
+        print(f"File reading threads set to {self.get_workers()}.")
+
+    def get_workers(self):
+        workers = self.context.get("workers", 0)
+        if workers <= 0:
+            workers = min(32, (os.cpu_count() or 1) + 4)
+        return workers
+
+    def read_files(self, entries):
+        """
+        Read files on a thread pool and yield (entry, content, digest, error)
+        for each entry, in the order given. Only a bounded number of files is read ahead,
+        so memory does not grow with the number of files.
+        error is None on success, otherwise the exception and content/digest are None.
+        """
+        workers = self.get_workers()
+        if workers == 1:
+            for entry in entries:
+                yield self._read_result(entry, self._load_file, entry)
+            return
+
+        from concurrent.futures import ThreadPoolExecutor
+        entries = iter(entries)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = collections.deque()
+            pending_bytes = 0
+            next_entry = next(entries, None)
+            while pending or next_entry is not None:
+                # Read ahead while both the file count and the byte size of the window allow it.
+                while next_entry is not None and (not pending or (
+                        len(pending) < workers * 4 and pending_bytes + next_entry.size <= READ_AHEAD_BYTES)):
+                    pending.append((next_entry, executor.submit(self._load_file, next_entry)))
+                    pending_bytes += next_entry.size
+                    next_entry = next(entries, None)
+                entry, future = pending.popleft()
+                pending_bytes -= entry.size
+                yield self._read_result(entry, future.result)
+
+    def _read_result(self, entry, load, *args):
+        try:
+            content, digest = load(*args)
+        except Exception as e:
+            self.count("read errors")
+            return entry, None, None, e
+        # The stat cache is only written from the consuming thread.
+        cached = [entry.mtime_ns, entry.size, entry.inode, digest]
+        self.context["stat_cache"][entry.rel_path] = cached
+        if self.shared_stat_cache is not None:
+            self.shared_stat_cache[os.path.abspath(entry.path)] = cached
+        return entry, content, digest, None
+
+    def _load_file(self, entry):
+        """
+        Read a file in bounded chunks and return (content, digest).
+        Binary files are recognised from their first SNIFF_BYTES and replaced by a short note,
+        and files over the size cap keep only their head and tail. Neither is read in full:
+        their digest covers the size, the mtime and the bytes that were read, so a touch
+        counts as a change for them. Other files are hashed by the MD5 of their raw bytes.
+        """
+        max_bytes = self.context.get("max_file_bytes", 0)
+        head_limit = max_bytes // 2 if max_bytes else None
+        read_time = 0.0
+        hash_time = 0.0
+        started = time.perf_counter()
+        with open(entry.path, "rb") as f:
+            st = os.fstat(f.fileno())
+            head = f.read(SNIFF_BYTES)
+            self.count("files read")
+            if looks_binary(head):
+                read_time += time.perf_counter() - started
+                self.count("bytes read", len(head))
+                self._add_read_times(read_time, hash_time, 0.0)
+                self.count("binary files skipped")
+                return f"[binary file, {st.st_size:,} bytes, not shown]", self._sampled_digest(st, head)
+            if max_bytes and st.st_size > max_bytes:
+                head += f.read(max(head_limit - len(head), 0))
+                head = head[:head_limit]
+                tail_bytes = max_bytes - head_limit
+                f.seek(st.st_size - tail_bytes)
+                tail = f.read(tail_bytes)
+                read_time += time.perf_counter() - started
+                self.count("bytes read", len(head) + len(tail))
+                self.count("files truncated")
+                started = time.perf_counter()
+                digest = self._sampled_digest(st, head, tail)
+                hash_time += time.perf_counter() - started
+                started = time.perf_counter()
+                content = self._decode(head) + \
+                    f"\n\n[... truncated: {st.st_size:,} bytes in total, showing the first {len(head):,} " \
+                    f"and the last {len(tail):,} bytes ...]\n\n" + self._decode(tail)
+                self._add_read_times(read_time, hash_time, time.perf_counter() - started)
+                return content, digest
+            md5 = hashlib.md5(head)
+            data = bytearray(head)
+            while True:
+                chunk = f.read(READ_CHUNK_BYTES)
+                hashed = time.perf_counter()
+                read_time += hashed - started
+                if not chunk:
+                    break
+                md5.update(chunk)
+                data += chunk
+                started = time.perf_counter()
+                hash_time += started - hashed
+            self.count("bytes read", len(data))
+
+        started = time.perf_counter()
+        content = self._decode(data)
+        self._add_read_times(read_time, hash_time, time.perf_counter() - started)
+        return content, md5.hexdigest()
+
+    @staticmethod
+    def _sampled_digest(st, *samples):
+        # Digest of a file that is not read in full: its size and mtime stand in for the rest.
+        md5 = hashlib.md5(f"sampled:{st.st_size}:{st.st_mtime_ns}:".encode("ascii"))
+        for sample in samples:
+            md5.update(sample)
+        return md5.hexdigest()
+
+    def _add_read_times(self, read_time, hash_time, decode_time):
+        if self._tracking:
+            self.stats.add_time("read", read_time)
+            self.stats.add_time("hash", hash_time)
+            self.stats.add_time("decode", decode_time)
+
+    def _decode(self, data):
+        # Same result as reading in text mode: undecodable bytes are dropped and newlines normalised.
+        return bytes(data).decode("utf-8", errors="ignore").replace("\r\n", "\n").replace("\r", "\n")
+
+    def set_max_file_size(self, size=None):
+        if not size:
+            size = input(f"Enter the size cap for file contents, e.g. 512K or 2M (0 for no cap, "
+                         f"current {self.context['max_file_bytes']:,} bytes): ").strip()
+        try:
+            max_bytes = parse_size(size)
+        except ValueError as e:
+            print(f"Invalid size '{size}': {e}")
+            return
+        self.context["max_file_bytes"] = max_bytes
+        # Token counts were estimated from content cut at the old cap.
+        self.context["token_counts"] = {}
+        print(f"File contents capped at {max_bytes:,} bytes." if max_bytes else "File contents are not capped.")
+
+    def wrap_content(self, content):
+        return "```\n" + content + "\n```"
+
+    def cached_digest(self, entry):
+        """
+        Return the digest stored in the stat cache for this file if its
+        (mtime_ns, size, inode) have not changed since it was last read, else None.
+        """
+        if entry.clean:
+            # Unchanged according to git since the last update, which recorded its digest.
+            digest = self.context["manifest"].get(entry.rel_path)
+            if digest is not None:
+                self.count("stat cache hits")
+                return digest
+        cached = self.context["stat_cache"].get(entry.rel_path)
+        if cached is not None and cached[0] == entry.mtime_ns and cached[1] == entry.size \
+                and cached[2] == entry.inode:
+            self.count("stat cache hits")
+            return cached[3]
+        if self.shared_stat_cache is not None:
+            # Another instance may have read the file already.
+            cached = self.shared_stat_cache.get(os.path.abspath(entry.path))
+            if cached is not None and cached[0] == entry.mtime_ns and cached[1] == entry.size \
+                    and cached[2] == entry.inode:
+                self.context["stat_cache"][entry.rel_path] = cached
+                self.count("shared stat cache hits")
+                return cached[3]
+        self.count("stat cache misses")
+        return None
+
+    def set_minify(self, value=None):
+        if not value:
+            value = input("Strip comments and redundant whitespace from file contents? (on/off): ").strip()
+        self.context["minify"] = value.lower() in ("on", "true", "yes", "1")
+        print(f"Minifying file contents: {'on' if self.context['minify'] else 'off'}.")
+
+    def minify_key(self, entry, digest):
+        return f"{MINIFY_VERSION}:{os.path.splitext(entry.name)[1].lower()}:{digest}"
+
+    def _minified_record(self, entry, content, digest):
+        """
+        Return the cached [packed content, bytes saved, tokens saved, tokens] of the
+        minified file, minifying it first if this content was not seen before.
+        """
+        minified = self.context["minified"]
+        key = self.minify_key(entry, digest)
+        record = minified.get(key)
+        if record is None:
+            minifier = MINIFIERS.get(os.path.splitext(entry.name)[1].lower(), minify_whitespace)
+            with self.phase("minify"):
+                text = minifier(content)
+            tokens = estimate_tokens(text)
+            record = [pack_text(text), len(content.encode("utf-8")) - len(text.encode("utf-8")),
+                      estimate_tokens(content) - tokens, tokens]
+            minified[key] = record
+            self.count("files minified")
+        return record
+
+    def minify_content(self, entry, content, digest):
+        record = self._minified_record(entry, content, digest)
+        self._add_saving("minified", record)
+        return unpack_text(record[0])
+
+    def _add_saving(self, kind, record):
+        savings = self._prompt_savings.setdefault(kind, [0, 0, 0])
+        savings[0] += 1
+        savings[1] += record[1]
+        savings[2] += record[2]
+
+    def set_outline(self, value=None):
+        if not value:
+            value = input("Outline files of at least this size, e.g. 64K ('on' for 64K, 'all' or 'off'): ").strip()
+        value = value.lower()
+        if value in ("off", "false", "no"):
+            self.context["outline_min_bytes"] = -1
+        elif value == "all":
+            self.context["outline_min_bytes"] = 0
+        elif value in ("on", "true", "yes"):
+            self.context["outline_min_bytes"] = DEFAULT_OUTLINE_BYTES
+        else:
+            try:
+                self.context["outline_min_bytes"] = max(1, parse_size(value))
+            except ValueError:
+                print(f"Invalid size '{value}', use off, on, all or a size such as 64K.")
+                return
+        min_bytes = self.context["outline_min_bytes"]
+        if min_bytes < 0:
+            print("Outlining files: off.")
+        elif min_bytes == 0:
+            print("Outlining all source files.")
+        else:
+            print(f"Outlining source files of at least {min_bytes:,} bytes.")
+
+    def outlines_file(self, entry):
+        """
+        Whether the file is sent as an outline: outlines are on, an outliner exists for
+        its extension and it is at least as large as the configured size.
+        """
+        min_bytes = self.context.get("outline_min_bytes", -1)
+        return 0 <= min_bytes <= entry.size and os.path.splitext(entry.name)[1].lower() in OUTLINERS
+
+    def outline_key(self, entry, digest):
+        return f"{OUTLINE_VERSION}:{os.path.splitext(entry.name)[1].lower()}:{digest}"
+
+    def _outline_record(self, entry, digest):
+        """
+        Return the cached [packed outline, bytes saved, tokens saved, tokens] of the file
+        with this digest, or None if the file is not outlined or its outline is not cached.
+        Files without any declarations have an empty outline, and files whose outline (with
+        its note) is not smaller than their content are sent as they are.
+        """
+        if digest is None or not self.outlines_file(entry):
+            return None
+        record = self.context["outlines"].get(self.outline_key(entry, digest))
+        if record is None or not record[0] or record[2] <= estimate_tokens(self.outline_note(entry)):
+            return None
+        return record
+
+    def outline_note(self, entry):
+        return f"[outline: declarations and docstrings only, {entry.size:,} bytes in full]\n"
+
+    def prepare_outlines(self, entries, digests=None):
+        """
+        Compute the outlines of the given files that are not cached for their current digest.
+        Parsing runs in a process pool when there are enough files, with a bounded number
+        of file contents waiting for a worker.
+        digests (rel_path -> cached digest) is filled in for all the files, with the digests
+        of the files read here, so the caller does not look them up again.
+        """
+        if digests is None:
+            digests = {}
+        outlines = self.context["outlines"]
+        pending = []
+        for entry in entries:
+            if entry.rel_path not in digests:
+                digests[entry.rel_path] = self.cached_digest(entry)
+            if self.outlines_file(entry):
+                digest = digests[entry.rel_path]
+                if digest is None or self.outline_key(entry, digest) not in outlines:
+                    pending.append(entry)
+        if not pending:
+            return
+
+        def store(entry, content_bytes, digest, result):
+            digests[entry.rel_path] = digest
+            outline, content_tokens, tokens = result
+            outline_bytes = len(outline.encode("utf-8"))
+            outlines[self.outline_key(entry, digest)] = [pack_text(outline), content_bytes - outline_bytes,
+                                                         content_tokens - tokens, tokens]
+            self.count("files outlined")
+
+        reads = self.read_files(pending)
+        with self.phase("outline"):
+            if len(pending) < OUTLINE_POOL_MIN_FILES:
+                for entry, content, digest, error in reads:
+                    if error is None:
+                        ext = os.path.splitext(entry.name)[1].lower()
+                        store(entry, len(content.encode("utf-8")), digest, outline_source(ext, content))
+                return
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            workers = os.cpu_count() or 1
+            waiting = collections.deque()
+            # The reader threads are running, so the workers are spawned rather than forked.
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+                for entry, content, digest, error in reads:
+                    if error is not None:
+                        continue
+                    ext = os.path.splitext(entry.name)[1].lower()
+                    waiting.append((entry, len(content.encode("utf-8")), digest, pool.submit(outline_source, ext, content)))
+                    while len(waiting) > workers * 4:
+                        entry, content_bytes, digest, future = waiting.popleft()
+                        store(entry, content_bytes, digest, future.result())
+                while waiting:
+                    entry, content_bytes, digest, future = waiting.popleft()
+                    store(entry, content_bytes, digest, future.result())
+
+    def read_prompt_files(self, entries, dedup=False, digests=None):
+        """
+        Like read_files, for contents that go into prompts. Large source files are sent
+        as outlines when outlines are on, other contents are minified when minification
+        is on. Files whose outline or minified content is cached for their current digest
+        are not read at all.
+        With dedup, files whose cached digest matches the one of an earlier file are not
+        read either, and are yielded with None as their content.
+        digests (rel_path -> cached digest) holds the digests the caller already looked up.
+        """
+        minify = self.context.get("minify")
+        outline = self.context.get("outline_min_bytes", -1) >= 0
+        if not minify and not outline and not dedup:
+            yield from self.read_files(entries)
+            return
+        minified = self.context["minified"]
+        entries = list(entries)
+        if digests is None:
+            digests = {}
+        if outline:
+            self.prepare_outlines(entries, digests)
+        hits = {}
+        seen = set()
+        for entry in entries:
+            digest = digests[entry.rel_path] if entry.rel_path in digests else self.cached_digest(entry)
+            if dedup and digest is not None:
+                if digest in seen:
+                    hits[entry.rel_path] = ("duplicate", None, digest)
+                    continue
+                seen.add(digest)
+            record = self._outline_record(entry, digest)
+            if record is not None:
+                hits[entry.rel_path] = ("outlined", record, digest)
+            elif digest is not None and minify and self.minify_key(entry, digest) in minified:
+                hits[entry.rel_path] = ("minified", minified[self.minify_key(entry, digest)], digest)
+        reads = self.read_files([entry for entry in entries if entry.rel_path not in hits])
+        for entry in entries:
+            hit = hits.get(entry.rel_path)
+            if hit is None:
+                entry, content, digest, error = next(reads)
+                if error is not None:
+                    yield entry, None, None, error
+                    continue
+                if minify:
+                    content = self.minify_content(entry, content, digest)
+                yield entry, content, digest, None
+                continue
+            kind, record, digest = hit
+            if kind == "duplicate":
+                yield entry, None, digest, None
+                continue
+            self.count("outline cache hits" if kind == "outlined" else "minify cache hits")
+            self._add_saving(kind, record)
+            content = unpack_text(record[0])
+            if kind == "outlined":
+                content = self.outline_note(entry) + content
+            yield entry, content, digest, None
+
+    def render_file_sections(self, entries, heading="### File", skip=None, digests=None):
+        """
+        Generate the sections of the files in a prompt, leaving out files for which
+        skip(entry, digest) is true. A file with the same content as an earlier section
+        is rendered as a reference to that section instead of being sent again.
+        digests (rel_path -> digest) holds the digests the caller already knows.
+        """
+        entries = list(entries)
+        # digest -> (path, tokens of the content if other files share it) of the files shown
+        shown = {}
+        known = digests or {}
+        digests = {entry.rel_path: known[entry.rel_path] if entry.rel_path in known else self.cached_digest(entry)
+                   for entry in entries}
+        if self.context.get("outline_min_bytes", -1) >= 0:
+            # Outlining reads the files it has no outline for, which makes their digests known,
+            # so it runs before the files sharing a digest are counted.
+            self.prepare_outlines(entries, digests)
+        shared = collections.Counter(digest for digest in digests.values() if digest is not None)
+        for entry, content, digest, error in self.read_prompt_files(entries, dedup=True, digests=digests):
+            if error is None and skip is not None and skip(entry, digest):
+                continue
+            if error is None and content is None and digest not in shown:
+                # The earlier file with this content was not shown after all.
+                entry, content, digest, error = next(self.read_prompt_files([entry]))
+            if error is not None:
+                continue
+            if digest in shown:
+                path, tokens = shown[digest]
+                if tokens is None:
+                    tokens = estimate_tokens(content)
+                self._add_saving("deduplicated", [None, entry.size, tokens])
+                yield f"\n{heading}: {entry.rel_path}\n\nIdentical to {path}.\n"
+                continue
+            shown[digest] = (entry.rel_path, estimate_tokens(content) if shared[digest] > 1 else None)
+            # One chunk per file, so that prompts split into parts only end between files.
+            yield f"""\n{heading}: {entry.rel_path}\n\n{self.wrap_content(content)}\n"""
+
+    def print_prompt_summary(self):
+        for kind, (files, saved_bytes, saved_tokens) in self._prompt_savings.items():
+            print(f"{kind.capitalize()} {files} files, saving {saved_bytes:,} bytes (~{saved_tokens:,} tokens).")
+        if self._budget_summary:
+            print(self._budget_summary)
+        if self._parts_summary:
+            print(self._parts_summary)
+
+    def read_file_contents(self, index=None):
+        if index is None:
+            index = self.scan()
+
+        results = []
+        for entry, content, digest, error in self.read_prompt_files(self.iter_files(index)):
+            if error is None:
+                results.append((entry.rel_path, self.wrap_content(content)))
+        return results
+
+    def read_directory_contents(self, index=None):
+        """
+        Create a string of all possible file directories and return that string.
+        It is similar to the output of the print_dir_structure command.
+        """
+        if index is None:
+            index = self.scan()
+        result_lines = []
+        for directory, root in index:
+            result_lines.append(f"Directory structure for {directory}:")
+            result_lines.extend(self._get_tree(root, prefix=""))
+        return "\n".join(result_lines)
+
+    def _get_tree(self, root, prefix=""):
+        """
+        Collect a tree view of a scanned directory as a list of strings.
+        Ignored entries are already left out of the index. Directories with more than
+        tree_max_entries entries show the first ones and a summary of the rest, and
+        directories below tree_max_depth are summarized instead of expanded.
+        The tree is walked with a stack of generators, so deep trees do not recurse.
+        """
+        max_depth = self.context.get("tree_max_depth", 0)
+        max_entries = self.context.get("tree_max_entries", 0)
+        lines = []
+        # Print the root directory name only once at the top.
+        if prefix == "":
+            lines.append(root.name + "/")
+        stack = [self._tree_lines(root, prefix, 1, max_depth, max_entries)]
+        while stack:
+            item = next(stack[-1], None)
+            if item is None:
+                stack.pop()
+                continue
+            line, subtree = item
+            lines.append(line)
+            if subtree is not None:
+                stack.append(subtree)
+        return lines
+
+    def _tree_lines(self, node, prefix, depth, max_depth, max_entries):
+        """
+        Yield (line, generator of the lines below it or None) for the entries of a directory
+        at the given depth (1 for the entries of the root).
+        """
+        if node.error is not None:
+            yield prefix + "Error accessing directory: " + str(node.error), None
+            return
+        entries = node.children
+        hidden = []
+        if max_entries and len(entries) > max_entries:
+            entries, hidden = entries[:max_entries], entries[max_entries:]
+        for i, entry in enumerate(entries):
+            last = i == len(entries) - 1 and not hidden
+            connector = "└── " if last else "├── "
+            if not entry.is_dir:
+                yield prefix + connector + entry.name, None
+            elif max_depth and depth >= max_depth and entry.children:
+                yield prefix + connector + entry.name + "/ … " + self._tree_summary(entry.children, True), None
+            else:
+                new_prefix = prefix + ("    " if last else "│   ")
+                yield prefix + connector + entry.name + "/", \
+                    self._tree_lines(entry, new_prefix, depth + 1, max_depth, max_entries)
+        if hidden:
+            yield prefix + "└── … " + self._tree_summary(hidden, False, "more "), None
+
+    def _tree_summary(self, entries, recursive, more=""):
+        """
+        Summarize entries left out of a tree, e.g. "4,812 more files (3.1 MB, *.json)".
+        With recursive the files and directories below the entries are counted as well.
+        Sizes come from the index, so this does not stat anything.
+        """
+        files = dirs = size = 0
+        extensions = collections.Counter()
+        stack = list(entries)
+        while stack:
+            entry = stack.pop()
+            if entry.is_dir:
+                dirs += 1
+                if recursive:
+                    stack.extend(entry.children)
+                continue
+            files += 1
+            size += entry.size if not entry.clean else self._entry_size(entry)
+            dot = entry.name.rfind(".")
+            if dot > 0:
+                extensions[entry.name[dot:].lower()] += 1
+        counts = []
+        if files:
+            counts.append(f"{files:,} {more}{'file' if files == 1 else 'files'}")
+        if dirs:
+            counts.append(f"{dirs:,} {more}{'directory' if dirs == 1 else 'directories'}")
+        details = [format_size(size)] if files else []
+        details.extend("*" + extension for extension, n in extensions.most_common(3))
+        summary = (" in " if recursive else " and ").join(counts)
+        return f"{summary} ({', '.join(details)})" if details else summary
+
+    def _entry_size(self, entry):
+        # Files git reports unchanged have not been statted; their size is in the stat cache.
+        if entry.clean:
+            cached = self.context["stat_cache"].get(entry.rel_path)
+            return cached[1] if cached is not None else 0
+        return entry.size
+
+    def set_tree_depth(self, depth=None):
+        if not depth:
+            depth = input(f"Enter the depth directory trees are expanded to (0 for no limit, "
+                          f"current {self.context['tree_max_depth']}): ").strip()
+        try:
+            depth = int(depth)
+            if depth < 0:
+                raise ValueError("must not be negative")
+        except ValueError as e:
+            print(f"Invalid tree depth '{depth}': {e}")
+            return
+        self.context["tree_max_depth"] = depth
+        print(f"Directory trees are expanded {depth} levels deep." if depth else "Directory trees are fully expanded.")
+
+    def set_tree_entries(self, entries=None):
+        if not entries:
+            entries = input(f"Enter the number of entries shown per directory (0 for no limit, "
+                            f"current {self.context['tree_max_entries']}): ").strip()
+        try:
+            entries = int(entries)
+            if entries < 0:
+                raise ValueError("must not be negative")
+        except ValueError as e:
+            print(f"Invalid number of entries '{entries}': {e}")
+            return
+        self.context["tree_max_entries"] = entries
+        print(f"Directory trees show up to {entries} entries per directory." if entries
+              else "Directory trees show all entries.")
+
+    def set_prompt_out(self, path=None):
+        if path is None:
+            path = input("Enter file to also write prompts to (leave empty to disable): ").strip()
+        self.context["prompt_out"] = path
+        if path:
+            print(f"Prompts will also be written to '{path}'.")
+        else:
+            print("Prompts will no longer be written to a file.")
+
+    def stream_prompt(self, chunks, print_it=True, copy_it=False, name="prompt", part=None):
+        """
+        Write the chunks of a prompt, as they are generated, to stdout, to the
+        prompt_out file and/or to the clipboard.
+        With a part limit the prompt is split into parts instead (see write_parts).
+        """
+        self._parts_summary = None
+        if self.context.get("part_limit", 0):
+            self.write_parts(self.split_parts(chunks), name, print_it, copy_it, part)
+            return
+        writers = []
+        stream = self.prompt_stream or sys.stdout
+        if print_it:
+            writers.append(stream.write)
+        prompt_out = self.context.get("prompt_out")
+        out_file = None
+        if prompt_out:
+            try:
+                out_file = open(prompt_out, "w", encoding="utf-8")
+                writers.append(out_file.write)
+            except Exception as e:
+                print(f"Error opening prompt output file {prompt_out}: {e}")
+        clipboard = None
+        if copy_it:
+            clipboard = self.open_clipboard()
+
+        generate_time = 0.0
+        output_time = 0.0
+        clipboard_time = 0.0
+        size = 0
+        try:
+            chunks = iter(chunks)
+            while True:
+                started = time.perf_counter()
+                chunk = next(chunks, None)
+                written = time.perf_counter()
+                generate_time += written - started
+                if chunk is None:
+                    break
+                size += len(chunk)
+                for write in writers:
+                    write(chunk)
+                copied = time.perf_counter()
+                output_time += copied - written
+                if clipboard is not None:
+                    try:
+                        clipboard.write(chunk)
+                    except OSError as e:
+                        # The clipboard tool went away; keep writing the other outputs.
+                        print(f"Failed to copy to clipboard: {e}")
+                        clipboard.abort()
+                        clipboard = None
+                    clipboard_time += time.perf_counter() - copied
+        except BaseException:
+            if clipboard is not None:
+                clipboard.abort()
+            raise
+        finally:
+            if out_file is not None:
+                out_file.close()
+        if self._tracking:
+            # Generating includes scanning and reading, which are also reported on their own.
+            self.stats.add_time("generate prompt", generate_time)
+            self.stats.add_time("write output", output_time)
+            self.count("prompt characters", size)
+        if print_it:
+            stream.write("\n")
+        if out_file is not None:
+            print(f"Prompt written to {prompt_out}.")
+        if clipboard is not None:
+            started = time.perf_counter()
+            self.close_clipboard(clipboard)
+            clipboard_time += time.perf_counter() - started
+        if self._tracking and copy_it:
+            self.stats.add_time("clipboard", clipboard_time)
+
+    def set_part_limit(self, limit=None):
+        if not limit:
+            limit = input("Split prompts into parts of at most this many characters, or tokens with a 't' suffix "
+                          f"(e.g. 8000t, 0 for no limit, current {self.context['part_limit']} "
+                          f"{self.context['part_unit']}): ").strip()
+        text = limit.strip().lower()
+        unit = "chars"
+        for suffix in ("tokens", "token", "t"):
+            if text.endswith(suffix):
+                text = text[:-len(suffix)].strip()
+                unit = "tokens"
+                break
+        try:
+            value = int(text)
+            if value < 0:
+                raise ValueError("must not be negative")
+            if value and value < MIN_PART_LIMIT:
+                raise ValueError(f"must be at least {MIN_PART_LIMIT}")
+        except ValueError as e:
+            print(f"Invalid part limit '{limit}': {e}")
+            return
+        self.context["part_limit"] = value
+        self.context["part_unit"] = unit
+        print(f"Prompts are split into parts of at most {value:,} {'tokens' if unit == 'tokens' else 'characters'}."
+              if value else "Prompts are not split into parts.")
+
+    def _part_measure(self):
+        return token_weight if self.context.get("part_unit") == "tokens" else len
+
+    @staticmethod
+    def part_header(number, count):
+        if number < count:
+            return f"[Part {number} of {count}. More parts follow; only reply \"OK\" until the last part.]\n\n"
+        return f"[Part {number} of {count}, the last part.]\n\n"
+
+    def _prompt_sections(self, chunks, limit, measure):
+        """
+        Yield (text, size) for the sections of a prompt, one per chunk of the render generators
+        (a file, the directory structure, ...). Sections over the limit are cut at line
+        boundaries, and lines that are too long on their own are cut into slices; a cut inside
+        a code block closes it, and the next piece reopens it under the section's heading.
+        """
+        for chunk in chunks:
+            if not chunk:
+                continue
+            size = measure(chunk)
+            if size <= limit:
+                yield chunk, size
+                continue
+            heading = chunk.lstrip("\n").split("\n", 1)[0] if chunk.lstrip("\n").startswith("#") else None
+            continued = f"\n{heading} (continued)\n\n" if heading else ""
+            # Room for closing a code block, which needs a line of its own after a cut line.
+            closing = measure("\n```\n")
+            max_line = max(limit - measure(continued + "```\n") - closing, 1)
+            piece = []
+            piece_size = 0
+            in_code = False
+            # Whether the next text starts a line, rather than continuing a cut one.
+            line_start = True
+            for line in chunk.splitlines(keepends=True):
+                for text in self._cut_line(line, max_line, measure):
+                    text_size = measure(text)
+                    if piece and piece_size + text_size + closing > limit:
+                        if in_code:
+                            piece.append("```\n" if line_start else "\n```\n")
+                        yield "".join(piece), measure("".join(piece))
+                        piece = [continued] if heading else []
+                        if in_code:
+                            piece.append("```\n")
+                        piece_size = measure("".join(piece))
+                    if line_start and text.startswith("```"):
+                        in_code = not in_code
+                    piece.append(text)
+                    piece_size += text_size
+                    line_start = text.endswith("\n")
+            if piece:
+                yield "".join(piece), measure("".join(piece))
+
+    @staticmethod
+    def _cut_line(line, max_size, measure):
+        """
+        Return the line, or slices of it that each measure at most max_size if it is longer.
+        """
+        slices = []
+        while measure(line) > max_size:
+            # The longest prefix that fits, found by bisection.
+            low, high = 1, len(line)
+            while low < high:
+                middle = (low + high + 1) // 2
+                if measure(line[:middle]) <= max_size:
+                    low = middle
+                else:
+                    high = middle - 1
+            slices.append(line[:low])
+            line = line[low:]
+        if line:
+            slices.append(line)
+        return slices
+
+    @staticmethod
+    def _is_part_anchor(text):
+        # Decided by the first line only (e.g. "### File: path"), not by the content.
+        first_line = text.lstrip("\n").split("\n", 1)[0]
+        return int(hashlib.md5(first_line.encode("utf-8")).hexdigest()[:8], 16) % PART_ANCHOR_EVERY == 0
+
+    def split_parts(self, chunks):
+        """
+        Split the chunks of a prompt into parts under the part limit and return their texts.
+        Parts end between sections, or inside a section that does not fit in a part of its own.
+        When a part overflows it is cut before the last anchor section in it (one in about
+        PART_ANCHOR_EVERY, picked by the hash of their heading) rather than right at the
+        overflow, so that after a small edit the later parts usually keep their boundaries.
+        """
+        limit = self.context["part_limit"]
+        measure = self._part_measure()
+        # Room is left for the part header and for closing a code block.
+        budget = limit - measure(self.part_header(998, 999) + "```\n")
+        parts = []
+        current = []
+        current_size = 0
+        for text, size in self._prompt_sections(chunks, budget, measure):
+            if current and current_size + size > budget:
+                anchors = [i for i in range(1, len(current)) if self._is_part_anchor(current[i][0])]
+                cut = anchors[-1] if anchors else len(current)
+                parts.append(current[:cut])
+                current = current[cut:]
+                current_size = sum(item[1] for item in current)
+                if current and current_size + size > budget:
+                    parts.append(current)
+                    current, current_size = [], 0
+            current.append((text, size))
+            current_size += size
+        if current:
+            parts.append(current)
+        texts = []
+        for part in parts:
+            text = "".join(text for text, size in part).lstrip("\n")
+            # A part that ends inside a cut line is left as it is, without a newline added to the line.
+            texts.append(text.rstrip("\n") + "\n" if text.endswith("\n") else text)
+        return texts
+
+    def write_parts(self, parts, name, print_it=True, copy_it=False, part=None):
+        """
+        Number the parts of a prompt and write them to stdout and/or the prompt_out file
+        (plus one file per part next to it). Reports which parts changed since the prompt
+        was last split. With copy_it the parts are copied one by one, waiting for Enter
+        in between; part (1-based) limits the output to a single part.
+        """
+        count = len(parts)
+        hashes = [hashlib.md5(text.encode("utf-8")).hexdigest() for text in parts]
+        old_hashes = set(self.context["part_hashes"].get(name, []))
+        changed = [i for i, h in enumerate(hashes, 1) if h not in old_hashes]
+        self.context["part_hashes"][name] = hashes
+        texts = []
+        for i, text in enumerate(parts, 1):
+            texts.append(text if count == 1 else self.part_header(i, count) + text)
+        self._parts = texts
+        self._parts_summary = f"Prompt split into {count} parts; " + (
+            f"changed since the last time: {', '.join(map(str, changed))}." if changed and len(changed) < count
+            else "all of them changed." if changed else "none of them changed.")
+        selected = range(1, count + 1)
+        if part is not None:
+            if not 1 <= part <= count:
+                print(f"There is no part {part}; the prompt has {count} parts.")
+                return
+            selected = [part]
+
+        if print_it:
+            stream = self.prompt_stream or sys.stdout
+            for i in selected:
+                stream.write(texts[i - 1] + "\n")
+        prompt_out = self.context.get("prompt_out")
+        if prompt_out:
+            root, ext = os.path.splitext(prompt_out)
+            try:
+                with open(prompt_out, "w", encoding="utf-8") as f:
+                    f.write("\n".join(texts[i - 1] for i in selected))
+                if count > 1:
+                    for i in selected:
+                        with open(f"{root}.part{i}{ext}", "w", encoding="utf-8") as f:
+                            f.write(texts[i - 1])
+                print(f"Prompt written to {prompt_out}" + (f" and {root}.part<N>{ext}." if count > 1 else "."))
+            except OSError as e:
+                print(f"Error writing prompt output file {prompt_out}: {e}")
+        if copy_it:
+            self.copy_parts(selected)
+
+    def copy_parts(self, numbers):
+        """
+        Copy the given parts of the last prompt to the clipboard one after the other,
+        asking before each part after the first.
+        """
+        count = len(self._parts)
+        for n, i in enumerate(numbers):
+            if n:
+                try:
+                    answer = input(f"Press Enter to copy part {i} of {count}, or 'q' to stop: ").strip().lower()
+                except EOFError:
+                    break
+                if answer == "q":
+                    break
+            self.copy_to_clipboard(self._parts[i - 1])
+            if count > 1:
+                print(f"Part {i} of {count} copied to the clipboard.")
+
+    def copy_part(self, number=None):
+        if not self._parts:
+            print("No prompt has been split into parts yet.")
+            return
+        if not number:
+            number = input(f"Enter the part to copy (1-{len(self._parts)}): ").strip()
+        try:
+            number = int(number)
+            if not 1 <= number <= len(self._parts):
+                raise ValueError(f"must be between 1 and {len(self._parts)}")
+        except ValueError as e:
+            print(f"Invalid part '{number}': {e}")
+            return
+        self.copy_parts([number])
+
+    def set_token_budget(self, budget=None):
+        if not budget:
+            budget = input(f"Enter token budget for prompts (0 for no limit, current {self.context['token_budget']}): ").strip()
+        try:
+            budget = int(budget)
+            if budget < 0:
+                raise ValueError("must not be negative")
+        except ValueError as e:
+            print(f"Invalid token budget '{budget}': {e}")
+            return
+        self.context["token_budget"] = budget
+        print(f"Token budget set to {budget if budget else 'no limit'}.")
+
+    def measure_files(self, entries, digests=None):
+        """
+        Return (entry, digest, tokens) for every readable file.
+        Digests come from the stat cache and token counts from the digest-keyed
+        token_counts cache, so only new or changed files are read (and then dropped).
+        The digests are also recorded in digests (rel_path -> digest) if given.
+        """
+        token_counts = self.context["token_counts"]
+        minify = self.context.get("minify")
+        minified = self.context["minified"]
+        wrapper_tokens = estimate_tokens(self.wrap_content(""))
+        measured = []
+        stale = []
+        if digests is None:
+            digests = {}
+        if self.context.get("outline_min_bytes", -1) >= 0:
+            entries = list(entries)
+            self.prepare_outlines(entries, digests)
+        for entry in entries:
+            if entry.rel_path not in digests:
+                digests[entry.rel_path] = self.cached_digest(entry)
+            digest = digests[entry.rel_path]
+            record = self._outline_record(entry, digest)
+            if record is not None:
+                measured.append((entry, digest, record[3] + estimate_tokens(self.outline_note(entry)) + wrapper_tokens))
+            elif digest is not None and minify and self.minify_key(entry, digest) in minified:
+                measured.append((entry, digest, minified[self.minify_key(entry, digest)][3] + wrapper_tokens))
+            elif digest is not None and not minify and digest in token_counts:
+                measured.append((entry, digest, token_counts[digest]))
+            else:
+                stale.append(entry)
+        self.count("token count cache hits", len(measured))
+        for entry, content, digest, error in self.read_files(stale):
+            if error is not None:
+                continue
+            digests[entry.rel_path] = digest
+            if minify:
+                measured.append((entry, digest, self._minified_record(entry, content, digest)[3] + wrapper_tokens))
+                continue
+            if digest not in token_counts:
+                token_counts[digest] = estimate_tokens(content) + wrapper_tokens
+            measured.append((entry, digest, token_counts[digest]))
+        return measured
+
+    def pack_budget(self, measured, budget, heading):
+        """
+        Choose the files that fit in the token budget.
+        Files are taken in priority order: explicitly allowed extensions first
+        (rather than ones allowed through '*'), then files changed since the last update,
+        then smaller files. Returns (selected paths, omitted (path, tokens) pairs, used tokens).
+        """
+        allowed_exts = self.context["allowed_extensions"]
+        manifest = self.context["manifest"]
+
+        def priority(item):
+            entry, digest, tokens = item
+            explicit = os.path.splitext(entry.name)[1].lower() in allowed_exts
+            return (not explicit, manifest.get(entry.rel_path) == digest, tokens, entry.rel_path)
+
+        selected = set()
+        selected_digests = set()
+        omitted = []
+        used = 0
+        for entry, digest, tokens in sorted(measured, key=priority):
+            # Only one file with a given content is sent, the others refer to it.
+            cost = estimate_tokens(f"\n{heading}: {entry.rel_path}\n\n\n")
+            if digest in selected_digests:
+                cost += estimate_tokens("Identical to ") + estimate_tokens(entry.rel_path)
+            else:
+                cost += tokens
+            if used + cost <= budget:
+                selected.add(entry.rel_path)
+                selected_digests.add(digest)
+                used += cost
+            else:
+                omitted.append((entry.rel_path, tokens))
+        return selected, omitted, used
+
+    def render_omitted(self, omitted):
+        lines = ["\n## Omitted Files (over token budget)\n"]
+        for path, tokens in omitted[:MAX_OMITTED_LISTED]:
+            lines.append(f"- {path} (~{tokens:,} tokens)\n")
+        if len(omitted) > MAX_OMITTED_LISTED:
+            lines.append(f"- ... and {len(omitted) - MAX_OMITTED_LISTED:,} more files\n")
+        return "".join(lines)
+
+    def _budgeted_entries(self, entries, fixed_sections, heading, digests=None):
+        """
+        Apply the token budget to the file entries of a prompt.
+        Returns the entries to include and the text of the omitted files section.
+        The digests of the measured files are recorded in digests if given.
+        """
+        budget = self.context.get("token_budget", 0)
+        self._budget_summary = None
+        if not budget:
+            return entries, ""
+        measured = self.measure_files(entries, digests)
+        fixed = sum(estimate_tokens(section) for section in fixed_sections)
+        selected, omitted, used = self.pack_budget(measured, budget - fixed, heading)
+        omitted_section = self.render_omitted(omitted) if omitted else ""
+        self._budget_summary = f"Token budget: ~{fixed + used:,} of {budget:,} tokens used, " \
+                               f"{len(selected)} files included, {len(omitted)} files omitted."
+        return [entry for entry in entries if entry.rel_path in selected], omitted_section
+
+    def get_prompt(self, first=True):
+        """
+        Return the first (or the update) prompt as a string, for use from scripts.
+        """
+        with self.track("prompt-first" if first else "prompt"):
+            chunks = self.render_prompt_first() if first else self.render_prompt_update()
+            return "".join(chunks)
+
+    def prompt_first(self, print_it=True, copy_it=False, part=None):
+        with self.track("prompt-first"):
+            self.stream_prompt(self.render_prompt_first(), print_it, copy_it, name="prompt-first", part=part)
+        self.print_prompt_summary()
+
+    def render_prompt_first(self):
+        """
+        Generate the first prompt section by section. File contents are read on demand,
+        so only a few files are held in memory at a time.
+        """
+        self._prompt_savings = {}
+        index = self.scan()
+        dircontents = self.read_directory_contents(index)
+
+        urlcontents = self.render_urls("URL Contents", self.fetch_urls())
+
+        header = f""" # Project: {self.project_name}\n\n## Directory Structure\n\n{dircontents}\n\n## File Contents\n\n"""
+        footer = f"""\n\n{urlcontents}\n\nPlease analyze the above project structure and file contents, and answer any queries regarding its functionality."""
+        digests = {}
+        entries, omitted_section = self._budgeted_entries(list(self.iter_files(index)), (header, footer), "### File",
+                                                          digests)
+
+        yield header
+        yield from self.render_file_sections(entries, digests=digests)
+        yield omitted_section
+        yield footer
+
+    def hash(self, ob):
+        return hashlib.md5(ob.encode('utf-8')).hexdigest()
+
+    def update_hashes(self):
+        with self.track("update"):
+            self._update_hashes()
+
+    def _update_hashes(self):
+        self.context["hashes"] = {}
+        index = self.scan()
+
+        diff_mode = self.context.get("update_mode") == "diff"
+        snapshots = self.context["snapshots"]
+        digests = []
+        stale = []
+        for entry in self.iter_files(index):
+            h = self.cached_digest(entry)
+            if h is None or (diff_mode and h not in snapshots):
+                stale.append(entry)
+            else:
+                digests.append((entry, h))
+        # Only files whose stat data changed (or that have no snapshot yet) are read, on the thread pool.
+        for entry, content, h, error in self.read_files(stale):
+            if error is None:
+                digests.append((entry, h))
+                if diff_mode and h not in snapshots:
+                    snapshots[h] = pack_text(content)
+
+        stat_cache = self.context["stat_cache"]
+        seen = {}
+        for entry, h in digests:
+            if entry.rel_path in stat_cache:
+                seen[entry.rel_path] = stat_cache[entry.rel_path]
+            if h not in self.context["hashes"]:
+                self.context["hashes"][h] = 1
+        # Drop cache entries of files that no longer exist.
+        self.context["stat_cache"] = seen
+        token_counts = self.context["token_counts"]
+        self.context["token_counts"] = {h: token_counts[h] for h in self.context["hashes"] if h in token_counts}
+        self.context["manifest"] = {entry.rel_path: h for entry, h in digests}
+        self.context["dir_hashes"] = self.compute_dir_hashes(index, self.context["manifest"])
+        # Snapshots are shared by all files with the same content, and only kept for current files.
+        # They are dropped in place, so snapshots held in a context store are not loaded for this.
+        current = set(self.context["manifest"].values())
+        if diff_mode:
+            for h in [h for h in snapshots if h not in current]:
+                del snapshots[h]
+        else:
+            self.context["snapshots"] = {}
+        # Minified contents and outlines are likewise only kept for current files.
+        for name in ("minified", "outlines"):
+            self.context[name] = {key: record for key, record in self.context[name].items()
+                                  if key.rsplit(":", 1)[-1] in current}
+
+        # git reports later changes against the state of this update.
+        git_states = {}
+        if self.context.get("use_git", False):
+            for directory in self.context["dir"]:
+                state = self.git_state(directory)
+                if state is not None:
+                    git_states[directory] = state
+        self.context["git_state"] = git_states
+
+        # URLs count as changed when their text changes. Ones that cannot be fetched keep their
+        # old digest, or get the hash of the URL itself so they are not reported again.
+        old_url_digests = self.context["url_digests"]
+        self.context["url_digests"] = {url: digest or old_url_digests.get(url) or self.hash(url)
+                                       for url, (text, digest, error) in self.fetch_urls().items()}
+
+    def compute_dir_hashes(self, index, digests):
+        """
+        Compute a Merkle hash for every directory of the index, bottom up, over the names
+        of its entries and the digests of its files and subdirectories.
+        Also computes a listing hash that only covers the names of the directory's own entries,
+        which tells whether its part of the directory structure changed.
+        digests maps file paths to content digests. Returns path -> [Merkle hash, listing hash].
+        """
+        dir_hashes = {}
+        for directory, root in index:
+            stack = [(root, False)]
+            while stack:
+                node, children_done = stack.pop()
+                if not children_done:
+                    stack.append((node, True))
+                    stack.extend((child, False) for child in node.children if child.is_dir)
+                    continue
+                merkle = hashlib.md5()
+                listing = hashlib.md5()
+                for child in node.children:
+                    if child.is_dir:
+                        line = f"d {child.name}\n"
+                        child_hash = dir_hashes[child.rel_path][0]
+                    else:
+                        line = f"f {child.name}\n"
+                        child_hash = digests.get(child.rel_path, "")
+                    listing.update(line.encode("utf-8"))
+                    merkle.update(f"{line}{child_hash}\n".encode("utf-8"))
+                if node.error is not None:
+                    listing.update(str(node.error).encode("utf-8"))
+                dir_hashes[node.rel_path] = [merkle.hexdigest(), listing.hexdigest()]
+        return dir_hashes
+
+    def current_digests(self, files):
+        """
+        Return path -> digest for the given files.
+        Digests come from the stat cache; only files whose stat data changed are read.
+        """
+        digests = {}
+        stale = []
+        for entry in files:
+            digest = self.cached_digest(entry)
+            if digest is None:
+                stale.append(entry)
+            else:
+                digests[entry.rel_path] = digest
+        for entry, content, digest, error in self.read_files(stale):
+            if error is None:
+                digests[entry.rel_path] = digest
+        return digests
+
+    def manifest_paths(self):
+        """
+        Return the reverse index of the manifest: digest -> paths that had this content
+        at the last update. It is rebuilt only when the manifest was replaced.
+        """
+        manifest = self.context["manifest"]
+        if self._manifest_paths is None or self._manifest_paths[0] is not manifest:
+            paths = {}
+            for path, digest in manifest.items():
+                paths.setdefault(digest, []).append(path)
+            self._manifest_paths = (manifest, paths)
+        return self._manifest_paths[1]
+
+    def classify_changes(self, entries, digests, current):
+        """
+        Compare files with the manifest of the last update in one pass.
+        entries are the files that may have changed, digests maps the paths of the current
+        files to their digests and current holds the paths of all files that exist now.
+        Returns (added, modified, renamed, copied, deleted): added and modified are lists
+        of entries, renamed and copied lists of (source path, entry) for new paths whose content
+        was known under a path that is gone (renamed) or that still has it (copied), and
+        deleted a list of paths. A copy of a renamed file refers to its new path.
+        A file that was moved and edited shows up as deleted and added.
+        """
+        manifest = self.context["manifest"]
+        old_paths = self.manifest_paths()
+        added, modified, renamed, copied = [], [], [], []
+        # Entries at new paths with content the manifest knows, in scan order.
+        known = []
+        order = {}
+        for entry in entries:
+            order[entry.rel_path] = len(order)
+            digest = digests.get(entry.rel_path)
+            if digest is None:
+                continue
+            old_digest = manifest.get(entry.rel_path)
+            if old_digest == digest:
+                continue
+            if old_digest is not None:
+                # Also a change when the file went back to content seen elsewhere.
+                modified.append(entry)
+            elif digest in old_paths:
+                known.append((entry, digest))
+            else:
+                added.append(entry)
+        # Renames are matched first, so that copies can refer to where the content went.
+        moved = set()
+        # digest -> new path of a renamed file with that content
+        moved_to = {}
+        remaining = []
+        for entry, digest in known:
+            gone = [path for path in old_paths[digest] if path not in current and path not in moved]
+            if gone:
+                # Prefer a source with the same name, i.e. a move to another directory.
+                source = next((path for path in gone if os.path.basename(path) == entry.name), gone[0])
+                moved.add(source)
+                moved_to.setdefault(digest, entry.rel_path)
+                renamed.append((source, entry))
+            else:
+                remaining.append((entry, digest))
+        for entry, digest in remaining:
+            source = next((path for path in old_paths[digest] if digests.get(path) == digest), None) \
+                or moved_to.get(digest)
+            if source is None:
+                # Its sources were all changed, so their old content is not in the current files.
+                added.append(entry)
+            else:
+                copied.append((source, entry))
+        added.sort(key=lambda entry: order[entry.rel_path])
+        deleted = [path for path in manifest if path not in current and path not in moved]
+        return added, modified, renamed, copied, deleted
+
+    def iter_changed_dirs(self, index, dir_hashes):
+        """
+        Yield (node, listing_changed) for the directories whose Merkle hash differs
+        from the last update, top down. Unchanged directories are skipped with their whole subtree,
+        and so are the subdirectories of a directory yielded with listing_changed=True.
+        """
+        old_dir_hashes = self.context["dir_hashes"]
+        for directory, root in index:
+            stack = [root]
+            while stack:
+                node = stack.pop()
+                old = old_dir_hashes.get(node.rel_path)
+                new = dir_hashes[node.rel_path]
+                if old is not None and old[0] == new[0]:
+                    continue
+                listing_changed = old is None or old[1] != new[1]
+                yield node, listing_changed
+                if not listing_changed:
+                    stack.extend(reversed([child for child in node.children if child.is_dir]))
+
+    def render_changed_tree(self, index, dir_hashes):
+        """
+        Render only the subtrees of the directory structure whose listing changed since the last update.
+        """
+        roots = {id(root): directory for directory, root in index}
+        lines = []
+        for node, listing_changed in self.iter_changed_dirs(index, dir_hashes):
+            if listing_changed:
+                heading = roots.get(id(node), node.rel_path)
+                lines.append(f"Directory structure for {heading}:")
+                lines.extend(self._get_tree(node, prefix=""))
+        return "\n".join(lines)
+
+    def iter_changed_files(self, index, dir_hashes):
+        """
+        Yield the allowed files of the directories whose Merkle hash changed since the last update.
+        """
+        old_dir_hashes = self.context["dir_hashes"]
+        for directory, root in index:
+            stack = [root]
+            while stack:
+                node = stack.pop()
+                old = old_dir_hashes.get(node.rel_path)
+                if old is not None and old[0] == dir_hashes[node.rel_path][0]:
+                    continue
+                subdirs = []
+                for child in node.children:
+                    if child.is_dir:
+                        subdirs.append(child)
+                    elif self.is_allowed_file(child.name):
+                        yield child
+                stack.extend(reversed(subdirs))
+
+    def set_update_mode(self, mode=None):
+        if not mode:
+            mode = input(f"Enter update prompt mode, full or diff (current {self.context['update_mode']}): ").strip()
+        mode = mode.lower()
+        if mode not in ("full", "diff"):
+            print(f"Unknown update mode '{mode}'. Use 'full' or 'diff'.")
+            return
+        self.context["update_mode"] = mode
+        print(f"Update prompt mode set to '{mode}'.")
+        if mode == "diff" and not self.context["snapshots"]:
+            print("Run -update to take the snapshot that diffs are computed against.")
+
+    def render_diff(self, path, old, new):
+        """
+        Return a unified diff between the snapshot and the current content of a file.
+        """
+        import difflib
+        diff = difflib.unified_diff(old.splitlines(), new.splitlines(), f"a/{path}", f"b/{path}", lineterm="")
+        return "\n".join(diff)
+
+    def prompt_update(self, print_it=True, copy_it=False, part=None):
+        with self.track("prompt"):
+            self.stream_prompt(self.render_prompt_update(), print_it, copy_it, name="prompt", part=part)
+        self.print_prompt_summary()
+
+    def render_prompt_update(self):
+        """
+        Generate the update prompt section by section, with only new or changed content.
+        """
+        self._prompt_savings = {}
+        index = self.scan()
+
+        manifest = self.context["manifest"]
+        snapshots = self.context["snapshots"]
+        diff_mode = self.context.get("update_mode") == "diff"
+
+        # Changes are tracked per path against the manifest of the last update.
+        def is_unchanged(entry, digest):
+            return digest is not None and manifest.get(entry.rel_path) == digest
+
+        files = list(self.iter_files(index))
+        # Unchanged files are recognised from their stat data alone, without opening them.
+        digests = self.current_digests(files)
+        dir_hashes = self.compute_dir_hashes(index, digests)
+
+        header = f""" # Project: {self.project_name}\n"""
+        dircontents = self.render_changed_tree(index, dir_hashes)
+        if dircontents:
+            header += f"""\n## Updated Directory Structure\n\n{dircontents}\n"""
+        del dircontents
+
+        # Directories with an unchanged Merkle hash are skipped without looking at their files.
+        current = {entry.rel_path for entry in files}
+        changed_files = list(self.iter_changed_files(index, dir_hashes))
+        added, modified, renamed, copied, deleted = self.classify_changes(changed_files, digests, current)
+        del files, current
+        # Renamed and copied files are known content, so they only get a line each.
+        if renamed:
+            header += "\n## Renamed Files\n" + "".join(f"- {old} -> {entry.rel_path}\n" for old, entry in renamed)
+        if copied:
+            header += "\n## Copied Files\n" + "".join(f"- {old} -> {entry.rel_path}\n" for old, entry in copied)
+        if added:
+            header += "\n## Added Files\n" + "".join(f"- {entry.rel_path}\n" for entry in added)
+        if deleted:
+            header += "\n## Deleted Files\n" + "".join(f"- {path}\n" for path in deleted)
+        # Added and modified files are sent in scan order.
+        changed = {entry.rel_path for entry in added + modified}
+        candidates = [entry for entry in changed_files if entry.rel_path in changed]
+        del changed_files
+        header += """\n## Updated File Contents\n\n"""
+
+        url_digests = self.context["url_digests"]
+        changed_urls = {}
+        for url, (text, digest, error) in self.fetch_urls().items():
+            if digest is not None and url_digests.get(url) == digest:
+                continue
+            if digest is None and url in url_digests:
+                # Known URL that could not be fetched this time; nothing to report.
+                continue
+            changed_urls[url] = (text, digest, error)
+        urlcontents = self.render_urls("Updated URL Contents", changed_urls)
+        footer = f"""\n\n{urlcontents}\n\nPlease analyze the above updated project structure and file contents, and answer any queries regarding its functionality."""
+
+        entries, omitted_section = self._budgeted_entries(candidates, (header, footer), "### Updated File", digests)
+
+        yield header
+        if not diff_mode:
+            yield from self.render_file_sections(entries, "### Updated File", skip=is_unchanged, digests=digests)
+            yield omitted_section
+            yield footer
+            return
+        # Diffs are computed between the raw snapshot and the raw content, so files are only
+        # minified here when they are sent whole.
+        for entry, content, digest, error in self.read_files(entries):
+            if error is not None or is_unchanged(entry, digest):
+                continue
+            old_digest = manifest.get(entry.rel_path)
+            if old_digest in snapshots:
+                diff = self.render_diff(entry.rel_path, unpack_text(snapshots[old_digest]), content)
+                yield f"""\n### Updated File (diff): {entry.rel_path}\n\n```diff\n{diff}\n```\n"""
+                continue
+            if self.context.get("minify"):
+                content = self.minify_content(entry, content, digest)
+            yield f"""\n### Updated File: {entry.rel_path}\n\n{self.wrap_content(content)}\n"""
+        yield omitted_section
+        yield footer
+
+    def get_search_index(self):
+        """
+        Return the in-memory search index of the context's search_docs, building the
+        postings only when the context (e.g. after a load) brought new documents.
+        """
+        docs = self.context["search_docs"]
+        if self._search_index is None or self._search_index.docs is not docs:
+            self._search_index = SearchIndex(docs)
+        return self._search_index
+
+    def update_search_index(self, index):
+        """
+        Bring the search index up to date with the scanned files. Files are only read
+        if their stat data changed since they were indexed.
+        """
+        search = self.get_search_index()
+        files = list(self.iter_files(index))
+        current = {entry.rel_path for entry in files}
+        for path in [path for path in search.docs if path not in current]:
+            search.remove(path)
+        stale = []
+        for entry in files:
+            doc = search.docs.get(entry.rel_path)
+            if doc is None or doc[0] != self.cached_digest(entry):
+                stale.append(entry)
+        indexed = 0
+        for entry, content, digest, error in self.read_files(stale) if stale else ():
+            if error is not None:
+                continue
+            doc = search.docs.get(entry.rel_path)
+            if doc is None or doc[0] != digest:
+                search.add(entry.rel_path, SearchIndex.document(entry.rel_path, content, digest))
+                indexed += 1
+        self.count("files indexed", indexed)
+        return search
+
+    def set_query_top_k(self, top_k=None):
+        if not top_k:
+            top_k = input(f"Enter the number of files -prompt-query includes (current {self.context['query_top_k']}): ").strip()
+        try:
+            top_k = int(top_k)
+            if top_k < 1:
+                raise ValueError("must be at least 1")
+        except ValueError as e:
+            print(f"Invalid number of files '{top_k}': {e}")
+            return
+        self.context["query_top_k"] = top_k
+        print(f"-prompt-query includes the {top_k} most relevant files.")
+
+    def prompt_query(self, query=None, print_it=True, copy_it=False, part=None):
+        if not query:
+            query = input("Enter your question: ").strip()
+        with self.track("prompt-query"):
+            self.stream_prompt(self.render_prompt_query(query), print_it, copy_it, name="prompt-query", part=part)
+        self.print_prompt_summary()
+
+    def render_prompt_query(self, query, top_k=None):
+        """
+        Generate a prompt with the directory structure and only the files most relevant
+        to the query, ranked by BM25 over their paths and contents.
+        """
+        top_k = top_k or self.context.get("query_top_k", 10)
+        self._prompt_savings = {}
+        index = self.scan()
+        with self.phase("index"):
+            search = self.update_search_index(index)
+        with self.phase("query"):
+            ranked = search.search(query, top_k)
+        dircontents = self.read_directory_contents(index)
+
+        entries_by_path = {entry.rel_path: entry for entry in self.iter_files(index)}
+        entries = [entries_by_path[path] for path, score in ranked if path in entries_by_path]
+        relevant = "".join(f"- {path} (score {score:.2f})\n" for path, score in ranked) or "No file matches the question.\n"
+        header = f""" # Project: {self.project_name}\n\n## Directory Structure\n\n{dircontents}\n\n""" \
+                 f"""## Relevant Files\n\n{relevant}\n## File Contents\n\n"""
+        footer = f"""\n\nUsing the above project structure and file contents, please answer the following question:\n\n{query}"""
+        digests = {}
+        entries, omitted_section = self._budgeted_entries(entries, (header, footer), "### File", digests)
+
+        yield header
+        yield from self.render_file_sections(entries, digests=digests)
+        yield omitted_section
+        yield footer
+
+    def save(self, path=None):
+        """
+        Save the context as JSON, or into an SQLite store if the path ends in .db, .sqlite
+        or .sqlite3 (or already is one). Saving a loaded .json context to a .db path migrates it.
+        """
+        if not path:
+            path = input("Enter path to save the context (e.g., context.json or context.db): ").strip()
+        try:
+            if ContextStore.is_store(path):
+                started = time.perf_counter()
+                store = self._store
+                if store is None or os.path.abspath(store.path) != os.path.abspath(path):
+                    snapshots = self.context.get("snapshots")
+                    if isinstance(snapshots, StoredSnapshots):
+                        # The store they are read from is closed once the context moved to the new one.
+                        self.context["snapshots"] = dict(snapshots)
+                    store = ContextStore(path)
+                try:
+                    with self.phase("save"):
+                        store.save(self.project_name, self.context)
+                except Exception:
+                    if store is not self._store:
+                        store.close()
+                    raise
+                self._use_store(store)
+                print(f"Context successfully saved to {path} ({store.rows_written:,} rows written "
+                      f"in {time.perf_counter() - started:.3f}s).")
+                return True
+            data = {
+                "project_name": self.project_name,
+                "context": self.context
+            }
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=4, default=_json_default)
+            print(f"Context successfully saved to {path}.")
+            return True
+        except Exception as e:
+            print(f"Error saving context: {e}")
+            return False
+
+    def _use_store(self, store):
+        """
+        Make store (None for a JSON context) the store of the context, closing the previous one.
+        """
+        if self._store is not None and self._store is not store:
+            self._store.close()
+        self._store = store
+
+    def autosave(self):
+        """
+        Save the context again if it was loaded from or saved to an SQLite store,
+        which only writes what changed.
+        """
+        if self._store is not None:
+            self.save(self._store.path)
+
+    def load(self, path=None):
+        if not path:
+            path = input("Enter path to load the context (e.g., context.json or context.db): ").strip()
+        try:
+            if not os.path.isfile(path):
+                raise FileNotFoundError(f"No such file: '{path}'")
+            context = self.default_context()
+            if ContextStore.is_store(path):
+                store = ContextStore(path)
+                try:
+                    project_name, stored = store.load()
+                except Exception:
+                    store.close()
+                    raise
+                context.update(stored)
+                self._use_store(store)
+            else:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                project_name = data.get("project_name", "")
+                context.update(data.get("context", self.context))
+                self._use_store(None)
+            self.project_name = project_name
+            if context.get("digest_version") != DIGEST_VERSION:
+                # Digests were computed differently; read every file again once. The manifest
+                # still holds digests of the old kind, so the next update prompt resends every file.
+                context["stat_cache"] = {}
+                context["token_counts"] = {}
+                context["search_docs"] = {}
+                context["minified"] = {}
+                context["outlines"] = {}
+                context["digest_version"] = DIGEST_VERSION
+            self.context = context
+            print(f"Context successfully loaded from {path}.")
+            return True
+        except Exception as e:
+            print(f"Error loading context: {e}")
+            return False
+
+
+class Command:
+    def __init__(self, command="", required_commands=None, optional_commands=None, inputs=None, help_message="",
+                 ):
+        if inputs is None:
+            inputs = ""
+        if optional_commands is None:
+            optional_commands = []
+        if required_commands is None:
+            required_commands = []
+
+        self.command = command
+
+        self.command_without_hyphen = command.lower().lstrip('-')
+
+        self.required_commands = required_commands
+        self.optional_commands = optional_commands
+        self.help_message = help_message
+        self.inputs = inputs
+
+    def generate_str(self):
+        ret_str = []
+        ret_str.append(f" {self.command} ")
+        if self.inputs != "":
+            ret_str.append(f"[{self.inputs}] ")
+
+        ret_str.append(f": ")
+        ret_str.append(f"{self.help_message}")
+
+        if self.required_commands:
+            required = ", ".join([cmd.command for cmd in self.required_commands])
+            ret_str.append(f"\n\t[Require: {required}]")
+        if self.optional_commands:
+            optional = ", ".join([cmd.command for cmd in self.optional_commands])
+            ret_str.append(f"\n\t[Optional: {optional}]")
+
+        return ''.join(ret_str)
+
+    def print_command(self):
+        print(self.generate_str())
+
+    def __repr__(self):
+        return f"Command({self.command})"
+
+
+help_comm = Command("-h", help_message="Prints help section")
+project_name_comm = Command("-name", help_message="Project Name")
+add_dir_comm = Command("-dir+", inputs="Directory", help_message="Adds directory to watch-list")
+add_ignore_dir_comm = Command("-ignore+", inputs="Directory", help_message="Adds directory to ignore-list")
+remove_dir_comm = Command("-dir-", inputs="Directory", help_message="Removes this directory from watch-list")
+remove_ignore_dir_comm = Command("-ignore-", inputs="Directory", help_message="Removes this directory from ignore-list")
+add_url_comm = Command("-url+", inputs="Url", help_message="Removes given url from watch-list")
+remove_url_comm = Command("-url-", inputs="Url", help_message="Removes given url from watch-list")
+add_extension_comm = Command("-extension+", help_message="Removes given extension from allowed-list")
+remove_extension_comm = Command("-extension-", help_message="Removes given extension from allowed-list")
+print_all_comm = Command("-print", help_message="Prints directory structure and contents of all the files")
+print_dir_structure_comm = Command("-printdir", help_message="Prints directory structure")
+status_comm = Command("-status", help_message="Prints current status")
+prompt_first_copy_comm = Command("-prompt-first-copy", help_message="Copys the first prompt to clipboard")
+prompt_update_copy_comm = Command("-prompt-copy", help_message="Copys the updated prompt to clipboard")
+prompt_first_comm = Command("-prompt-first", help_message="Prints and copys the first prompt")
+prompt_update_comm = Command("-prompt", help_message="Prints and copys the updated prompt")
+update_comm = Command("-update", help_message="Updates the hashes")
+save_comm = Command("-save", help_message="Saves the context")
+load_comm = Command("-load", help_message="Loads the context")
+clipboard_comm = Command("-clipboard", inputs="Command", help_message="Sets the command prompts are piped to when copied (tk for Tk, empty to detect)")
+stats_comm = Command("-stats", help_message="Prints the time and counters of the last command by phase")
+trace_comm = Command("-trace", inputs="Path", help_message="Appends the stats of every command to this file as JSON lines (empty to disable)")
+prompt_query_comm = Command("-prompt-query", inputs="Question", help_message="Prints a prompt with only the files most relevant to the question")
+query_top_k_comm = Command("-query-top-k", inputs="N", help_message="Sets the number of files -prompt-query includes")
+minify_comm = Command("-minify", inputs="on/off", help_message="Strips comments and redundant whitespace from file contents in prompts")
+outline_comm = Command("-outline", inputs="Size", help_message="Sends source files of at least this size (on = 64K, all, off) as outlines of their declarations")
+prompt_out_comm = Command("-prompt-out", inputs="Path", help_message="Also writes prompts to this file (empty to disable)")
+max_file_size_comm = Command("-max-file-size", inputs="Size", help_message="Caps the content shown per file, e.g. 512K (0 for no cap)")
+watch_comm = Command("-watch", inputs="on/off", help_message="Keeps the directory index up to date in the background")
+update_mode_comm = Command("-update-mode", inputs="full/diff", help_message="Sends full files or unified diffs in update prompts")
+budget_comm = Command("-budget", inputs="N", help_message="Limits prompts to about N tokens (0 for no limit)")
+tree_depth_comm = Command("-tree-depth", inputs="N", help_message="Expands directory trees N levels deep, summarizing deeper directories (0 for no limit)")
+tree_entries_comm = Command("-tree-entries", inputs="N", help_message="Shows N entries per directory in trees, summarizing the rest (0 for no limit)")
+parts_comm = Command("-parts", inputs="Limit", help_message="Splits prompts into parts of at most this many characters, or tokens with a t suffix (0 for no limit)")
+copy_part_comm = Command("-copy-part", inputs="N", help_message="Copies part N of the last prompt that was split into parts")
+url_fetch_comm = Command("-url-fetch", inputs="on/off", help_message="Includes the content of the URLs in prompts")
+workers_comm = Command("-workers", inputs="N", help_message="Sets the number of file reading threads (0 for default)")
+gitignore_comm = Command("-gitignore", inputs="on/off", help_message="Honors .gitignore files while scanning")
+git_comm = Command("-git", inputs="on/off", help_message="Lists and checks the files of git work trees with git ls-files and git diff")
+
+
+class Command_Control:
+    def __init__(self, header="", logfile=None):
+        self.commands = []
+        self.header = header
+        if logfile:
+            self.logfilename = logfile
+            self.logging = True
+            with open(self.logfilename, "w") as file:
+                file.write("Time | Valid/Invalid | Command(if Valid) | InputParameters\n")
+        else:
+            self.logfilename = None
+            self.logging = False
+
+    def add_command(self, *commands):
+        for cmd in commands:
+            self.commands.append(cmd)
+
+    def print_all_commands(self):
+        print(f"---------------------- {self.header} ------------------------")
+        for cmd in self.commands:
+            cmd.print_command()
+        print(f"---------------------- {self.header} ------------------------")
+
+    def parse_command(self, input_command):
+        try:
+            tokens = shlex.split(input_command)
+        except ValueError:
+            # An unmatched quote, e.g. an apostrophe in a question.
+            tokens = input_command.split()
+        dictionary_commands = {}
+        key = None
+        for token in tokens:
+            if token.startswith("-"):
+                key = token.lstrip("-")
+                dictionary_commands[key] = None
+            else:
+                if key:
+                    # The words after a command make up its input, e.g. a question.
+                    value = dictionary_commands[key]
+                    dictionary_commands[key] = token if value is None else value + " " + token
+        return dictionary_commands
+
+    def validate_action(self, action):
+        for cmd in self.commands:
+            if cmd.command_without_hyphen in action:
+                # Check for required commands
+                missing_required = False
+                for req_cmd in cmd.required_commands:
+                    if req_cmd.command_without_hyphen not in action or not action[req_cmd.command_without_hyphen]:
+                        missing_required = True
+                        break
+                if missing_required:
+                    print(f"Incomplete command '{cmd.command}'. Enter -h for help.")
+                    return False, action, None
+                return True, action, cmd
+        # print("Unknown (or incomplete) command entered. Enter -h for help.")
+        return False, action, None
+
+    def resolve_cmd(self, terminal_cmd):
+        action_dict = self.parse_command(terminal_cmd)
+        is_valid, action_dict, action_cmd = self.validate_action(action_dict)
+        if self.logging:
+            self.log(is_valid, action_dict, action_cmd)
+        if is_valid:
+            return action_dict, action_cmd
+        else:
+            return action_dict, None
+
+    def log(self, is_valid, param_dict, param_cmd):
+        if not self.logfilename:
+            return
+        timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
+        with open(self.logfilename, "a") as file:
+            if not is_valid:
+                file.write(f"{timestamp} -> Invalid | {param_dict}\n")
+            else:
+                file.write(f"{timestamp} -> Valid | {param_cmd.command_without_hyphen} | {param_dict}\n")
+
+    def get_command_names_lstriped(self):
+        return [cmd.command_without_hyphen for cmd in self.commands]
+
+    def get_command(self, command_name):
+        return [cmd for cmd in self.commands if cmd.command_without_hyphen == command_name][0]
+
+    def is_parameters_valid(self, command_dict):
+        for key in command_dict.keys():
+            if command_dict[key] is None and self.get_command(key).inputs != "":
+                return False
+        return True
+
+
+class Terminal:
+    def __init__(self, sudo_password=None, command_control_object=None):
+        if command_control_object is None:
+            self.CommandControl = Command_Control()
+        else:
+            self.CommandControl = command_control_object
+
+        self.is_windows = platform.system().lower() == "windows"
+        self.is_linux = platform.system().lower() == "linux"
+        self.sudo_password = sudo_password
+
+    def run_command(self, command):
+        """
+        Execute a shell command.
+        :param command: Command string to execute.
+        :return: Tuple containing (output, success_flag)
+        """
+        if self.is_linux:
+            try:
+                if command.startswith("sudo") and self.sudo_password:
+                    # Securely provide the sudo password via stdin
+                    process = subprocess.Popen(
+                        ['sudo', '-S'] + shlex.split(command[5:]),
+                        stdin=subprocess.PIPE,
+                        stdout=subprocess.PIPE,
+                        stderr=subprocess.PIPE,
+                        text=True
+                    )
+                    stdout, stderr = process.communicate(input=self.sudo_password + '\n')
+                else:
+                    process = subprocess.Popen(
+                        shlex.split(command),
+                        stdout=subprocess.PIPE,
+                        stderr=subprocess.PIPE,
+                        text=True
+                    )
+                    stdout, stderr = process.communicate()
+
+                if process.returncode == 0:
+                    return stdout, True
+                else:
+                    return stderr, False
+
+            except Exception as e:
+                return f"Error running command: {str(e)}", False
+
+        elif self.is_windows:
+            try:
+                process = subprocess.Popen(
+                    command,
+                    shell=True,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    text=True
+                )
+                stdout, stderr = process.communicate()
+
+                if process.returncode == 0:
+                    return stdout, True
+                else:
+                    return stderr, False
+            except Exception as e:
+                return f"Error running command: {str(e)}", False
+        else:
+            return "Unsupported OS", False
+
+    def interactive_shell(self):
+        """
+        Launch an interactive shell interface.
+        """
+        print("Starting Terminal Shell. Type 'exit' to quit.")
+        print("Path where these commands will get execured : {}")
+        while True:
+            try:
+                command_input = input("> ").strip()
+                if command_input.lower() in ["exit", "quit"]:
+                    print("Exiting shell.")
+                    break
+
+                action_dict, action_cmd = self.CommandControl.resolve_cmd(command_input)
+                print(action_cmd, self.CommandControl.get_command_names_lstriped())
+                if action_cmd is not None and \
+                        action_cmd.command_without_hyphen in self.CommandControl.get_command_names_lstriped():
+                    print(action_dict)
+                else:
+                    output, success = self.run_command(command_input)
+                    print(output)
+
+
+            except KeyboardInterrupt:
+                print("\nExiting shell.")
+                break
+            except EOFError:
+                print("\nExiting shell.")
+                break
+
+    # # Example usage
+    # if __name__ == "__main__":
+    #     sudo_password = input("Enter your sudo password (leave blank if not required): ")
+    #     terminal = Terminal(sudo_password if sudo_password.strip() else None)
+    #     terminal.interactive_shell()
+    #
+
+
+GPT_Assist_Cmd_Prompt = Command_Control("GPT Assist")
+
+GPT_Assist_Cmd_Prompt.add_command(help_comm, project_name_comm, add_dir_comm, add_ignore_dir_comm, add_url_comm,
+                                  add_extension_comm,status_comm, update_comm, remove_extension_comm,
+                                  remove_dir_comm, remove_ignore_dir_comm, remove_url_comm, print_all_comm,
+                                  print_dir_structure_comm,
+                                  prompt_first_copy_comm, prompt_update_copy_comm, prompt_first_comm,
+                                  prompt_update_comm, save_comm, load_comm, gitignore_comm,
+                                  workers_comm, prompt_out_comm, budget_comm, update_mode_comm,
+                                  watch_comm, max_file_size_comm, clipboard_comm, url_fetch_comm,
+                                  stats_comm, trace_comm, prompt_query_comm, query_top_k_comm, minify_comm,
+                                  outline_comm, git_comm, parts_comm, copy_part_comm, tree_depth_comm,
+                                  tree_entries_comm)
+
+default_ignore_list = [r"*venu*",r"*venv*", r"*.git*", r"*.idea*", r"*.jpg", r"*.bmp", r"*.png", r"*.jpeg",
+                       r"*.pdf", r"*LICENSE", r"*.zip"]
+
+
+def run_interactive(gpt=None):
+    """
+    Run the interactive command prompt. A new GPTAssist with the default ignore list
+    is used unless one is given.
+    """
+    if gpt is None:
+        gpt = GPTAssist()
+        [gpt.add_ignore_dir(dir_path=a) for a in default_ignore_list]
+    GPT_Assist_Cmd_Prompt.print_all_commands()
+    starttime_time = time.time()
+
+    while True:
+        bookmark_time = time.time()
+        try:
+            input_command = str(input(f"({str(int(time.time() - starttime_time)).zfill(3)} sec) > "))
+        except (EOFError, KeyboardInterrupt):
+            print()
+            break
+        resolved_cmd = GPT_Assist_Cmd_Prompt.resolve_cmd("-" + input_command)
+        # print(resolved_cmd)
+        cmd = resolved_cmd[1]
+        # print(type(cmd))
+
+        if resolved_cmd[1] is None:
+            print("Invalid Command")
+        else:
+            if GPT_Assist_Cmd_Prompt.is_parameters_valid(resolved_cmd[0]) or True:
+                # print("Valid Command")
+                if cmd.command_without_hyphen == help_comm.command_without_hyphen:
+                    GPT_Assist_Cmd_Prompt.print_all_commands()
+
+                if cmd.command_without_hyphen == status_comm.command_without_hyphen:
+                    gpt.print_status()
+
+                if cmd.command_without_hyphen == add_dir_comm.command_without_hyphen:
+                    gpt.add_dir()
+                if cmd.command_without_hyphen == remove_dir_comm.command_without_hyphen:
+                    gpt.remove_dir()
+                if cmd.command_without_hyphen == add_ignore_dir_comm.command_without_hyphen:
+                    gpt.add_ignore_dir()
+                if cmd.command_without_hyphen == remove_ignore_dir_comm.command_without_hyphen:
+                    gpt.remove_ignore_dir()
+                if cmd.command_without_hyphen == add_url_comm.command_without_hyphen:
+                    gpt.add_url()
+                if cmd.command_without_hyphen == remove_url_comm.command_without_hyphen:
+                    gpt.remove_url()
+                if cmd.command_without_hyphen == print_dir_structure_comm.command_without_hyphen:
+                    gpt.print_dir_structure()
+                if cmd.command_without_hyphen == print_all_comm.command_without_hyphen:
+                    gpt.print_all()
+                if cmd.command_without_hyphen == prompt_first_comm.command_without_hyphen:
+                    gpt.prompt_first()
+                if cmd.command_without_hyphen == update_comm.command_without_hyphen:
+                    gpt.update_hashes()
+                    gpt.autosave()
+                if cmd.command_without_hyphen == prompt_update_comm.command_without_hyphen:
+                    gpt.prompt_update()
+                if cmd.command_without_hyphen == project_name_comm.command_without_hyphen:
+                    gpt.project_name = str(input("Enter the Project Name : "))
+                if cmd.command_without_hyphen == prompt_first_copy_comm.command_without_hyphen:
+                    gpt.prompt_first(print_it=False, copy_it=True)
+                if cmd.command_without_hyphen == prompt_update_copy_comm.command_without_hyphen:
+                    gpt.prompt_update(print_it=False, copy_it=True)
+                if cmd.command_without_hyphen == save_comm.command_without_hyphen:
+                    gpt.save()
+                if cmd.command_without_hyphen == load_comm.command_without_hyphen:
+                    gpt.load()
+                if cmd.command_without_hyphen == add_extension_comm.command_without_hyphen:
+                    gpt.add_extension()
+                if cmd.command_without_hyphen == remove_extension_comm.command_without_hyphen:
+                    gpt.remove_extension()
+                if cmd.command_without_hyphen == tree_depth_comm.command_without_hyphen:
+                    gpt.set_tree_depth(resolved_cmd[0][cmd.command_without_hyphen])
+                if cmd.command_without_hyphen == tree_entries_comm.command_without_hyphen:
+                    gpt.set_tree_entries(resolved_cmd[0][cmd.command_without_hyphen])
+                if cmd.command_without_hyphen == parts_comm.command_without_hyphen:
+                    gpt.set_part_limit(resolved_cmd[0][cmd.command_without_hyphen])
+                if cmd.command_without_hyphen == copy_part_comm.command_without_hyphen:
+                    gpt.copy_part(resolved_cmd[0][cmd.command_without_hyphen])
+                if cmd.command_without_hyphen == git_comm.command_without_hyphen:
+                    gpt.set_git(resolved_cmd[0][cmd.command_without_hyphen])
+                if cmd.command_without_hyphen == gitignore_comm.command_without_hyphen:
+                    gpt.set_gitignore(resolved_cmd[0][cmd.command_without_hyphen])
+                if cmd.command_without_hyphen == workers_comm.command_without_hyphen:
+                    gpt.set_workers(resolved_cmd[0][cmd.command_without_hyphen])
+                if cmd.command_without_hyphen == prompt_out_comm.command_without_hyphen:
+                    gpt.set_prompt_out(resolved_cmd[0][cmd.command_without_hyphen])
+                if cmd.command_without_hyphen == budget_comm.command_without_hyphen:
+                    gpt.set_token_budget(resolved_cmd[0][cmd.command_without_hyphen])
+                if cmd.command_without_hyphen == update_mode_comm.command_without_hyphen:
+                    gpt.set_update_mode(resolved_cmd[0][cmd.command_without_hyphen])
+                if cmd.command_without_hyphen == watch_comm.command_without_hyphen:
+                    gpt.set_watch(resolved_cmd[0][cmd.command_without_hyphen])
+                if cmd.command_without_hyphen == max_file_size_comm.command_without_hyphen:
+                    gpt.set_max_file_size(resolved_cmd[0][cmd.command_without_hyphen])
+                if cmd.command_without_hyphen == clipboard_comm.command_without_hyphen:
+                    gpt.set_clipboard(resolved_cmd[0][cmd.command_without_hyphen])
+                if cmd.command_without_hyphen == url_fetch_comm.command_without_hyphen:
+                    gpt.set_fetch_urls(resolved_cmd[0][cmd.command_without_hyphen])
+                if cmd.command_without_hyphen == stats_comm.command_without_hyphen:
+                    gpt.print_stats()
+                if cmd.command_without_hyphen == prompt_query_comm.command_without_hyphen:
+                    gpt.prompt_query(resolved_cmd[0][cmd.command_without_hyphen])
+                if cmd.command_without_hyphen == query_top_k_comm.command_without_hyphen:
+                    gpt.set_query_top_k(resolved_cmd[0][cmd.command_without_hyphen])
+                if cmd.command_without_hyphen == minify_comm.command_without_hyphen:
+                    gpt.set_minify(resolved_cmd[0][cmd.command_without_hyphen])
+                if cmd.command_without_hyphen == outline_comm.command_without_hyphen:
+                    gpt.set_outline(resolved_cmd[0][cmd.command_without_hyphen])
+                if cmd.command_without_hyphen == trace_comm.command_without_hyphen:
+                    gpt.set_trace_file(resolved_cmd[0][cmd.command_without_hyphen])
+
+
+
+            else:
+                print("Invalid Command Usage")
+
+
+CLI_COMMANDS = ("prompt", "prompt-first", "prompt-query", "update", "printdir", "print", "status", "serve")
+# Options of one-shot commands that configure the GPTAssist; PromptDaemon keeps one per combination.
+CONFIG_OPTIONS = ("context", "name", "dir", "ignore", "extension", "git", "workers", "budget", "top_k",
+                  "minify", "outline", "parts", "tree_depth", "tree_entries", "clipboard", "trace")
+
+
+def default_socket_path():
+    base = os.environ.get("XDG_RUNTIME_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "gpt_helper")
+    return os.path.join(base, "gpt_helper.sock")
+
+
+class DaemonOutput:
+    """
+    Sends the output of a command run by PromptDaemon to the client as JSON lines of
+    {"out": text} or {"err": text}. Text is buffered, but the order of stdout and stderr
+    output is kept. Once the client is gone, further output is dropped.
+    """
+    FLUSH_CHARS = 64 * 1024
+
+    def __init__(self, wfile):
+        self._wfile = wfile
+        self._name = None
+        self._parts = []
+        self._size = 0
+        self.broken = False
+
+    def stream(self, name):
+        return _DaemonStream(self, name)
+
+    def write(self, name, text):
+        if name != self._name:
+            self.flush()
+            self._name = name
+        self._parts.append(text)
+        self._size += len(text)
+        if self._size >= self.FLUSH_CHARS:
+            self.flush()
+
+    def flush(self):
+        if self._parts:
+            text = "".join(self._parts)
+            self._parts = []
+            self._size = 0
+            self.send({self._name: text})
+
+    def send(self, message):
+        if self.broken:
+            return
+        try:
+            self._wfile.write(json.dumps(message).encode("utf-8") + b"\n")
+            self._wfile.flush()
+        except OSError:
+            self.broken = True
+
+
+class _DaemonStream:
+    # File-like stand-in for sys.stdout or sys.stderr while the daemon runs a command.
+    def __init__(self, output, name):
+        self._output = output
+        self._name = name
+
+    def write(self, text):
+        self._output.write(self._name, text)
+        return len(text)
+
+    def flush(self):
+        self._output.flush()
+
+    def isatty(self):
+        return False
+
+
+class PromptDaemon:
+    """
+    Serves one-shot commands over a Unix socket (see run_client), so repeated requests
+    for the same projects are answered from warm memory instead of loading, scanning and
+    hashing from scratch.
+    A GPTAssist is kept per working directory, context file and set of options, and is
+    loaded again when its context file changes on disk. All of them share one stat cache
+    keyed by absolute path, so a file hashed for one context is not hashed again for another.
+    With watch on, contexts with the same scan settings also share one IndexWatcher.
+    Commands run one at a time.
+    """
+
+    def __init__(self, socket_path, watch=False):
+        self.socket_path = socket_path
+        self.watch = watch
+        self._lock = threading.Lock()
+        # (cwd, options) -> [GPTAssist, mtime_ns of its context file when it was loaded]
+        self._assists = {}
+        # GPTAssist.scan_config() -> IndexWatcher
+        self._watchers = {}
+        self.stat_cache = {}
+
+    def is_listening(self):
+        import socket
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            try:
+                sock.connect(self.socket_path)
+                return True
+            except OSError:
+                return False
+
+    def serve(self):
+        import socketserver
+        if not hasattr(socketserver, "ThreadingUnixStreamServer"):
+            print("Unix sockets are not supported on this platform.", file=sys.stderr)
+            return 1
+        if os.path.exists(self.socket_path):
+            if self.is_listening():
+                print(f"A daemon is already listening on {self.socket_path}.", file=sys.stderr)
+                return 1
+            # Left behind by a daemon that did not shut down cleanly.
+            os.unlink(self.socket_path)
+        os.makedirs(os.path.dirname(os.path.abspath(self.socket_path)), exist_ok=True)
+
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                daemon.handle(self.rfile, self.wfile)
+
+        # Only the owner may connect: commands read any file the daemon can read.
+        old_umask = os.umask(0o077)
+        try:
+            server = socketserver.ThreadingUnixStreamServer(self.socket_path, Handler)
+        finally:
+            os.umask(old_umask)
+        server.daemon_threads = True
+
+        def stop(signum, frame):
+            raise KeyboardInterrupt
+
+        import signal
+        signal.signal(signal.SIGTERM, stop)
+        print(f"Serving on {self.socket_path}. Press Ctrl+C to stop.", file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            with contextlib.suppress(OSError):
+                os.unlink(self.socket_path)
+            for watcher in self._watchers.values():
+                watcher.stop()
+        return 0
+
+    def handle(self, rfile, wfile):
+        """
+        Run the command of one request, a JSON line {"argv": [...], "cwd": ...}, and send its
+        output followed by {"exit": status}.
+        """
+        output = DaemonOutput(wfile)
+        try:
+            request = json.loads(rfile.readline())
+            argv, cwd = list(request["argv"]), request["cwd"]
+        except (ValueError, KeyError, TypeError) as e:
+            output.send({"err": f"Invalid request: {e}\n"})
+            output.send({"exit": 2})
+            return
+        with self._lock:
+            daemon_cwd = os.getcwd()
+            try:
+                with contextlib.redirect_stdout(output.stream("out")), contextlib.redirect_stderr(output.stream("err")):
+                    try:
+                        os.chdir(cwd)
+                        status = self.run(argv)
+                    except SystemExit as e:
+                        # argparse errors
+                        status = e.code if isinstance(e.code, int) else 1
+                    except Exception as e:
+                        print(f"Error: {e}", file=sys.stderr)
+                        status = 1
+            finally:
+                os.chdir(daemon_cwd)
+        output.flush()
+        output.send({"exit": status})
+
+    def run(self, argv):
+        args = build_parser().parse_args(argv)
+        if args.command == "serve":
+            print("The daemon is already serving.", file=sys.stderr)
+            return 1
+        if args.command == "prompt-query" and not args.query:
+            print("prompt-query needs --query", file=sys.stderr)
+            return 2
+        started = time.perf_counter()
+        options = tuple(tuple(value) if isinstance(value, list) else value
+                        for value in (getattr(args, name) for name in CONFIG_OPTIONS))
+        key = (os.getcwd(), options)
+        context_mtime = self._mtime(args.context)
+        hosted = self._assists.get(key)
+        if hosted is None or hosted[1] != context_mtime:
+            gpt = GPTAssist()
+            gpt.shared_stat_cache = self.stat_cache
+            if not configure_cli(gpt, args):
+                self._assists.pop(key, None)
+                return 1
+            if self.watch:
+                self._share_watcher(gpt)
+            hosted = self._assists[key] = [gpt, context_mtime]
+        if args.copy and args.part is None and hosted[0].context.get("part_limit", 0):
+            # Copying the parts one by one waits for Enter in between, and the daemon has no terminal.
+            print("--copy with --parts needs --part N when run in the daemon.", file=sys.stderr)
+            return 2
+        status = run_cli(hosted[0], args, started)
+        # The command may have saved the context; that is not a change from elsewhere.
+        hosted[1] = self._mtime(args.context)
+        return status
+
+    def _share_watcher(self, gpt):
+        config = gpt.scan_config()
+        watcher = self._watchers.get(config)
+        if watcher is None or not watcher.is_running():
+            watcher = IndexWatcher(gpt)
+            watcher.start()
+            self._watchers[config] = watcher
+        gpt._watcher = watcher
+
+    @staticmethod
+    def _mtime(path):
+        if not path:
+            return None
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+
+def run_client(socket_path, argv):
+    """
+    Run a one-shot command in the daemon listening on socket_path, copying its output
+    to stdout and stderr. Returns the exit status of the command.
+    """
+    import socket
+    try:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(socket_path)
+    except (OSError, AttributeError) as e:
+        print(f"Cannot connect to the daemon on {socket_path}: {e}", file=sys.stderr)
+        return 1
+    with sock, sock.makefile("rb") as responses:
+        sock.sendall(json.dumps({"argv": argv, "cwd": os.getcwd()}).encode("utf-8") + b"\n")
+        for line in responses:
+            message = json.loads(line)
+            if "out" in message:
+                sys.stdout.write(message["out"])
+            elif "err" in message:
+                sys.stderr.write(message["err"])
+            elif "exit" in message:
+                sys.stdout.flush()
+                return message["exit"]
+    print("The daemon closed the connection.", file=sys.stderr)
+    return 1
+
+
+def build_parser():
+    import argparse
+    parser = argparse.ArgumentParser(prog="gpt_helper.py",
+                                     description="Generate LLM prompts from project directories.")
+    parser.add_argument("command", choices=CLI_COMMANDS,
+                        help="prompt: updated prompt, prompt-first: full prompt, prompt-query: prompt with the files "
+                             "most relevant to --query (its search index is saved back to --context), update: update the hashes "
+                             "(saved back to --context), printdir/print/status: as in the interactive prompt, "
+                             "serve: run a daemon that other commands are sent to with --socket")
+    parser.add_argument("--context", help="context .json file to load")
+    parser.add_argument("--out", help="write the prompt to this file instead of stdout")
+    parser.add_argument("--save", help="save the context to this file afterwards")
+    parser.add_argument("--name", help="project name")
+    parser.add_argument("--dir", action="append", default=[], help="directory to watch (repeatable)")
+    parser.add_argument("--ignore", action="append", default=[], help="ignore pattern (repeatable)")
+    parser.add_argument("--extension", action="append", default=[], help="allowed extension (repeatable)")
+    parser.add_argument("--git", action="store_true", help="list and check the files of git work trees with git")
+    parser.add_argument("--workers", help="number of file reading threads")
+    parser.add_argument("--budget", help="token budget for the prompt")
+    parser.add_argument("--query", help="question for prompt-query")
+    parser.add_argument("--top-k", help="number of files prompt-query includes")
+    parser.add_argument("--minify", action="store_true", help="strip comments and redundant whitespace from file contents")
+    parser.add_argument("--outline", help="send source files of at least this size as outlines (on = 64K, all, off)")
+    parser.add_argument("--parts", help="split the prompt into parts of at most this many characters "
+                                        "(tokens with a t suffix, e.g. 8000t)")
+    parser.add_argument("--tree-depth", help="expand directory trees this deep, summarizing deeper directories (0 for no limit)")
+    parser.add_argument("--tree-entries", help="show this many entries per directory in trees, summarizing the rest (0 for no limit)")
+    parser.add_argument("--part", type=int, help="only output this part of a prompt split with --parts")
+    parser.add_argument("--copy", action="store_true", help="also copy the prompt to the clipboard")
+    parser.add_argument("--clipboard", help="command the prompt is piped to with --copy ('tk' for Tk)")
+    parser.add_argument("--timing", action="store_true", help="report startup and command time on stderr")
+    parser.add_argument("--stats", action="store_true", help="report the time and counters of each phase on stderr")
+    parser.add_argument("--trace", help="append the stats of the command to this file as a JSON line")
+    parser.add_argument("--socket", nargs="?", const="",
+                        help="serve: listen on this Unix socket, other commands: run in the daemon listening on it "
+                             f"(default {default_socket_path()})")
+    parser.add_argument("--watch", action="store_true",
+                        help="serve: keep the directory indexes of the hosted contexts up to date in the background")
+    return parser
+
+
+def configure_cli(gpt, args):
+    """
+    Load the context and apply the options of a one-shot command.
+    Returns False if the context could not be loaded.
+    """
+    # Status messages go to stderr so that stdout only carries the command's output.
+    with contextlib.redirect_stdout(sys.stderr):
+        if args.context:
+            if not gpt.load(args.context):
+                return False
+        else:
+            gpt.context["dir_ignore"] = list(default_ignore_list)
+        if args.name:
+            gpt.project_name = args.name
+        for d in args.dir:
+            gpt.add_dir(d)
+        for pattern in args.ignore:
+            gpt.add_ignore_dir(pattern)
+        for extension in args.extension:
+            gpt.add_extension(extension)
+        if args.git:
+            gpt.set_git("on")
+        if args.workers:
+            gpt.set_workers(args.workers)
+        if args.budget:
+            gpt.set_token_budget(args.budget)
+        if args.clipboard is not None:
+            gpt.set_clipboard(args.clipboard)
+        if args.trace:
+            gpt.set_trace_file(args.trace)
+        if args.top_k:
+            gpt.set_query_top_k(args.top_k)
+        if args.minify:
+            gpt.set_minify("on")
+        if args.outline:
+            gpt.set_outline(args.outline)
+        if args.parts:
+            gpt.set_part_limit(args.parts)
+        if args.tree_depth is not None:
+            gpt.set_tree_depth(args.tree_depth)
+        if args.tree_entries is not None:
+            gpt.set_tree_entries(args.tree_entries)
+    return True
+
+
+def run_cli(gpt, args, started):
+    """
+    Run a one-shot command on a configured GPTAssist and return the exit status.
+    started is the perf_counter() value the command time is reported from.
+    """
+    if args.part is not None and (args.command not in ("prompt", "prompt-first", "prompt-query")
+                                  or not gpt.context.get("part_limit", 0)):
+        print("--part needs a prompt split into parts with --parts.", file=sys.stderr)
+        return 2
+    if args.command in ("prompt", "prompt-first", "prompt-query"):
+        gpt.context["prompt_out"] = args.out or ""
+        print_it = not args.out
+        # Only the prompt goes to stdout; summaries and other messages go to stderr.
+        gpt.prompt_stream = sys.stdout
+        with contextlib.redirect_stdout(sys.stderr):
+            if args.command == "prompt-first":
+                gpt.prompt_first(print_it=print_it, copy_it=args.copy, part=args.part)
+            elif args.command == "prompt":
+                gpt.prompt_update(print_it=print_it, copy_it=args.copy, part=args.part)
+            else:
+                gpt.prompt_query(args.query, print_it=print_it, copy_it=args.copy, part=args.part)
+        gpt.prompt_stream = None
+    elif args.command == "update":
+        gpt.update_hashes()
+    elif args.command == "printdir":
+        gpt.print_dir_structure()
+    elif args.command == "print":
+        gpt.print_all()
+    elif args.command == "status":
+        gpt.print_status()
+
+    # The hashes of update and the search index of prompt-query are kept in the context.
+    save_path = args.save or (args.context if args.command in ("update", "prompt-query") else None)
+    if save_path:
+        gpt.context["prompt_out"] = ""
+        with contextlib.redirect_stdout(sys.stderr):
+            if not gpt.save(save_path):
+                return 1
+
+    if args.stats and gpt.stats is not None:
+        print(gpt.stats.render(), file=sys.stderr)
+    if args.timing:
+        # In the daemon the process started long before the request.
+        startup = f"startup: {(started - _IMPORT_START) * 1000:.1f} ms, " if gpt.shared_stat_cache is None else ""
+        print(f"{startup}{args.command}: {(time.perf_counter() - started) * 1000:.1f} ms", file=sys.stderr)
+    return 0
+
+
+def main(argv=None):
+    """
+    Without arguments the interactive command prompt is started. Otherwise a single
+    command is run non-interactively, e.g.
+        python gpt_helper.py prompt --context ctx.json --out prompt.md
+    With --socket the command is run by a daemon started with
+        python gpt_helper.py serve --socket
+    """
+    if argv is None:
+        argv = sys.argv[1:]
+    if not argv:
+        run_interactive()
+        return 0
+
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "prompt-query" and not args.query:
+        parser.error("prompt-query needs --query")
+    if args.command == "serve":
+        return PromptDaemon(args.socket or default_socket_path(), watch=args.watch).serve()
+    try:
+        if args.socket is not None:
+            return run_client(args.socket or default_socket_path(), argv)
+        started = time.perf_counter()
+
+        gpt = GPTAssist()
+        if not configure_cli(gpt, args):
+            return 1
+        return run_cli(gpt, args, started)
+    except BrokenPipeError:
+        # The reader of stdout stopped early, e.g. head. Python flushes stdout again at exit,
+        # so it is pointed at devnull to keep that from failing too.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
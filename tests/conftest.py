@@ -0,0 +1,32 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import gpt_helper  # noqa: E402
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    """
+    A small project in tmp_path/proj, with the working directory set to tmp_path.
+    """
+    monkeypatch.chdir(tmp_path)
+    root = tmp_path / "proj"
+    (root / "src").mkdir(parents=True)
+    (root / "src" / "main.py").write_text("def main():\n    return 'héllo'\n")
+    (root / "README.md").write_text("# Project\n")
+    return root
+
+
+@pytest.fixture
+def gpt(project):
+    """
+    A GPTAssist watching the project fixture, reading files on the calling thread.
+    """
+    assist = gpt_helper.GPTAssist()
+    assist.context["dir"] = ["proj"]
+    assist.context["workers"] = 1
+    return assist
@@ -0,0 +1,99 @@
+import os
+import shutil
+
+import pytest
+
+import gpt_helper
+
+
+def entry(path):
+    return gpt_helper.ScanEntry(os.path.basename(path), path, path, False)
+
+
+def classify(manifest, files):
+    """
+    Classify the current files (path -> digest) against a manifest, with paths as results.
+    """
+    gpt = gpt_helper.GPTAssist()
+    gpt.context["manifest"] = manifest
+    entries = [entry(path) for path in files]
+    added, modified, renamed, copied, deleted = gpt.classify_changes(entries, files, set(files))
+    return ([e.rel_path for e in added], [e.rel_path for e in modified],
+            [(old, e.rel_path) for old, e in renamed], [(old, e.rel_path) for old, e in copied], deleted)
+
+
+MANIFEST = {"a.txt": "A", "b.txt": "B", "src/c.py": "C", "d.txt": "D1"}
+
+
+def test_unchanged():
+    assert classify(MANIFEST, dict(MANIFEST)) == ([], [], [], [], [])
+
+
+def test_rename_and_move():
+    files = {"a2.txt": "A", "b.txt": "B", "lib/c.py": "C", "d.txt": "D1"}
+    assert classify(MANIFEST, files) == ([], [], [("a.txt", "a2.txt"), ("src/c.py", "lib/c.py")], [], [])
+
+
+def test_move_prefers_the_same_name():
+    manifest = {"x/one.py": "S", "y/two.py": "S"}
+    files = {"z/two.py": "S", "z/one.py": "S"}
+    assert classify(manifest, files)[2] == [("y/two.py", "z/two.py"), ("x/one.py", "z/one.py")]
+
+
+def test_copy_of_an_existing_file():
+    files = dict(MANIFEST, **{"copy.txt": "A"})
+    assert classify(MANIFEST, files) == ([], [], [], [("a.txt", "copy.txt")], [])
+
+
+def test_copy_of_a_renamed_file_refers_to_its_new_path():
+    # mv a.txt a2.txt; cp a2.txt copy.txt -- copy.txt comes first in scan order.
+    files = {"a2.txt": "A", "b.txt": "B", "copy.txt": "A", "src/c.py": "C", "d.txt": "D1"}
+    assert classify(MANIFEST, files) == ([], [], [("a.txt", "a2.txt")], [("a2.txt", "copy.txt")], [])
+
+
+def test_copy_of_a_changed_file_is_added():
+    # b.txt changed after it was copied, so its old content is not in any current file.
+    files = dict(MANIFEST, **{"b.txt": "B2", "new.txt": "B"})
+    assert classify(MANIFEST, files) == (["new.txt"], ["b.txt"], [], [], [])
+
+
+def test_delete_and_add():
+    files = {"b.txt": "B", "src/c.py": "C", "d.txt": "D1", "e.txt": "E"}
+    assert classify(MANIFEST, files) == (["e.txt"], [], [], [], ["a.txt"])
+
+
+def test_revert_to_content_seen_elsewhere_is_a_change():
+    # d.txt went back to the content of a.txt, which is still there.
+    files = dict(MANIFEST, **{"d.txt": "A"})
+    assert classify(MANIFEST, files) == ([], ["d.txt"], [], [], [])
+
+
+def test_moved_and_edited_is_deleted_and_added():
+    files = {"a.txt": "A", "b.txt": "B", "lib/c.py": "C2", "d.txt": "D1"}
+    assert classify(MANIFEST, files) == (["lib/c.py"], [], [], [], ["src/c.py"])
+
+
+def test_added_files_keep_scan_order():
+    files = dict(MANIFEST, **{"n1.txt": "N1", "n2.txt": "B", "n3.txt": "N3"})
+    files["b.txt"] = "B2"
+    assert classify(MANIFEST, files)[0] == ["n1.txt", "n2.txt", "n3.txt"]
+
+
+@pytest.mark.parametrize("mode", ["full", "diff"])
+def test_update_prompt_reports_renames_copies_and_deletions(gpt, project, capsys, mode):
+    gpt.context["update_mode"] = mode
+    (project / "src" / "util.py").write_text("def helper():\n    return 1\n")
+    (project / "a.txt").write_text("some text\n")
+    gpt.update_hashes()
+    os.rename(project / "a.txt", project / "a2.txt")
+    shutil.copy(project / "a2.txt", project / "copy.txt")
+    os.makedirs(project / "lib")
+    os.rename(project / "src" / "util.py", project / "lib" / "util.py")
+    (project / "README.md").unlink()
+    capsys.readouterr()
+    gpt.prompt_update()
+    out = capsys.readouterr().out
+    assert "## Renamed Files\n- proj/a.txt -> proj/a2.txt\n- proj/src/util.py -> proj/lib/util.py\n" in out
+    assert "## Copied Files\n- proj/a2.txt -> proj/copy.txt\n" in out
+    assert "## Deleted Files\n- proj/README.md\n" in out
+    assert "### Updated File" not in out
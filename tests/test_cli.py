@@ -0,0 +1,38 @@
+import os
+import subprocess
+import sys
+
+import gpt_helper
+
+
+def test_only_the_prompt_goes_to_stdout(project, capsys):
+    assert gpt_helper.main(["prompt-first", "--dir", "proj", "--parts", "1000", "--stats"]) == 0
+    out, err = capsys.readouterr()
+    assert out.startswith(" # Project:")
+    assert "Prompt split into" not in out
+    assert "Prompt split into 1 parts" in err
+    assert "Last run: prompt-first" in err
+
+
+def test_part_needs_parts(project, capsys):
+    assert gpt_helper.main(["prompt-first", "--dir", "proj", "--part", "1"]) == 2
+    out, err = capsys.readouterr()
+    assert out == ""
+    assert "--part needs a prompt split into parts with --parts." in err
+    assert gpt_helper.main(["update", "--dir", "proj", "--parts", "1000", "--part", "1"]) == 2
+    capsys.readouterr()
+    assert gpt_helper.main(["prompt-first", "--dir", "proj", "--parts", "1000", "--part", "1"]) == 0
+    assert "def main():" in capsys.readouterr().out
+
+
+def test_closed_stdout_ends_quietly(project):
+    (project / "big.md").write_text("".join(f"line {i} of a long file\n" for i in range(100000)))
+    process = subprocess.Popen([sys.executable, os.path.abspath(gpt_helper.__file__), "prompt-first", "--dir", "proj"],
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    # Like head: read the start of the output, then stop reading.
+    assert process.stdout.read(11) == b" # Project:"
+    process.stdout.close()
+    err = process.stderr.read().decode()
+    assert process.wait() == 1
+    assert "Traceback" not in err
+    assert "BrokenPipeError" not in err
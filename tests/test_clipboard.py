@@ -0,0 +1,57 @@
+import shlex
+import sys
+
+import gpt_helper
+
+
+def stand_in_command(path, status=0):
+    """
+    A clipboard command that saves what it is sent to path and exits with status.
+    """
+    script = f"import sys; open({str(path)!r}, 'wb').write(sys.stdin.buffer.read()); sys.exit({status})"
+    return shlex.join([sys.executable, "-c", script])
+
+
+def test_prompt_is_streamed_to_clipboard_command(gpt, tmp_path, capsys):
+    copied = tmp_path / "clipboard.txt"
+    gpt.set_clipboard(stand_in_command(copied))
+    gpt.context["prompt_out"] = str(tmp_path / "prompt.md")
+    gpt.prompt_first(print_it=False, copy_it=True)
+
+    prompt = (tmp_path / "prompt.md").read_text(encoding="utf-8")
+    assert copied.read_bytes().decode("utf-8") == prompt
+    assert "def main():" in prompt
+    out = capsys.readouterr().out
+    assert f"Data successfully copied to clipboard ({len(prompt.encode('utf-8')):,} bytes via" in out
+
+
+def test_failing_clipboard_command_is_reported(gpt, tmp_path, capsys):
+    gpt.set_clipboard(stand_in_command(tmp_path / "clipboard.txt", status=3))
+    gpt.prompt_first(print_it=True, copy_it=True)
+
+    out = capsys.readouterr().out
+    assert "def main():" in out
+    assert "Failed to copy to clipboard:" in out
+    assert "exited with status 3" in out
+
+
+def test_missing_clipboard_command_falls_back_to_tk(gpt, capsys):
+    gpt.set_clipboard("gpt-helper-no-such-clipboard-tool")
+    sink = gpt.open_clipboard()
+    assert sink.backend == "tk"
+    assert "using Tk" in capsys.readouterr().out
+
+
+def test_tk_setting_skips_detection(gpt):
+    gpt.set_clipboard("tk")
+    assert gpt.clipboard_command() is None
+
+
+def test_sink_counts_encoded_bytes(tmp_path):
+    copied = tmp_path / "clipboard.txt"
+    sink = gpt_helper.ClipboardSink(shlex.split(stand_in_command(copied)))
+    sink.write("héllo ")
+    sink.write("wörld")
+    sink.close()
+    assert copied.read_text(encoding="utf-8") == "héllo wörld"
+    assert sink.bytes == len("héllo wörld".encode("utf-8"))
@@ -0,0 +1,75 @@
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import pytest
+
+import gpt_helper
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="needs Unix sockets")
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    """
+    The socket of a daemon started with serve --watch in a directory of its own.
+    """
+    # Socket paths are limited to about 100 bytes, which tmp_path may exceed.
+    socket_dir = tempfile.mkdtemp(prefix="gpt-")
+    socket_path = os.path.join(socket_dir, "d.sock")
+    daemon_cwd = tmp_path / "daemon"
+    daemon_cwd.mkdir()
+    process = subprocess.Popen([sys.executable, os.path.abspath(gpt_helper.__file__), "serve", "--watch",
+                                "--socket", socket_path], cwd=daemon_cwd,
+                               stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.monotonic() + 10
+        while not os.path.exists(socket_path):
+            assert process.poll() is None, "the daemon exited"
+            assert time.monotonic() < deadline, "the daemon did not start"
+            time.sleep(0.02)
+        yield socket_path
+    finally:
+        process.terminate()
+        process.wait(10)
+        shutil.rmtree(socket_dir, ignore_errors=True)
+
+
+def request(capsys, socket_path, *argv):
+    status = gpt_helper.run_client(socket_path, list(argv))
+    out, err = capsys.readouterr()
+    return status, out, err
+
+
+def test_prompt_after_a_change(daemon, project, capsys):
+    status, out, err = request(capsys, daemon, "update", "--dir", "proj", "--save", "ctx.json")
+    assert status == 0, err
+    assert os.path.exists("ctx.json")
+
+    (project / "src" / "new.py").write_text("x = 1\n")
+    # The watcher rescans between the requests, while the daemon is in its own directory.
+    time.sleep(1.5)
+    deadline = time.monotonic() + 5
+    while True:
+        status, out, err = request(capsys, daemon, "prompt", "--context", "ctx.json")
+        assert status == 0, err
+        if "new.py" in out or time.monotonic() > deadline:
+            break
+        time.sleep(0.05)
+    assert "Error accessing directory" not in out
+    assert "## Added Files\n- proj/src/new.py\n" in out
+    assert "Deleted Files" not in out
+    assert "x = 1" in out
+    assert "def main():" not in out
+
+
+def test_copy_of_all_parts_is_refused(daemon, project, capsys):
+    status, out, err = request(capsys, daemon, "prompt-first", "--dir", "proj", "--parts", "1000", "--copy",
+                               "--clipboard", "cat")
+    assert status == 2
+    assert "--part N" in err
+    assert out == ""
@@ -0,0 +1,61 @@
+import pytest
+
+SOURCE = '''def helper(values):
+    """Add up the values."""
+    total = 0
+    count = 0
+    for value in values:
+        if value is None:
+            continue
+        total += value
+        count += 1
+    if not count:
+        raise ValueError("no values to add up")
+    return total
+'''
+
+
+@pytest.fixture
+def twins(project):
+    (project / "lib").mkdir()
+    (project / "lib" / "util.py").write_text(SOURCE)
+    (project / "src" / "util_copy.py").write_text(SOURCE)
+    return project
+
+
+def test_identical_files_are_sent_once(twins, gpt):
+    prompt = gpt.get_prompt(first=True)
+    assert prompt.count("total += value") == 1
+    assert "### File: proj/src/util_copy.py\n\nIdentical to proj/lib/util.py.\n" in prompt
+    assert "def main():" in prompt
+    # Each file's stat data is looked up once.
+    assert gpt.stats.counters["stat cache misses"] == 4
+    saved = gpt._prompt_savings["deduplicated"]
+    assert saved[:2] == [1, len(SOURCE)]
+
+    # With the digests cached, the duplicate is recognised without reading it.
+    prompt = gpt.get_prompt(first=True)
+    assert "### File: proj/src/util_copy.py\n\nIdentical to proj/lib/util.py.\n" in prompt
+    assert gpt.stats.counters["stat cache hits"] == 4
+    assert "stat cache misses" not in gpt.stats.counters
+
+
+def test_identical_outlined_files_are_sent_once(twins, gpt):
+    gpt.set_outline("all")
+    for _ in range(2):
+        prompt = gpt.get_prompt(first=True)
+        assert prompt.count("def helper(values):") == 1
+        assert "total += value" not in prompt
+        assert "[outline: declarations and docstrings only" in prompt
+        assert "### File: proj/src/util_copy.py\n\nIdentical to proj/lib/util.py.\n" in prompt
+
+
+def test_only_the_first_changed_copy_is_sent(twins, gpt):
+    gpt.update_hashes()
+    (twins / "lib" / "util.py").write_text(SOURCE + "\nprint(helper([1]))\n")
+    (twins / "src" / "util_copy.py").write_text(SOURCE + "\nprint(helper([1]))\n")
+    prompt = gpt.get_prompt(first=False)
+    assert prompt.count("print(helper([1]))") == 1
+    assert "### Updated File: proj/src/util_copy.py\n\nIdentical to proj/lib/util.py.\n" in prompt
+    assert gpt.stats.counters["stat cache misses"] == 2
+    assert gpt.stats.counters["stat cache hits"] == 2
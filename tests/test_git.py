@@ -0,0 +1,112 @@
+import os
+import shutil
+import subprocess
+
+import pytest
+
+import gpt_helper
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="git is not installed")
+
+
+def git(repo, *args):
+    subprocess.run(["git", "-C", str(repo), *args], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+@pytest.fixture
+def repo(project):
+    git(project, "init", "-q")
+    git(project, "config", "user.email", "test@example.com")
+    git(project, "config", "user.name", "Test")
+    (project / ".gitignore").write_text("build/\n")
+    (project / "src" / "util.py").write_text("def helper():\n    return 1\n")
+    git(project, "add", "-A")
+    git(project, "commit", "-q", "-m", "initial")
+    return project
+
+
+@pytest.fixture
+def gpt_git(gpt):
+    gpt.context["use_git"] = True
+    return gpt
+
+
+def listed(gpt):
+    return [entry.rel_path for entry in gpt.iter_files(gpt.scan())]
+
+
+def update_prompt(gpt, capsys):
+    capsys.readouterr()
+    gpt.prompt_update()
+    return capsys.readouterr().out
+
+
+def test_git_listing_matches_the_filesystem_scan(repo, gpt_git):
+    (repo / "build").mkdir()
+    (repo / "build" / "out.py").write_text("generated = True\n")
+    (repo / "notes.txt").write_text("untracked\n")
+    gpt_git.context["dir_ignore"] = list(gpt_helper.default_ignore_list)
+    files = listed(gpt_git)
+    gpt_git.context["use_git"] = False
+    gpt_git.context["use_gitignore"] = True
+    assert files == listed(gpt_git)
+    assert os.path.join("proj", "notes.txt") in files
+    assert os.path.join("proj", "build", "out.py") not in files
+
+
+def test_clean_files_are_not_statted(repo, gpt_git, monkeypatch):
+    gpt_git.update_hashes()
+    (repo / "src" / "main.py").write_text("def main():\n    return 2\n")
+    statted = []
+    original_stat = os.stat
+
+    def counting_stat(path, *args, **kwargs):
+        statted.append(os.fspath(path))
+        return original_stat(path, *args, **kwargs)
+
+    monkeypatch.setattr(os, "stat", counting_stat)
+    gpt_git.update_hashes()
+    monkeypatch.undo()
+    files = [path for path in statted if os.path.basename(path) in ("util.py", "README.md", "main.py")]
+    assert files == [os.path.join("proj", "src", "main.py")]
+
+
+def test_changes_between_updates(repo, gpt_git, capsys):
+    gpt_git.update_hashes()
+    assert "## Updated File Contents" in update_prompt(gpt_git, capsys)
+    assert "### Updated File:" not in update_prompt(gpt_git, capsys)
+
+    (repo / "src" / "main.py").write_text("def main():\n    return 'changed'\n")
+    (repo / "src" / "new.py").write_text("NEW = 1\n")
+    (repo / "src" / "util.py").unlink()
+    out = update_prompt(gpt_git, capsys)
+    assert "### Updated File: proj/src/main.py" in out and "return 'changed'" in out
+    assert "### Updated File: proj/src/new.py" in out
+    assert "## Added Files\n- proj/src/new.py\n" in out
+    assert "## Deleted Files\n- proj/src/util.py\n" in out
+
+    # After a commit the changes are measured against the new HEAD.
+    gpt_git.update_hashes()
+    git(repo, "add", "-A")
+    git(repo, "commit", "-q", "-m", "second")
+    assert "### Updated File:" not in update_prompt(gpt_git, capsys)
+    (repo / "README.md").write_text("# Changed\n")
+    out = update_prompt(gpt_git, capsys)
+    assert "### Updated File: proj/README.md" in out
+    assert "### Updated File: proj/src/main.py" not in out
+
+
+def test_directory_outside_git_falls_back_to_scanning(project, gpt_git, capsys):
+    output, ok = gpt_git.run_git(str(project), "rev-parse", "HEAD")
+    if ok:
+        pytest.skip("the temporary directory is inside a git work tree")
+    assert listed(gpt_git) == [os.path.join("proj", "README.md"), os.path.join("proj", "src", "main.py")]
+    gpt_git.update_hashes()
+    (project / "src" / "main.py").write_text("changed = True\n")
+    assert "### Updated File: proj/src/main.py" in update_prompt(gpt_git, capsys)
+
+
+def test_run_git_without_git(gpt, monkeypatch, tmp_path):
+    monkeypatch.setenv("PATH", str(tmp_path / "empty"))
+    output, ok = gpt.run_git(str(tmp_path), "status")
+    assert not ok
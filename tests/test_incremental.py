@@ -0,0 +1,86 @@
+import pytest
+
+import benchmark
+
+
+@pytest.fixture
+def tree(project):
+    """
+    The project fixture with two more subtrees: proj/a/b and proj/c.
+    """
+    (project / "a" / "b").mkdir(parents=True)
+    (project / "a" / "b" / "deep.py").write_text("DEPTH = 2\n")
+    (project / "a" / "top.py").write_text("DEPTH = 1\n")
+    (project / "c").mkdir()
+    (project / "c" / "other.py").write_text("OTHER = True\n")
+    return project
+
+
+def opened(action):
+    with benchmark.FSCounter() as counter:
+        result = action()
+    return counter.counts["open"], result
+
+
+def test_unchanged_files_are_not_read_again(tree, gpt):
+    assert opened(gpt.update_hashes)[0] == 5
+    assert opened(gpt.update_hashes)[0] == 0
+
+    (tree / "c" / "other.py").write_text("OTHER = False\n")
+    assert opened(gpt.update_hashes)[0] == 1
+
+    files, prompt = opened(lambda: gpt.get_prompt(first=False))
+    assert files == 0
+    assert "### Updated File" not in prompt
+    # Touching a file without changing it reads it once, but does not report it.
+    (tree / "README.md").write_text("# Project\n")
+    files, prompt = opened(lambda: gpt.get_prompt(first=False))
+    assert files == 1
+    assert "### Updated File" not in prompt
+
+
+def test_diff_mode_sends_the_changed_lines(tree, gpt):
+    gpt.set_update_mode("diff")
+    gpt.update_hashes()
+    (tree / "a" / "top.py").write_text("DEPTH = 1\nNAME = 'top'\n")
+    (tree / "c" / "new.py").write_text("NEW = 1\n")
+    prompt = gpt.get_prompt(first=False)
+    assert "### Updated File (diff): proj/a/top.py\n\n```diff\n--- a/proj/a/top.py\n+++ b/proj/a/top.py\n" \
+           "@@ -1 +1,2 @@\n DEPTH = 1\n+NAME = 'top'\n```\n" in prompt
+    # Files without a snapshot are sent whole.
+    assert "### Updated File: proj/c/new.py\n\n```\nNEW = 1\n\n```\n" in prompt
+    assert "deep.py" not in prompt.split("## Updated File Contents")[1]
+
+    gpt.update_hashes()
+    (tree / "a" / "top.py").write_text("NAME = 'top'\n")
+    prompt = gpt.get_prompt(first=False)
+    assert "@@ -1,2 +1 @@\n-DEPTH = 1\n NAME = 'top'\n" in prompt
+
+
+def test_unchanged_subtrees_are_skipped(tree, gpt):
+    gpt.update_hashes()
+    (tree / "a" / "b" / "deep.py").write_text("DEPTH = 'two'\n")
+
+    index = gpt.scan()
+    dir_hashes = gpt.compute_dir_hashes(index, gpt.current_digests(list(gpt.iter_files(index))))
+    old = gpt.context["dir_hashes"]
+    changed = [path for path in dir_hashes if dir_hashes[path][0] != old[path][0]]
+    assert sorted(changed) == ["proj", "proj/a", "proj/a/b"]
+    # The listings did not change, so no part of the tree is shown again.
+    assert all(dir_hashes[path][1] == old[path][1] for path in dir_hashes)
+    assert gpt.render_changed_tree(index, dir_hashes) == ""
+
+    visited = [node.rel_path for node, listing_changed in gpt.iter_changed_dirs(index, dir_hashes)]
+    assert visited == ["proj", "proj/a", "proj/a/b"]
+    # Only the files of the changed directories are looked at, not the ones of proj/c or proj/src.
+    files = [entry.rel_path for entry in gpt.iter_changed_files(index, dir_hashes)]
+    assert files == ["proj/README.md", "proj/a/top.py", "proj/a/b/deep.py"]
+
+
+def test_only_changed_listings_are_shown(tree, gpt):
+    gpt.update_hashes()
+    (tree / "a" / "b" / "added.py").write_text("ADDED = 1\n")
+    prompt = gpt.get_prompt(first=False)
+    assert "## Updated Directory Structure\n\nDirectory structure for proj/a/b:\n" in prompt
+    assert "other.py" not in prompt
+    assert "## Added Files\n- proj/a/b/added.py\n" in prompt
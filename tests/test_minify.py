@@ -0,0 +1,69 @@
+import pytest
+
+import gpt_helper
+
+
+@pytest.mark.parametrize("extension", [".css", ".scss", ".less"])
+def test_stylesheet_urls_are_kept(extension):
+    minify = gpt_helper.MINIFIERS[extension]
+    text = "a { background: url(http://x/y.png) } /* note */\n/* whole line */\nb { content: \"//\" }\n"
+    assert minify(text) == "a { background: url(http://x/y.png) }\nb { content: \"//\" }"
+
+
+def test_scss_line_comments_are_removed():
+    text = "// heading\n$c: #fff; // colour\na { background: URL( //cdn/x.png ) }\n"
+    assert gpt_helper.minify_scss(text) == "$c: #fff;\na { background: URL( //cdn/x.png ) }"
+
+
+def test_css_has_no_line_comments():
+    assert gpt_helper.minify_css("a { b: c } // not a comment in CSS\n") == "a { b: c } // not a comment in CSS"
+
+
+@pytest.mark.parametrize("line", [
+    "const re = /https?:\\/\\//g;",
+    "const re = /\\/\\*/;",
+    "const re = /[/*]+/;",
+    "if (ok) return /a\\/\\/b/.test(s);",
+    "x = y.split(/\\s*\\/\\/\\s*/);",
+    "const s = \"http://x\" + '/*' + `//${a}`;",
+])
+@pytest.mark.parametrize("extension", [".js", ".ts", ".mjs"])
+def test_js_regex_literals_and_strings_are_kept(line, extension):
+    assert gpt_helper.MINIFIERS[extension](line + "\n") == line
+
+
+def test_js_comments_are_removed():
+    text = ("// header\n"
+            "let half = total / 2; // half\n"
+            "let ratio = (a + b) / c / d; /* block */\n"
+            "/*\n * doc\n */\n"
+            "function f() { return 1; }\n")
+    assert gpt_helper.minify_js(text) == ("let half = total / 2;\n"
+                                          "let ratio = (a + b) / c / d;\n"
+                                          "function f() { return 1; }")
+
+
+@pytest.mark.parametrize("extension", [".jsx", ".tsx", ".php"])
+def test_markup_mixed_sources_only_get_whitespace_minified(extension):
+    text = "<p>See http://example.com, it's here</p>   \n\n\n// kept\n"
+    minify = gpt_helper.MINIFIERS.get(extension, gpt_helper.minify_whitespace)
+    assert minify(text) == "<p>See http://example.com, it's here</p>\n\n// kept"
+
+
+def test_c_like_comments_are_removed():
+    text = "int main() { // entry\n    char *s = \"//\"; /* c */\n    return 0;\n}\n"
+    assert gpt_helper.minify_c_like(text) == "int main() {\n    char *s = \"//\";\n    return 0;\n}"
+
+
+def test_python_comments_are_removed_and_docstrings_kept():
+    text = "def f():  # comment\n    \"\"\"Doc # not a comment.\"\"\"\n    # whole line\n    return '#'\n"
+    assert gpt_helper.minify_python(text) == "def f():\n    \"\"\"Doc # not a comment.\"\"\"\n    return '#'"
+
+
+def test_minified_prompt_keeps_urls(gpt, project, capsys):
+    (project / "style.css").write_text("a { background: url(http://x/y.png) } /* c */\n")
+    gpt.set_minify("on")
+    gpt.prompt_first()
+    out = capsys.readouterr().out
+    assert "url(http://x/y.png)" in out
+    assert "/* c */" not in out
@@ -0,0 +1,118 @@
+import gpt_helper
+
+PYTHON = '''"""Shapes."""
+import math
+from typing import List
+
+UNIT = 1.0
+
+
+class Circle(Shape, metaclass=Meta):
+    """A circle."""
+    sides: int = 0
+
+    def __init__(self, radius):
+        self.radius = radius
+
+    @property
+    def area(self) -> float:
+        """The area."""
+        return math.pi * self.radius ** 2
+
+
+async def load(paths: List[str]):
+    for path in paths:
+        yield path
+'''
+
+JAVASCRIPT = '''import { Shape } from "./shape";
+
+export class Circle extends Shape {
+  constructor(radius) { this.radius = radius; }
+  static unit() { return new Circle(1); }
+  get area() {
+    if (this.radius > 0) { return Math.PI * this.radius ** 2; }
+    return 0;
+  }
+}
+
+export const scale = (circle, k) => new Circle(circle.radius * k);
+function draw(circle) {
+  for (const point of circle.points()) { plot(point); }
+}
+'''
+
+JAVA = '''public class Counter {
+    private int count;
+    public int get() { return count; }
+    public synchronized void add(int n) throws IllegalStateException {
+        if (n < 0) {
+            throw new IllegalStateException();
+        }
+        count += n;
+    }
+}
+'''
+
+
+def test_outline_python():
+    assert gpt_helper.outline_python(PYTHON) == '''"""Shapes."""
+import math
+from typing import List
+UNIT = ...
+class Circle(Shape, metaclass=Meta):
+    """A circle."""
+    sides: int = ...
+    def __init__(self, radius):
+        ...
+    @property
+    def area(self) -> float:
+        """The area."""
+        ...
+async def load(paths: List[str]):
+    ...'''
+
+
+def test_outline_python_falls_back_on_syntax_errors():
+    assert gpt_helper.outline_python("def broken(:\n    pass\nclass Fine {\n") == "def broken(:\nclass Fine"
+
+
+def test_outline_javascript():
+    assert gpt_helper.outline_generic(JAVASCRIPT) == """export class Circle extends Shape
+  constructor(radius)
+  static unit()
+  get area()
+export const scale = (circle, k) => new Circle(circle.radius * k);
+function draw(circle)"""
+
+
+def test_outline_java():
+    assert gpt_helper.outline_generic(JAVA) == """public class Counter
+    public int get()
+    public synchronized void add(int n) throws IllegalStateException"""
+
+
+def test_outlines_that_are_not_smaller_are_not_used(gpt, project):
+    gpt.set_outline("all")
+    prompt = gpt.get_prompt(first=True)
+    assert "def main():\n    return 'héllo'\n" in prompt
+    assert "[outline:" not in prompt
+    assert "outlined" not in gpt._prompt_savings
+
+
+def test_outlines_in_a_process_pool(gpt, project):
+    body = "".join(f"    value_{i} = compute({i})\n" for i in range(200))
+    count = gpt_helper.OUTLINE_POOL_MIN_FILES + 1
+    for i in range(count):
+        (project / "src" / f"mod{i}.py").write_text(f"def function_{i}(x):\n    \"\"\"Doc {i}.\"\"\"\n{body}")
+    gpt.set_outline("all")
+    prompt = gpt.get_prompt(first=True)
+    assert gpt.stats.counters["files outlined"] == count + 1
+    for i in range(count):
+        assert f"def function_{i}(x):\n    \"\"\"Doc {i}.\"\"\"\n    ...\n" in prompt
+    assert "compute(" not in prompt
+    assert gpt._prompt_savings["outlined"][0] == count
+    # Cached outlines are used as they are.
+    gpt.get_prompt(first=True)
+    assert "files outlined" not in gpt.stats.counters
+    assert gpt.stats.counters["outline cache hits"] == count
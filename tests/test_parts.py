@@ -0,0 +1,67 @@
+import pytest
+
+import gpt_helper
+
+
+def fences_balanced(text):
+    return sum(1 for line in text.split("\n") if line.startswith("```")) % 2 == 0
+
+
+def split_prompt(gpt, capsys):
+    capsys.readouterr()
+    gpt.prompt_first()
+    capsys.readouterr()
+    return gpt._parts
+
+
+@pytest.mark.parametrize("limit, measure", [("1000", len), ("1000t", gpt_helper.token_weight)])
+def test_long_line_is_cut_into_parts_under_the_limit(gpt, project, capsys, limit, measure):
+    line = "".join(f"w{i} " for i in range(2500)) + "end\n"
+    (project / "src" / "data.py").write_text("x = 1\n" + line + "y = 2\n")
+    gpt.set_part_limit(limit)
+    parts = split_prompt(gpt, capsys)
+
+    assert len(parts) > 2
+    for text in parts:
+        assert measure(text) <= 1000
+        assert fences_balanced(text)
+    # Every continued piece is labelled and the line comes out whole once the cuts are joined.
+    data_parts = [text for text in parts if "proj/src/data.py" in text]
+    assert all("### File: proj/src/data.py" in text for text in data_parts)
+    body = ""
+    for text in data_parts:
+        section = text.split("### File: proj/src/data.py", 1)[1].split("\n### File:", 1)[0]
+        body += section.split("```\n", 1)[1].rsplit("```\n", 1)[0]
+    assert body.replace("\n", "") == ("x = 1\n" + line + "y = 2\n").replace("\n", "")
+
+
+def test_parts_end_between_sections(gpt, project, capsys):
+    for i in range(30):
+        (project / "src" / f"mod{i:02d}.py").write_text(f"def f{i}():\n" + "    pass\n" * 20)
+    gpt.set_part_limit("1500")
+    parts = split_prompt(gpt, capsys)
+
+    assert len(parts) > 1
+    joined = "".join(parts)
+    for i in range(30):
+        assert joined.count(f"### File: proj/src/mod{i:02d}.py") == 1
+    for text in parts:
+        assert len(text) <= 1500
+        assert fences_balanced(text)
+        assert "(continued)" not in text
+
+
+def test_small_edit_changes_few_parts(gpt, project, capsys):
+    for i in range(40):
+        (project / "src" / f"mod{i:02d}.py").write_text(f"def f{i}():\n" + f"    return {i}\n" * 15)
+    gpt.set_part_limit("2000")
+    before = split_prompt(gpt, capsys)
+    (project / "src" / "mod05.py").write_text("def f5():\n" + "    return 'five'\n" * 15)
+    after = split_prompt(gpt, capsys)
+    assert len(set(after) - set(before)) <= 2
+
+
+def test_cut_line_slices_fit():
+    slices = gpt_helper.GPTAssist._cut_line("a" * 10000 + "\n", 999, len)
+    assert "".join(slices) == "a" * 10000 + "\n"
+    assert all(len(text) <= 999 for text in slices)
@@ -0,0 +1,64 @@
+import json
+
+import pytest
+
+import gpt_helper
+
+
+@pytest.fixture
+def sources(project):
+    (project / "src" / "store.py").write_text("def save_hashes(path, hashes):\n    json.dump(hashes, open(path, 'w'))\n")
+    (project / "src" / "reader.py").write_text("def readFiles(paths):\n    return [open(p).read() for p in paths]\n")
+    (project / "src" / "net.py").write_text("def fetch(url):\n    return urlopen(url).read()\n")
+    return project
+
+
+def test_search_ranks_by_relevance():
+    docs = {path: gpt_helper.SearchIndex.document(path, content, path) for path, content in (
+        ("a/store.py", "def save_hashes(path, hashes): pass\nhashes = {}\n"),
+        ("a/reader.py", "def readFiles(paths): pass\n"),
+        ("hashes/notes.md", "nothing here\n"),
+    )}
+    search = gpt_helper.SearchIndex(docs)
+    ranked = search.search("where are the hashes saved", 3)
+    assert [path for path, score in ranked] == ["hashes/notes.md", "a/store.py"]
+    assert ranked[0][1] > ranked[1][1] > 0
+    # camelCase identifiers match their parts.
+    assert search.search("read files", 3)[0][0] == "a/reader.py"
+    assert search.search("unrelated", 3) == []
+
+
+def test_prompt_query_sends_the_relevant_files(sources, gpt):
+    prompt = "".join(gpt.render_prompt_query("how are hashes saved", top_k=1))
+    assert "## Relevant Files\n\n- proj/src/store.py (score " in prompt
+    assert "### File: proj/src/store.py" in prompt
+    assert "### File: proj/src/reader.py" not in prompt
+    assert prompt.endswith("please answer the following question:\n\nhow are hashes saved")
+
+
+def run(capsys, *argv):
+    assert gpt_helper.main(list(argv)) == 0
+    return capsys.readouterr()
+
+
+def test_one_shot_query_reuses_the_saved_index(sources, capsys):
+    run(capsys, "update", "--dir", "proj", "--save", "ctx.json")
+    out = run(capsys, "prompt-query", "--context", "ctx.json", "--query", "hashes", "--trace", "trace.jsonl").out
+    assert "### File: proj/src/store.py" in out
+    with open("ctx.json", encoding="utf-8") as f:
+        assert "proj/src/store.py" in json.load(f)["context"]["search_docs"]
+
+    (sources / "src" / "net.py").write_text("def fetch(url):\n    return cached(url)\n")
+    run(capsys, "prompt-query", "--context", "ctx.json", "--query", "hashes", "--trace", "trace.jsonl")
+    run(capsys, "prompt-query", "--context", "ctx.json", "--query", "fetch", "--trace", "trace.jsonl")
+    with open("trace.jsonl", encoding="utf-8") as f:
+        indexed = [json.loads(line)["counters"].get("files indexed", 0) for line in f]
+    # Every file the first time, then only the changed one, then none.
+    assert indexed == [5, 1, 0]
+
+
+def test_interactive_query_keeps_every_word():
+    parse = gpt_helper.GPT_Assist_Cmd_Prompt.parse_command
+    assert parse("-prompt-query how are hashes saved") == {"prompt-query": "how are hashes saved"}
+    assert parse("-prompt-query what's saved") == {"prompt-query": "what's saved"}
+    assert parse('-prompt-query "why does -update fail"') == {"prompt-query": "why does -update fail"}
@@ -0,0 +1,105 @@
+import sqlite3
+
+import pytest
+
+import gpt_helper
+
+
+def rows(path, table):
+    with sqlite3.connect(path) as conn:
+        return dict(conn.execute(f"SELECT key, v0 FROM {table}"))
+
+
+def loaded(path):
+    assist = gpt_helper.GPTAssist()
+    assert assist.load(path)
+    return assist
+
+
+def test_json_context_migrates_to_a_store(gpt):
+    gpt.project_name = "demo"
+    gpt.update_hashes()
+    assert gpt.save("ctx.json")
+    assist = loaded("ctx.json")
+    assert assist.save("ctx.db")
+    assert gpt_helper.ContextStore.is_store("ctx.db")
+
+    migrated = loaded("ctx.db")
+    assert migrated.project_name == "demo"
+    assert migrated.context["dir"] == ["proj"]
+    assert dict(migrated.context["manifest"]) == gpt.context["manifest"]
+    assert rows("ctx.db", "manifest") == gpt.context["manifest"]
+
+
+def test_saves_only_write_changed_rows(gpt, project):
+    gpt.update_hashes()
+    assert gpt.save("ctx.db")
+    first = gpt._store.rows_written
+    assert first > 0
+    assert gpt.save("ctx.db")
+    assert gpt._store.rows_written == 0
+
+    (project / "README.md").write_text("# Project, changed\n")
+    gpt.update_hashes()
+    assert gpt.save("ctx.db")
+    assert 0 < gpt._store.rows_written < first
+    assert rows("ctx.db", "manifest")["proj/README.md"] == gpt.context["manifest"]["proj/README.md"]
+
+
+def test_snapshots_are_read_when_used(gpt, project):
+    gpt.set_update_mode("diff")
+    (project / "src" / "other.py").write_text("x = 1\n")
+    gpt.update_hashes()
+    assert gpt.save("ctx.db")
+
+    assist = loaded("ctx.db")
+    snapshots = assist.context["snapshots"]
+    assert isinstance(snapshots, gpt_helper.StoredSnapshots)
+    assert len(snapshots) == 3
+    assert snapshots._loaded == {}
+
+    (project / "src" / "other.py").write_text("x = 2\n")
+    prompt = assist.get_prompt(first=False)
+    assert "-x = 1\n+x = 2\n" in prompt
+    # Only the snapshot of the changed file was read from the store.
+    assert list(snapshots._loaded) == [assist.context["manifest"]["proj/src/other.py"]]
+
+
+def test_update_saves_the_store(gpt, project, monkeypatch):
+    gpt.update_hashes()
+    assert gpt.save("ctx.db")
+    (project / "README.md").write_text("# Project, changed\n")
+    commands = iter(["update"])
+
+    def answer(prompt=""):
+        try:
+            return next(commands)
+        except StopIteration:
+            raise EOFError from None
+
+    monkeypatch.setattr("builtins.input", answer)
+    gpt_helper.run_interactive(gpt)
+    assert rows("ctx.db", "manifest")["proj/README.md"] == gpt.context["manifest"]["proj/README.md"]
+    assert loaded("ctx.db").context["manifest"] == gpt.context["manifest"]
+
+
+def test_switching_contexts_closes_the_store(gpt, project):
+    gpt.set_update_mode("diff")
+    gpt.update_hashes()
+    assert gpt.save("a.db")
+    assert gpt.save("ctx.json")
+
+    assist = loaded("a.db")
+    first = assist._store
+    assert assist.save("b.db")
+    assert assist._store is not first
+    with pytest.raises(sqlite3.ProgrammingError):
+        first.conn.execute("SELECT 1")
+    # The snapshots were read before the first store was closed.
+    assert len(loaded("b.db").context["snapshots"]) == 2
+
+    second = assist._store
+    assert assist.load("ctx.json")
+    assert assist._store is None
+    with pytest.raises(sqlite3.ProgrammingError):
+        second.conn.execute("SELECT 1")
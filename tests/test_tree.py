@@ -0,0 +1,66 @@
+import os
+
+import pytest
+
+import gpt_helper
+
+
+@pytest.fixture
+def wide(project):
+    data = project / "data"
+    data.mkdir()
+    for i in range(12):
+        (data / f"f{i:02d}.json").write_text("{}")
+    (data / "notes.txt").write_text("notes")
+    deep = project / "a" / "b" / "c"
+    deep.mkdir(parents=True)
+    (deep / "leaf.py").write_text("x = 1\n")
+    return project
+
+
+def test_entries_over_the_limit_are_summarized(gpt, wide):
+    gpt.set_tree_entries("5")
+    tree = gpt.read_directory_contents()
+    assert "f04.json" in tree and "f05.json" not in tree
+    assert "└── … 8 more files (19 B, *.json, *.txt)" in tree
+
+
+def test_directories_below_the_depth_are_summarized(gpt, wide):
+    gpt.set_tree_depth("2")
+    tree = gpt.read_directory_contents()
+    assert "│   └── b/ … 1 file in 1 directory (6 B, *.py)" in tree
+    assert "leaf.py" not in tree
+
+
+def test_deep_trees_do_not_recurse(gpt, project):
+    # Deeper than the recursion limit; created and removed one level at a time.
+    paths = [os.path.join("proj", *["d"] * depth) for depth in range(1, 1201)]
+    for path in paths:
+        os.mkdir(path)
+    leaf = os.path.join(paths[-1], "deep.txt")
+    with open(leaf, "w") as f:
+        f.write("deep")
+    try:
+        tree = gpt.read_directory_contents().split("\n")
+    finally:
+        os.remove(leaf)
+        for path in reversed(paths):
+            os.rmdir(path)
+    leaf_line = next(line for line in tree if line.endswith("└── deep.txt"))
+    assert len(leaf_line) == len("    ") * 1200 + len("└── deep.txt")
+
+
+@pytest.mark.parametrize("value", ["-1", "x"])
+def test_invalid_limits_are_rejected(gpt, value, capsys):
+    gpt.set_tree_depth(value)
+    gpt.set_tree_entries(value)
+    assert capsys.readouterr().out.count("Invalid") == 2
+    assert gpt.context["tree_max_depth"] == 0
+    assert gpt.context["tree_max_entries"] == 200
+
+
+@pytest.mark.parametrize("line, command", [("-tree-depth 3", "tree-depth"), ("-tree-entries 100", "tree-entries")])
+def test_tree_commands_take_their_value(line, command):
+    params, cmd = gpt_helper.GPT_Assist_Cmd_Prompt.resolve_cmd(line)
+    assert cmd.command_without_hyphen == command
+    assert params[command] == line.split()[1]
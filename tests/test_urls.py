@@ -0,0 +1,113 @@
+import http.server
+import threading
+
+import pytest
+
+import gpt_helper
+
+
+class PageHandler(http.server.BaseHTTPRequestHandler):
+    # path -> (content type, body); set by the server fixture
+    pages = {}
+
+    def do_GET(self):
+        self.server.requests.append((self.path, self.headers.get("If-None-Match")))
+        if self.path not in self.pages:
+            self.send_error(404)
+            return
+        content_type, body = self.pages[self.path]
+        etag = '"%s"' % gpt_helper.hashlib.md5(body).hexdigest()
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setenv("no_proxy", "*")
+    httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), PageHandler)
+    httpd.requests = []
+    PageHandler.pages = {
+        "/page.html": ("text/html; charset=utf-8", b"<html><head><script>x()</script></head>"
+                                                   b"<body><h1>Title</h1><p>Some text</p></body></html>"),
+        "/notes.txt": ("text/plain", b"plain notes\r\n"),
+        "/image.png": ("image/png", b"\x89PNG\r\n\x1a\n\0\0\0\rIHDR" + bytes(range(256))),
+    }
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    httpd.base = f"http://127.0.0.1:{httpd.server_address[1]}"
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_unchanged_page_is_revalidated_not_downloaded(server, tmp_path):
+    fetcher = gpt_helper.URLFetcher(str(tmp_path))
+    url = server.base + "/page.html"
+    text, digest, error = fetcher.fetch(url)
+    assert error is None
+    assert "Title" in text and "Some text" in text and "x()" not in text
+
+    assert fetcher.fetch(url) == (text, digest, None)
+    assert server.requests[0][1] is None
+    assert server.requests[1][1] is not None
+
+    PageHandler.pages["/page.html"] = ("text/html", b"<p>New text</p>")
+    text, new_digest, error = fetcher.fetch(url)
+    assert text == "New text"
+    assert new_digest != digest
+
+
+def test_cached_page_is_used_when_server_is_down(server, tmp_path):
+    fetcher = gpt_helper.URLFetcher(str(tmp_path), timeout=2)
+    url = server.base + "/notes.txt"
+    assert fetcher.fetch(url)[0] == "plain notes"
+    server.shutdown()
+    server.server_close()
+    assert fetcher.fetch(url) == ("plain notes", gpt_helper.hashlib.md5(b"plain notes").hexdigest(), None)
+
+
+def test_errors_and_binary_content(server, tmp_path):
+    fetcher = gpt_helper.URLFetcher(str(tmp_path))
+    assert fetcher.fetch(server.base + "/missing") == (None, None, "HTTP 404 Not Found")
+    text, digest, error = fetcher.fetch(server.base + "/image.png")
+    assert text is None and error == "binary content (image/png)"
+
+
+def test_large_body_is_truncated(server, tmp_path):
+    PageHandler.pages["/big.txt"] = ("text/plain", b"a" * 5000)
+    fetcher = gpt_helper.URLFetcher(str(tmp_path), max_bytes=1000)
+    text, digest, error = fetcher.fetch(server.base + "/big.txt")
+    assert text.startswith("a" * 1000 + "\n\n[... truncated after the first 1,000 bytes")
+
+
+def test_prompt_includes_fetched_urls(server, gpt, tmp_path, capsys):
+    gpt.context["url_cache_dir"] = str(tmp_path / "cache")
+    gpt.context["url"] = [server.base + "/page.html", server.base + "/notes.txt", server.base + "/missing"]
+    fetched = gpt.fetch_urls()
+    assert [fetched[url][0] for url in gpt.context["url"]][1:] == ["plain notes", None]
+
+    gpt.update_hashes()
+    requests = len(server.requests)
+    gpt.prompt_update()
+    out = capsys.readouterr().out
+    # Unchanged pages are revalidated and left out of the update.
+    assert len(server.requests) == requests + 3
+    assert "### URL:" not in out
+
+    PageHandler.pages["/notes.txt"] = ("text/plain", b"changed notes")
+    gpt.prompt_update()
+    out = capsys.readouterr().out
+    assert f"### URL: {server.base}/notes.txt" in out and "changed notes" in out
+    assert "/page.html\n\n" not in out
@@ -0,0 +1,62 @@
+import time
+
+import pytest
+
+import gpt_helper
+
+
+def _no_inotify():
+    raise OSError("inotify is not available")
+
+
+@pytest.fixture(params=["inotify", "polling"])
+def watcher(request, gpt, monkeypatch):
+    if request.param == "polling":
+        monkeypatch.setattr(gpt_helper, "_Inotify", _no_inotify)
+    else:
+        try:
+            gpt_helper._Inotify().close()
+        except Exception:
+            pytest.skip("inotify is not available")
+    watcher = gpt_helper.IndexWatcher(gpt, interval=0.05)
+    watcher.start()
+    assert watcher.backend.startswith(request.param)
+    yield watcher
+    watcher.stop()
+
+
+def files(gpt, index):
+    return {entry.rel_path: entry.size for entry in gpt.iter_files(index)}
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_watcher_follows_changes(watcher, gpt, project):
+    assert set(files(gpt, watcher.get_index())) == {"proj/README.md", "proj/src/main.py"}
+
+    (project / "src" / "new.py").write_text("x = 1\n")
+    (project / "README.md").write_text("# Project, now longer\n")
+    (project / "pkg").mkdir()
+    (project / "pkg" / "mod.py").write_text("y = 2\n")
+
+    expected = {"proj/README.md": 22, "proj/src/main.py": 32, "proj/src/new.py": 6, "proj/pkg/mod.py": 6}
+    assert wait_for(lambda: files(gpt, watcher.get_index()) == expected), files(gpt, watcher.get_index())
+
+    (project / "src" / "new.py").unlink()
+    del expected["proj/src/new.py"]
+    assert wait_for(lambda: files(gpt, watcher.get_index()) == expected), files(gpt, watcher.get_index())
+
+
+def test_get_index_is_a_snapshot(watcher, gpt, project):
+    snapshot = watcher.get_index()
+    (project / "src" / "new.py").write_text("x = 1\n")
+    assert wait_for(lambda: "proj/src/new.py" in files(gpt, watcher.get_index()))
+    # The watcher's updates do not show up in an index a command is working with.
+    assert set(files(gpt, snapshot)) == {"proj/README.md", "proj/src/main.py"}